@@ -0,0 +1,100 @@
+# local.py
+import random
+import sys
+import time
+
+from server import blackjack
+from server import engine
+from server import shoe
+from server import stats
+
+from common import rules
+
+from .strategy import TableState, strategy
+
+# =========================
+# Config
+# =========================
+UNIT_BET = 10   # chips staked per hand; pays 3:2 and 6:5 naturals without rounding
+
+
+class LocalTable:
+    """
+    Bot-only table played in process on the server's TableEngine: one
+    seat per strategy and no sockets or threads, so rounds run at CPU
+    speed. Decks come from a seeded RNG, or from a persistent shoe whose
+    true count the strategies then see.
+    """
+
+    def __init__(self, strategies, house_rules=rules.CLASSIC, seed=None, use_shoe=False):
+        self.strategies = list(strategies)
+        self.house_rules = house_rules
+        self.rng = random.Random(seed)
+        self.engine = engine.TableEngine(house_rules=house_rules)
+        self.seats = [engine.Seat(seat_id) for seat_id in range(1, len(self.strategies) + 1)]
+        reserve = shoe.round_reserve(house_rules, len(self.seats))
+        self.shoe = shoe.Shoe(house_rules.decks, self.rng, reserve=reserve) if use_shoe else None
+        self.counters = {seat.id: stats.Counters() for seat in self.seats}
+        self.net = {seat.id: 0 for seat in self.seats}   # seat id -> net chips won
+        self.rounds = 0
+        self.seconds = 0.0
+
+    def play_round(self):
+        game = self.engine
+        seats = self.seats
+        rule_table = game.rule_table
+        true_count = None
+        if self.shoe is not None:
+            if self.shoe.needs_shuffle:
+                self.shoe.shuffle()
+            true_count = self.shoe.true_count()
+            deck = self.shoe
+        else:
+            deck = blackjack.create_deck(self.rng, self.house_rules.decks)
+        for seat in seats:
+            seat.bet = UNIT_BET
+
+        self.rounds += 1
+        game.start_round(seats, deck, self.rounds)
+        upcard = game.dealer_upcard
+        seat = game.current_seat
+        while seat is not None:
+            state = TableState(rule_table, game.can_double(), game.can_split(), seat.hand_index, true_count)
+            decision = self.strategies[seat.id - 1].decide(game.current_hand.hand, upcard, state)
+            game.apply_decision(decision)
+            seat = game.current_seat
+
+        hand_value = rule_table.hand_value
+        for seat in seats:
+            counters = self.counters[seat.id]
+            results = [game.results[seat.id]] + game.split_results.get(seat.id, [])
+            for hand, result in zip(engine.seat_hands(seat), results):
+                counters.add(result, hand.is_busted, hand_value(hand.hand))
+            self.net[seat.id] += game.payouts.get(seat.id, 0)
+
+    def run(self, rounds: int):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            self.play_round()
+        self.seconds += time.perf_counter() - started
+
+
+def main():
+    # python -m bot.local [rounds] [profile] [strategy ...]
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    house_rules = rules.profile(sys.argv[2]) if len(sys.argv) > 2 else rules.VEGAS
+    names = sys.argv[3:] or ["basic", "stand-at-17", "mimic-dealer"]
+    table = LocalTable([strategy(name) for name in names], house_rules, seed=1, use_shoe=True)
+    table.run(rounds)
+    rate = table.rounds / table.seconds * 60
+    print(f"[BOT] {table.rounds} rounds x {len(names)} bots ({house_rules.name} rules) in "
+          f"{table.seconds:.2f}s ({rate:,.0f} rounds/min)")
+    for seat, name in zip(table.seats, names):
+        counters = table.counters[seat.id]
+        print(f"[BOT] {name}: {counters.hands} hands, win rate {100 * counters.win_rate:.1f}%, "
+              f"busts {counters.busts}, net {table.net[seat.id]:+d} chips "
+              f"({100 * table.net[seat.id] / (table.rounds * UNIT_BET):+.2f}% of the bet per round)")
+
+
+if __name__ == "__main__":
+    main()
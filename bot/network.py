@@ -0,0 +1,191 @@
+# network.py
+import socket
+import sys
+import threading
+import time
+
+import common.protocol as protocol
+from common import rules
+from server import stats
+
+from .strategy import CLASSIC_TABLE, TableState, strategy
+
+# =========================
+# Config
+# =========================
+PAYLOAD_SIZE = 14
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 120.0   # longer than any join window plus a full round
+
+
+class NetworkBot:
+    """
+    Plays one seat over TCP like client/player.py, without a UI. It asks
+    for the newest protocol revision, so every card arrives as a card
+    frame with an explicit owner and hand index, and it keeps only the
+    state a strategy needs: its hands, the dealer's upcard and the rules.
+    """
+
+    def __init__(self, bot_strategy, name: str, rounds: int, bet: int = 0):
+        self.strategy = bot_strategy
+        self.name = name
+        self.rounds = rounds
+        self.bet = bet
+        self.rule_table = CLASSIC_TABLE
+        self.counters = stats.Counters()
+        self.played = 0
+        self.balance = None
+        self._new_round()
+
+    def _new_round(self):
+        self.hands = [[]]     # our hands' cards, split hands after the first
+        self.done = [False]   # hands stood or doubled
+        self.upcard = None
+        self.results = 0
+
+    def connect(self, host: str, port: int) -> socket.socket:
+        conn = socket.create_connection((host, port), timeout=CONNECT_TIMEOUT)
+        conn.settimeout(READ_TIMEOUT)
+        conn.sendall(protocol.pack_request(
+            self.rounds, self.name, bet=self.bet, revision=protocol.PROTOCOL_REVISION
+        ))
+        return conn
+
+    def play(self, conn: socket.socket):
+        """Plays until the requested rounds are over or the server hangs up."""
+        while self.played < self.rounds:
+            data = protocol.recv_all(conn, PAYLOAD_SIZE)
+            if not data:
+                return
+            msg_type = data[4]
+            if msg_type == protocol.MSG_TYPE_CARD:
+                self._apply_frame(protocol.unpack_card_frame(data))
+            elif msg_type == protocol.MSG_TYPE_PAYLOAD:
+                _, result, _, _ = protocol.unpack_payload(data)
+                if result == protocol.RESULT_YOUR_TURN:
+                    conn.sendall(protocol.pack_payload(self._decide(), 0, 0, 0))
+            elif msg_type == protocol.MSG_TYPE_RULES:
+                self.rule_table = rules.compile_rules(rules.unpack_house_rules(data))
+            elif msg_type == protocol.MSG_TYPE_ACCOUNT:
+                self.balance, _, _ = protocol.unpack_account(data)
+            elif msg_type in protocol.SNAPSHOT_TYPES:
+                rest = protocol.recv_all(conn, protocol.snapshot_size(data) - PAYLOAD_SIZE)
+                if not rest:
+                    return
+                self._apply_snapshot(protocol.unpack_snapshot(data + rest))
+
+    # ---------- round state ----------
+    def _hand(self, index: int):
+        return min(index, len(self.hands) - 1)
+
+    def _apply_frame(self, frame):
+        if frame.target == protocol.TARGET_DEALER:
+            if frame.rank and self.upcard is None:
+                self.upcard = (frame.rank, frame.suit)
+            return
+        if frame.target != protocol.TARGET_SELF:
+            return
+        if frame.result != protocol.RESULT_NOT_OVER:
+            # One result per hand, in hand order
+            index = self._hand(frame.hand)
+            cards = self.hands[index]
+            self.counters.add(frame.result, self.rule_table.is_bust(cards), self.rule_table.hand_value(cards))
+            self.results += 1
+            if self.results >= len(self.hands):
+                self.played += 1
+                self._new_round()
+        elif frame.action == protocol.FRAME_ACTION_SPLIT:
+            before = self._hand(frame.hand - 1)
+            moved = self.hands[before].pop()
+            # Split aces get one card each
+            aces = moved[0] == 1
+            self.done[before] = aces
+            self.hands.insert(frame.hand, [moved])
+            self.done.insert(frame.hand, aces)
+        elif frame.rank:
+            self.hands[self._hand(frame.hand)].append((frame.rank, frame.suit))
+        else:
+            # The turn timed out: the server stood this hand
+            self.done[self._hand(frame.hand)] = True
+
+    def _apply_snapshot(self, snap):
+        self._new_round()
+        if snap.in_progress:
+            self.upcard = snap.dealer_cards[0] if snap.dealer_cards else None
+            for seat in snap.seats:
+                if seat.seat_id == snap.you and not seat.flags & protocol.SEAT_WAITING:
+                    # Snapshots list split hands' cards as one hand
+                    self.hands = [list(seat.cards)]
+
+    def _decide(self) -> str:
+        # The prompt doesn't name the hand: it is the first one still open
+        rule_table = self.rule_table
+        index = len(self.hands) - 1
+        for i, cards in enumerate(self.hands):
+            if not self.done[i] and not rule_table.is_bust(cards):
+                index = i
+                break
+        cards = self.hands[index]
+        house_rules = rule_table.rules
+        # Doubles and splits stake the bet again; the server refuses them otherwise
+        affordable = self.balance is None or self.balance >= self.bet
+        pair = len(cards) == 2 and cards[0][0] == cards[1][0]
+        state = TableState(
+            rule_table,
+            can_double=house_rules.double_down and len(cards) == 2 and affordable,
+            can_split=pair and len(self.hands) < house_rules.max_hands and affordable,
+            hand_index=index,
+            true_count=None
+        )
+        decision = self.strategy.decide(cards, self.upcard or (10, 0), state)
+        if decision == protocol.DECISION_STAND or decision == protocol.DECISION_DOUBLE:
+            self.done[index] = True
+        return decision
+
+
+def run_bot(bot_strategy, host: str, port: int, name: str, rounds: int, bet: int = 0) -> NetworkBot:
+    bot = NetworkBot(bot_strategy, name, rounds, bet)
+    conn = bot.connect(host, port)
+    try:
+        bot.play(conn)
+    finally:
+        conn.close()
+    return bot
+
+
+def main():
+    # python -m bot.network HOST PORT [rounds] [bots] [strategy]
+    if len(sys.argv) < 3:
+        print("Usage: python -m bot.network <host> <port> [rounds] [bots] [strategy]")
+        return
+    host, port = sys.argv[1], int(sys.argv[2])
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    count = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    name = sys.argv[5] if len(sys.argv) > 5 else "basic"
+
+    bots = []
+
+    def play(index):
+        try:
+            bots.append(run_bot(strategy(name), host, port, f"bot-{name}-{index}", rounds))
+        except OSError as e:
+            print(f"[BOT] bot {index} failed: {e}")
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=play, args=(index,), daemon=True) for index in range(1, count + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    hands = 0
+    for bot in bots:
+        hands += bot.counters.hands
+        print(f"[BOT] {bot.name}: {bot.played} rounds, {bot.counters.hands} hands, "
+              f"win rate {100 * bot.counters.win_rate:.1f}%")
+    print(f"[BOT] {len(bots)}/{count} bots finished, {hands} hands in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# strategy.py
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from common import rules
+from common.protocol import (
+    DECISION_DOUBLE,
+    DECISION_HIT,
+    DECISION_SPLIT,
+    DECISION_STAND,
+)
+
+# =========================
+# Strategy interface
+# =========================
+# A strategy sees the hand it is playing and the dealer's upcard, both as
+# (rank, suit) tuples, plus a TableState, and returns one of the protocol
+# decisions. It may only return DECISION_DOUBLE / DECISION_SPLIT when the
+# table state says the move is allowed.
+#   rule_table - the table's compiled rules (common/rules.py), for scoring
+#   can_double - the hand may be doubled (profile allows it, two cards)
+#   can_split  - the hand may be split (a pair, below the profile's max hands)
+#   hand_index - 0, or 1+ for a hand split off the seat
+#   true_count - the shoe's true count, or None where it isn't known
+TableState = namedtuple("TableState", "rule_table can_double can_split hand_index true_count")
+
+CLASSIC_TABLE = rules.compile_rules(rules.CLASSIC)
+
+
+class Strategy(ABC):
+    """Base class of bot strategies; subclasses implement decide()."""
+
+    name = "strategy"
+
+    @abstractmethod
+    def decide(self, hand, dealer_upcard, table_state: TableState) -> str:
+        """Returns the protocol decision for `hand`."""
+
+
+class PolicyStrategy(Strategy):
+    """Wraps a batch-runner policy, policy(hand, upcard) -> decision (server/batch.py)."""
+
+    def __init__(self, policy, name: str = None):
+        self.policy = policy
+        self.name = name or getattr(policy, "__name__", "policy")
+
+    def decide(self, hand, dealer_upcard, table_state: TableState) -> str:
+        return self.policy(hand, dealer_upcard)
+
+
+class StandAt(Strategy):
+    """Hits until the hand is worth `threshold`."""
+
+    def __init__(self, threshold: int = 17):
+        self.threshold = threshold
+        self.name = f"stand-at-{threshold}"
+
+    def decide(self, hand, dealer_upcard, table_state: TableState) -> str:
+        if table_state.rule_table.hand_value(hand) < self.threshold:
+            return DECISION_HIT
+        return DECISION_STAND
+
+
+class MimicDealer(Strategy):
+    """Plays the dealer's own drawing rule."""
+
+    name = "mimic-dealer"
+
+    def decide(self, hand, dealer_upcard, table_state: TableState) -> str:
+        return DECISION_HIT if table_state.rule_table.dealer_hits(hand) else DECISION_STAND
+
+
+class BasicStrategy(Strategy):
+    """
+    Simplified basic strategy: pair splitting, doubling on 9-11 and soft
+    hands against a weak upcard, and the usual hard/soft standing totals.
+    """
+
+    name = "basic"
+
+    # Pair rank -> upcards (by value, 2-11) the pair is split against
+    SPLITS = {
+        1: range(2, 12),
+        8: range(2, 12),
+        9: (2, 3, 4, 5, 6, 8, 9),
+        7: range(2, 8),
+        6: range(2, 7),
+        3: range(2, 8),
+        2: range(2, 8),
+    }
+
+    def decide(self, hand, dealer_upcard, table_state: TableState) -> str:
+        rule_table = table_state.rule_table
+        value = rule_table.hand_value(hand)
+        upcard = rule_table.hand_value([dealer_upcard])
+        # A soft hand counts an ace as 11 without busting; under the
+        # classic rules an ace is always 11, so every hand is hard
+        soft = rule_table.rules.soft_aces and value != sum(min(rank, 10) for rank, _ in hand)
+
+        if table_state.can_split and upcard in self.SPLITS.get(hand[0][0], ()):
+            return DECISION_SPLIT
+        if table_state.can_double:
+            if not soft and (value == 11 and upcard < 11 or value == 10 and upcard < 10
+                             or value == 9 and 3 <= upcard <= 6):
+                return DECISION_DOUBLE
+            if soft and 13 <= value <= 18 and upcard in (5, 6):
+                return DECISION_DOUBLE
+
+        if soft:
+            if value >= 19 or value == 18 and upcard <= 8:
+                return DECISION_STAND
+            return DECISION_HIT
+        if value >= 17:
+            return DECISION_STAND
+        if value >= 13 and upcard <= 6:
+            return DECISION_STAND
+        if value == 12 and 4 <= upcard <= 6:
+            return DECISION_STAND
+        return DECISION_HIT
+
+
+class PolicyTable(Strategy):
+    """
+    A strategy precomputed for one rule table: its decision for every
+    hand state (the rule table's total/ace state), dealer upcard and
+    allowed move, worked out once up front. decide() is then a state walk
+    and a dict lookup, so server-side bots answer in microseconds. The
+    source strategy must decide from those inputs only, as every built-in
+    one does; the hand index and true count are not part of the key.
+    """
+
+    def __init__(self, source: Strategy, rule_table):
+        self.source = source
+        self.rule_table = rule_table
+        self.name = source.name
+        self.decisions = {}   # (state, upcard value, can_double, split rank or 0) -> decision
+        house_rules = rule_table.rules
+        doubles = (False, True) if house_rules.double_down else (False,)
+        splits = house_rules.max_hands > 1
+
+        # Two-card hands: the only ones that may double or split
+        hands = {}   # state -> a hand reaching it
+        for first in range(1, 14):
+            for second in range(first, 14):
+                hand = [(first, 0), (second, 0)]
+                state = rule_table.hand_state(hand)
+                hands.setdefault(state, hand)
+                for can_double in doubles:
+                    self._compile(hand, state, can_double, False)
+                    if splits and first == second:
+                        self._compile(hand, state, can_double, True)
+
+        # Then every state a hit can reach without busting
+        frontier = list(hands.items())
+        while frontier:
+            state, hand = frontier.pop()
+            for rank in range(1, 11):
+                next_state = rule_table.step[state + rank]
+                if next_state not in hands and rule_table.values[next_state] <= rules.BUST_LIMIT:
+                    hands[next_state] = hand + [(rank, 0)]
+                    frontier.append((next_state, hands[next_state]))
+        for state, hand in hands.items():
+            self._compile(hand, state, False, False)
+
+    def _compile(self, hand, state: int, can_double: bool, can_split: bool):
+        if self.rule_table.values[state] > rules.BUST_LIMIT:
+            return
+        table_state = TableState(self.rule_table, can_double, can_split, 0, None)
+        split_rank = hand[0][0] if can_split else 0
+        for upcard in range(1, 11):
+            key = (state, upcard, can_double, split_rank)
+            if key not in self.decisions:
+                self.decisions[key] = self.source.decide(hand, (upcard, 0), table_state)
+
+    def decide(self, hand, dealer_upcard, table_state: TableState) -> str:
+        key = (
+            self.rule_table.hand_state(hand),
+            min(dealer_upcard[0], 10),
+            table_state.can_double,
+            hand[0][0] if table_state.can_split else 0
+        )
+        decision = self.decisions.get(key)
+        if decision is None:
+            # Not reachable from a normal deal; decide once and keep it
+            decision = self.decisions[key] = self.source.decide(hand, dealer_upcard, table_state)
+        return decision
+
+
+STRATEGIES = {
+    "basic": BasicStrategy,
+    "mimic-dealer": MimicDealer,
+    "stand-at-17": lambda: StandAt(17),
+    "stand-at-15": lambda: StandAt(15),
+}
+
+
+def strategy(name: str) -> Strategy:
+    try:
+        return STRATEGIES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown strategy: {name!r}") from None
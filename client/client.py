@@ -1,11 +1,12 @@
 import socket
-import struct
 import sys
 import time
 import select
 import common.protocol as protocol
+from common import tls
 
 from . import player
+from .discovery import ServerDiscovery
 from .ui import BlackjackUI
 
 # =========================
@@ -13,8 +14,11 @@ from .ui import BlackjackUI
 # =========================
 UDP_PORT = 13122
 CLIENT_TEAM_NAME = "Team Israel"
+CLIENT_BET = 100  # chips wagered per hand; the server keeps the balance
 UDP_OFFER_TIMEOUT = 1.0
 TCP_RESPONSE_TIMEOUT = 20.0
+RECONNECT_TIMEOUT = 5.0  # connect timeout when resuming a dropped session
+TLS_CA_PATH = None  # CA that signed the server certificate; set (or pass --tls CA.pem) to play over TLS
 
 
 def ask_for_rounds() -> int:
@@ -35,6 +39,13 @@ def ask_for_rounds() -> int:
 
 def main():
     ui = BlackjackUI()
+    # python -m client.client --watch : spectate a table instead of playing
+    watch = "--watch" in sys.argv[1:]
+    # python -m client.client --tls ca.pem : connect over TLS, resuming sessions
+    ca_path = TLS_CA_PATH
+    if "--tls" in sys.argv[1:-1]:
+        ca_path = sys.argv[sys.argv.index("--tls") + 1]
+    tls_sessions = tls.SessionCache(tls.client_context(ca_path)) if ca_path else None
 
     # =========================
     # UDP socket setup
@@ -47,6 +58,7 @@ def main():
 
     udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
     udp_sock.bind(("0.0.0.0", UDP_PORT))
+    discovery = ServerDiscovery(udp_sock)
 
     while True:
         try:
@@ -56,64 +68,93 @@ def main():
             print("Client started, listening for offer requests...")
             num_rounds = ask_for_rounds()
 
+            server = None
             server_ip = None
             server_port = None
-            server_name = None
 
             start_search_time = time.time()
-            found_server = False
 
             # =========================
             # Discovery Phase
             # =========================
-            while not found_server:
-                udp_sock.settimeout(UDP_OFFER_TIMEOUT)
-                try:
-                    data, addr = udp_sock.recvfrom(1024)
-                    server_port, server_name = protocol.unpack_offer(data)
-                    server_ip = addr[0]
-                    print(f"Received offer from {server_ip}")
-                    found_server = True
-
-                except socket.timeout:
-                    elapsed = time.time() - start_search_time
-                    if elapsed > 7.0:
-                        print("Still searching... (type 'm' + Enter for manual IP)")
-                        rlist, _, _ = select.select([sys.stdin], [], [], 0.1)
-                        if rlist:
-                            if sys.stdin.readline().strip().lower() == 'm':
-                                server_ip = input("Enter server IP: ").strip()
-                                server_port = int(input("Enter server port: ").strip())
-                                found_server = True
-                    continue
-
-                except Exception:
-                    continue
+            while server is None and server_ip is None:
+                server = discovery.find_server(UDP_OFFER_TIMEOUT)
+                if server is not None:
+                    break
+
+                elapsed = time.time() - start_search_time
+                if elapsed > 7.0:
+                    print("Still searching... (type 'm' + Enter for manual IP)")
+                    rlist, _, _ = select.select([sys.stdin], [], [], 0.1)
+                    if rlist:
+                        if sys.stdin.readline().strip().lower() == 'm':
+                            server_ip = input("Enter server IP: ").strip()
+                            server_port = int(input("Enter server port: ").strip())
 
             # =========================
             # TCP connection & gameplay
             # =========================
             ui.start()
-            tcp_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            tcp_sock = None
+            resumed_socks = []
 
             try:
-                tcp_sock.connect((server_ip, server_port))
+                if server is not None:
+                    tcp_sock = discovery.connect(server)
+                else:
+                    tcp_sock = socket.create_connection((server_ip, server_port))
                 tcp_sock.settimeout(TCP_RESPONSE_TIMEOUT)
+                server_address = tcp_sock.getpeername()
+                if tls_sessions is not None:
+                    tcp_sock = tls_sessions.wrap(tcp_sock, server_address)
+
+                if watch:
+                    tcp_sock.settimeout(None)
+                    tcp_sock.sendall(protocol.pack_request(
+                        num_rounds, CLIENT_TEAM_NAME, flags=protocol.REQUEST_FLAG_SPECTATE,
+                        revision=protocol.PROTOCOL_REVISION
+                    ))
+                    player.watch_game(tcp_sock, ui)
+                    continue
 
-                request = protocol.pack_request(num_rounds, CLIENT_TEAM_NAME)
+                request = protocol.pack_request(
+                    num_rounds, CLIENT_TEAM_NAME, bet=CLIENT_BET, revision=protocol.PROTOCOL_REVISION
+                )
                 tcp_sock.sendall(request)
 
-                player.play_game(tcp_sock, num_rounds, ui)
+                def reconnect(token):
+                    try:
+                        sock = socket.create_connection(server_address, timeout=RECONNECT_TIMEOUT)
+                        if tls_sessions is not None:
+                            sock = tls_sessions.wrap(sock, server_address)
+                        resumed_socks.append(sock)
+                        sock.settimeout(TCP_RESPONSE_TIMEOUT)
+                        sock.sendall(protocol.pack_request(
+                            num_rounds, CLIENT_TEAM_NAME, bet=CLIENT_BET, token=token,
+                            revision=protocol.PROTOCOL_REVISION
+                        ))
+                    except OSError:
+                        return None
+                    return sock
+
+                player.play_game(tcp_sock, num_rounds, ui, reconnect)
 
             except Exception as e:
                 print(f"Game session error: {e}")
+                if server is not None:
+                    discovery.forget(server)
                 time.sleep(2)
 
             finally:
-                try:
-                    tcp_sock.close()
-                except Exception:
-                    pass
+                for sock in [tcp_sock] + resumed_socks:
+                    if sock is not None:
+                        if tls_sessions is not None:
+                            # The next session with this server resumes TLS
+                            tls_sessions.store(sock, server_address)
+                        try:
+                            sock.close()
+                        except Exception:
+                            pass
                 ui.stop()
                 print("\nGame over. Returning to discovery mode...\n")
 
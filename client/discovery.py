@@ -0,0 +1,215 @@
+import errno
+import selectors
+import socket
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import common.protocol as protocol
+
+# =========================
+# Configuration
+# =========================
+DISCOVERY_WINDOW = 0.5      # keep collecting offers this long after the first one
+SERVER_CACHE_TTL = 30.0     # seconds an offer stays usable without being refreshed
+RTT_PROBE_TIMEOUT = 0.5     # max time spent measuring TCP connect RTT
+LOAD_PENALTY = 1.0          # a fully loaded server counts as (1 + LOAD_PENALTY) x its RTT
+
+
+@dataclass
+class ServerEntry:
+    ip: str
+    port: int
+    name: str
+    seats_free: Optional[int] = None
+    load: Optional[int] = None
+    active_tables: Optional[int] = None
+    round_eta: Optional[int] = None
+    rtt: Optional[float] = None
+    last_seen: float = 0.0
+
+    @property
+    def key(self):
+        return (self.ip, self.port)
+
+
+def _rank_key(entry: ServerEntry):
+    # Full servers go last, then lowest load-weighted RTT wins.
+    is_full = entry.seats_free == 0
+    rtt = entry.rtt if entry.rtt is not None else RTT_PROBE_TIMEOUT
+    load = (entry.load or 0) / 100.0
+    return (is_full, rtt * (1.0 + LOAD_PENALTY * load))
+
+
+class ServerDiscovery:
+    """
+    Collects UDP offers into a TTL cache and ranks servers by measured
+    TCP connect RTT and advertised load.
+    """
+
+    def __init__(self, udp_sock: socket.socket, ttl: float = SERVER_CACHE_TTL):
+        self.udp_sock = udp_sock
+        self.ttl = ttl
+        self.servers = {}
+        # Connected sockets left over from RTT probing, reused by connect()
+        self._warm = {}
+
+    # ---------- cache ----------
+    def _record_offer(self, data: bytes, addr):
+        tcp_port, server_name = protocol.unpack_offer(data)
+        capacity = protocol.unpack_offer_capacity(data)
+        key = (addr[0], tcp_port)
+        entry = self.servers.get(key)
+        if entry is None:
+            entry = ServerEntry(ip=addr[0], port=tcp_port, name=server_name)
+            self.servers[key] = entry
+            print(f"Received offer from {addr[0]}")
+        entry.name = server_name
+        if capacity is not None:
+            entry.seats_free, entry.load, entry.active_tables, entry.round_eta = capacity
+        entry.last_seen = time.monotonic()
+        return entry
+
+    def _expire(self):
+        now = time.monotonic()
+        for key, entry in list(self.servers.items()):
+            if now - entry.last_seen > self.ttl:
+                del self.servers[key]
+                self._close_warm(key)
+
+    def forget(self, entry: ServerEntry):
+        self.servers.pop(entry.key, None)
+        self._close_warm(entry.key)
+
+    def _close_warm(self, key):
+        sock = self._warm.pop(key, None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def best(self) -> Optional[ServerEntry]:
+        self._expire()
+        if not self.servers:
+            return None
+        return min(self.servers.values(), key=_rank_key)
+
+    # ---------- UDP collection ----------
+    def drain(self):
+        """Reads every offer already queued on the UDP socket without blocking."""
+        previous_timeout = self.udp_sock.gettimeout()
+        self.udp_sock.settimeout(0.0)
+        try:
+            while True:
+                try:
+                    data, addr = self.udp_sock.recvfrom(1024)
+                except (BlockingIOError, socket.timeout):
+                    break
+                try:
+                    self._record_offer(data, addr)
+                except ValueError:
+                    continue
+        finally:
+            self.udp_sock.settimeout(previous_timeout)
+
+    def collect(self, timeout: float, window: float = DISCOVERY_WINDOW) -> bool:
+        """
+        Waits up to `timeout` for the first offer, then keeps listening for
+        `window` seconds so every server on the LAN gets a chance to answer.
+        Returns True if at least one offer was received.
+        """
+        deadline = time.monotonic() + timeout
+        got_offer = False
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.udp_sock.settimeout(remaining)
+            try:
+                data, addr = self.udp_sock.recvfrom(1024)
+            except socket.timeout:
+                break
+            try:
+                self._record_offer(data, addr)
+            except ValueError:
+                continue
+            if not got_offer:
+                got_offer = True
+                deadline = min(deadline, time.monotonic() + window)
+        return got_offer
+
+    # ---------- RTT probing ----------
+    def probe(self, entries, timeout: float = RTT_PROBE_TIMEOUT):
+        """
+        Opens non-blocking TCP connections to all entries at once and records
+        the connect RTT. Successful sockets are kept warm for connect().
+        """
+        selector = selectors.DefaultSelector()
+        started = {}
+        for entry in entries:
+            if entry.key in self._warm:
+                continue
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            err = sock.connect_ex((entry.ip, entry.port))
+            if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                sock.close()
+                entry.rtt = None
+                continue
+            started[sock] = (entry, time.monotonic())
+            selector.register(sock, selectors.EVENT_WRITE)
+
+        deadline = time.monotonic() + timeout
+        while started:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                sock = key.fileobj
+                entry, t0 = started.pop(sock)
+                selector.unregister(sock)
+                if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) != 0:
+                    sock.close()
+                    entry.rtt = None
+                    continue
+                entry.rtt = time.monotonic() - t0
+                sock.setblocking(True)
+                self._warm[entry.key] = sock
+
+        for sock, (entry, _) in started.items():
+            entry.rtt = None
+            sock.close()
+        selector.close()
+
+    def find_server(self, timeout: float) -> Optional[ServerEntry]:
+        """
+        Returns the best known server. A fresh cache entry is returned
+        immediately; otherwise offers are collected and probed first.
+        """
+        self.drain()
+        entry = self.best()
+        if entry is not None and entry.rtt is not None:
+            return entry
+
+        self.collect(timeout)
+        self._expire()
+        if not self.servers:
+            return None
+        self.probe(list(self.servers.values()))
+        entry = self.best()
+
+        # Only the chosen server keeps its probe connection
+        for key in list(self._warm):
+            if entry is None or key != entry.key:
+                self._close_warm(key)
+        return entry
+
+    def connect(self, entry: ServerEntry) -> socket.socket:
+        sock = self._warm.pop(entry.key, None)
+        if sock is not None:
+            return sock
+        t0 = time.monotonic()
+        sock = socket.create_connection((entry.ip, entry.port))
+        entry.rtt = time.monotonic() - t0
+        return sock
@@ -4,6 +4,7 @@ import time
 import threading
 
 import common.protocol as protocol
+from common import rules
 
 def recv_all(conn, size):
     data = b''
@@ -27,38 +28,68 @@ def get_card_data(rank, suit):
     s = SUITS.get(suit, 'hearts')
     return {"rank": r, "suit": s}
 
-def calculate_score(cards):
-    score = 0
-    for c in cards:
-        r = c['rank']
-        if r == 'A':
-            score += 11
-        elif r in ['J', 'Q', 'K']:
-            score += 10
-        else:
-            score += int(r)
-    
-   # NOTE:
-    # Standard Blackjack rule allows Ace = 1 or 11.
-    # This logic is intentionally disabled to comply with assignment spec:
-    # "Ace is always 11".
-    #
-    # Example of disabled standard logic:
-    #
-    # while score > 21 and aces:
-    #     score -= 10
-    #     aces -= 1
-    return score
+CARD_RANKS = {'A': 1, 'J': 11, 'Q': 12, 'K': 13}
+
+def calculate_score(cards, rule_table=None):
+    # Scored by the table's rule profile (common/rules.py). Tables that
+    # don't announce one play the classic rules: "Ace is always 11",
+    # per assignment spec.
+    if rule_table is None:
+        rule_table = rules.compile_rules(rules.CLASSIC)
+    return rule_table.hand_value([(CARD_RANKS.get(c['rank']) or int(c['rank']), 0) for c in cards])
+
+def player_hands(pl):
+    # Like the server's seats, a player's dict is its first hand; hands
+    # split off it are listed in "split_hands"
+    return [pl] + pl.setdefault("split_hands", [])
+
+def frame_hand(pl, index):
+    # Frames from a revision 3 server all have hand index 0
+    hands = player_hands(pl)
+    return hands[min(index, len(hands) - 1)]
+
+def split_hand(pl, index):
+    # The new hand at `index` takes the last card of the hand before it;
+    # split aces get one card each, so both hands are done at once
+    before = frame_hand(pl, index - 1)
+    moved = before["cards"].pop()
+    aces = moved["rank"] == 'A'
+    before["done"] = aces
+    pl["split_hands"].insert(index - 1, {"cards": [moved], "score": 0, "status": "", "done": aces})
+
+def action_name(action):
+    return {
+        protocol.FRAME_ACTION_HIT: "HIT",
+        protocol.FRAME_ACTION_STAND: "STAND",
+        protocol.FRAME_ACTION_DOUBLE: "DOUBLE",
+        protocol.FRAME_ACTION_SPLIT: "SPLIT",
+    }.get(action, "?")
+
+def apply_rules(data, table_rules, event_log):
+    house_rules = rules.unpack_house_rules(data)
+    table_rules["table"] = rules.compile_rules(house_rules)
+    payout = "{}:{}".format(*house_rules.blackjack_payout)
+    event_log.append(
+        f"Table rules: {house_rules.name}, {house_rules.decks} deck(s)"
+        + (f", blackjack pays {payout}" if house_rules.naturals else "")
+        + (", double down" if house_rules.double_down else "")
+        + (f", split to {house_rules.max_hands} hands" if house_rules.max_hands > 1 else "")
+    )
 
 # ==========================================
 # לוגיקת המשחק הראשית
 # ==========================================
 
-def play_game(conn, total_rounds, ui):
+def play_game(conn, total_rounds, ui, reconnect=None):
+    """
+    reconnect(token) -> new socket or None. When given, a dropped
+    connection is resumed with the session token the server issued.
+    """
     import threading
 
     wins = 0
     played = 0
+    hands_played = 0
     PAYLOAD_SIZE = 14
 
     game_state = {
@@ -81,6 +112,7 @@ def play_game(conn, total_rounds, ui):
     }
 
     opponent_seat_map = {}
+    table_rules = {"table": None}
 
     def alloc_seat(pid):
         if pid in opponent_seat_map:
@@ -112,22 +144,135 @@ def play_game(conn, total_rounds, ui):
 
     def sync_ui():
         for pl in game_state["players"].values():
-            pl["score"] = calculate_score(pl["cards"])
+            for hand in player_hands(pl):
+                hand["score"] = calculate_score(hand["cards"], table_rules["table"])
         ui.update_table(game_state)
 
+    def active_hand():
+        # The first of our hands not stood, doubled or busted; the turn
+        # prompt itself doesn't say which hand it is for
+        hands = player_hands(game_state["players"][my_id])
+        for hand in hands:
+            if not hand.get("done") and calculate_score(hand["cards"], table_rules["table"]) <= 21:
+                return hand
+        return hands[-1]
+
+    def offered_moves(hand):
+        """(can double, can split) for the hand about to be played."""
+        rule_table = table_rules["table"]
+        if rule_table is None or len(hand["cards"]) != 2:
+            return False, False
+        house_rules = rule_table.rules
+        # Both moves stake the hand's bet again
+        affordable = game_state["players"][my_id]["bankroll"] >= game_state["stake"]
+        cards = hand["cards"]
+        can_split = cards[0]["rank"] == cards[1]["rank"] and \
+            len(player_hands(game_state["players"][my_id])) < house_rules.max_hands
+        return house_rules.double_down and affordable, can_split and affordable
+
+    def apply_account(data):
+        # Balances are server-authoritative; the client only displays them
+        balance, delta, reason = protocol.unpack_account(data)
+        game_state["players"][my_id]["bankroll"] = balance
+        if reason == protocol.ACCOUNT_STAKED:
+            game_state["stake"] = -delta
+            game_state["event_log"].append(f"Bet {-delta} placed")
+        elif reason == protocol.ACCOUNT_SETTLED:
+            game_state["event_log"].append(f"Hand paid {delta:+d}, balance {balance}")
+
+    session = {"token": None}
+
+    def resume():
+        nonlocal conn
+        if reconnect is None or session["token"] is None:
+            return False
+        game_state["event_log"].append("Connection lost, resuming session...")
+        sync_ui()
+        new_conn = reconnect(session["token"])
+        if new_conn is None:
+            return False
+        conn = new_conn
+        return True
+
+    def apply_snapshot(snap):
+        dealer = game_state["dealer"]
+        dealer["cards"] = [get_card_data(rank, suit) for rank, suit in snap.dealer_cards]
+        dealer["hidden_cards"] = 1 if snap.in_progress else 0
+        for seat in snap.seats:
+            if seat.seat_id == snap.you:
+                pl = game_state["players"][my_id]
+            else:
+                pl = get_or_create_opponent(seat.seat_id)
+            pl["cards"] = [get_card_data(rank, suit) for rank, suit in seat.cards]
+            # Snapshots list split hands' cards as one hand
+            pl["split_hands"] = []
+            if seat.flags & protocol.SEAT_BUSTED:
+                pl["status"] = "BUSTED"
+            elif seat.flags & protocol.SEAT_STANDING:
+                pl["status"] = "STAY"
+            else:
+                pl["status"] = ""
+        game_state["event_log"].append("Table state restored")
+
+    frames = {"next_seq": 0}
+
+    def check_seq(seq):
+        # Card frames are numbered per round; a gap means a frame was lost.
+        # After a snapshot the numbering is picked up from the next frame.
+        if seq and frames["next_seq"] is not None and seq != frames["next_seq"]:
+            game_state["event_log"].append(f"Frame gap: expected #{frames['next_seq']}, got #{seq}")
+        frames["next_seq"] = seq + 1
+
+    def apply_frame(frame):
+        """Applies a card frame; returns False for this seat's own result."""
+        if frame.target == protocol.TARGET_SEAT:
+            opp = get_or_create_opponent(frame.seat_id)
+            if frame.action == protocol.FRAME_ACTION_SPLIT:
+                split_hand(opp, frame.hand)
+            if frame.action != protocol.FRAME_ACTION_NONE:
+                game_state["event_log"].append(f"{opp['name']} {action_name(frame.action)}")
+            else:
+                card = get_card_data(frame.rank, frame.suit)
+                frame_hand(opp, frame.hand)["cards"].append(card)
+                game_state["event_log"].append(f"{opp['name']} drew {card['rank']}")
+            return True
+        if frame.target == protocol.TARGET_DEALER:
+            if frame.rank != 0:
+                game_state["dealer"]["cards"].append(get_card_data(frame.rank, frame.suit))
+            return True
+        if frame.result != protocol.RESULT_NOT_OVER:
+            return False
+        me = game_state["players"][my_id]
+        if frame.action == protocol.FRAME_ACTION_SPLIT:
+            split_hand(me, frame.hand)
+        elif frame.rank != 0:
+            frame_hand(me, frame.hand)["cards"].append(get_card_data(frame.rank, frame.suit))
+        else:
+            # The turn timed out: the server stood this hand
+            frame_hand(me, frame.hand)["done"] = True
+        return True
+
     def reset_round_state():
         game_state["dealer"]["cards"] = []
         game_state["dealer"]["hidden_cards"] = 1
+        game_state["stake"] = 0
         for pl in game_state["players"].values():
             pl["cards"] = []
             pl["score"] = 0
             pl["status"] = ""
             pl["is_current"] = False
+            pl["done"] = False
+            pl["split_hands"] = []
+
+    # Set when a snapshot showed a round we are not dealt into; the
+    # restored view stays up until our own next round starts
+    stale_view = False
 
     while played < total_rounds:
         reset_round_state()
         cards_received = 0
         awaiting_hit_card = False
+        results_received = 0
 
         game_state["event_log"].append(f"--- Round {played + 1} Starting ---")
         sync_ui()
@@ -135,10 +280,62 @@ def play_game(conn, total_rounds, ui):
         round_over = False
         while not round_over:
             data = recv_all(conn, PAYLOAD_SIZE)
+            if data is None and resume():
+                continue
             if not data:
                 return
 
-            _, result, rank, suit = protocol.unpack_payload(data)
+            if data[4] == protocol.MSG_TYPE_ACCOUNT:
+                apply_account(data)
+                sync_ui()
+                continue
+
+            if data[4] == protocol.MSG_TYPE_SESSION:
+                session["token"], _ = protocol.unpack_session(data)
+                continue
+
+            if data[4] == protocol.MSG_TYPE_RULES:
+                apply_rules(data, table_rules, game_state["event_log"])
+                sync_ui()
+                continue
+
+            # ---------- JOINED LATE / RESUMED: whole table in one frame ----------
+            if data[4] in protocol.SNAPSHOT_TYPES:
+                rest = recv_all(conn, protocol.snapshot_size(data) - PAYLOAD_SIZE)
+                if not rest:
+                    return
+                snap = protocol.unpack_snapshot(data + rest)
+                apply_snapshot(snap)
+                frames["next_seq"] = None
+                me = next((seat for seat in snap.seats if seat.seat_id == snap.you), None)
+                if me is not None:
+                    played = total_rounds - me.remaining_rounds
+                if snap.in_progress and me is not None and not me.flags & protocol.SEAT_WAITING:
+                    # Keep the card-ownership inference in step with the restored hands
+                    cards_received = len(me.cards) + len(snap.dealer_cards)
+                    awaiting_hit_card = False
+                else:
+                    stale_view = True
+                sync_ui()
+                continue
+
+            if stale_view:
+                stale_view = False
+                reset_round_state()
+                cards_received = 0
+                awaiting_hit_card = False
+
+            # ---------- CARD FRAME: the owner is explicit ----------
+            if data[4] == protocol.MSG_TYPE_CARD:
+                frame = protocol.unpack_card_frame(data)
+                check_seq(frame.seq)
+                if apply_frame(frame):
+                    sync_ui()
+                    continue
+                result, rank, suit, hand_index = frame.result, 0, 0, frame.hand
+            else:
+                _, result, rank, suit = protocol.unpack_payload(data)
+                hand_index = 0
 
             # ---------- OPPONENT ----------
             if result == protocol.RESULT_OPPONENT_CARD:
@@ -167,10 +364,12 @@ def play_game(conn, total_rounds, ui):
                 sync_ui()
 
                 choice_holder = {"choice": None}
+                hand = active_hand()
+                can_double, can_split = offered_moves(hand)
 
                 def read_choice():
                     try:
-                        choice_holder["choice"] = ui.get_action_prompt()
+                        choice_holder["choice"] = ui.get_action_prompt(can_double, can_split)
                     except:
                         choice_holder["choice"] = "s"
 
@@ -189,15 +388,33 @@ def play_game(conn, total_rounds, ui):
                         except socket.timeout:
                             sync_ui()
                             continue
+                        except OSError:
+                            data2 = b""
 
                         if not data2:
-                            return
+                            if not resume():
+                                return
+                            # The server re-sends the turn prompt after the snapshot
+                            result = None
+                            break
+
+                        if data2[4] == protocol.MSG_TYPE_ACCOUNT:
+                            apply_account(data2)
+                            continue
 
-                        _, r2, rk2, st2 = protocol.unpack_payload(data2)
+                        if data2[4] == protocol.MSG_TYPE_CARD:
+                            frame = protocol.unpack_card_frame(data2)
+                            check_seq(frame.seq)
+                            if apply_frame(frame):
+                                continue
+                            r2, rk2, st2, h2 = frame.result, 0, 0, frame.hand
+                        else:
+                            _, r2, rk2, st2 = protocol.unpack_payload(data2)
+                            h2 = 0
 
                         # Server auto-stand / progress
                         if r2 != protocol.RESULT_YOUR_TURN:
-                            result, rank, suit = r2, rk2, st2
+                            result, rank, suit, hand_index = r2, rk2, st2, h2
                             break
                 finally:
                     conn.settimeout(prev_timeout)
@@ -213,12 +430,20 @@ def play_game(conn, total_rounds, ui):
                     conn.sendall(protocol.pack_payload(protocol.DECISION_HIT, 0, 0, 0))
                     awaiting_hit_card = True
                     game_state["event_log"].append("You chose HIT")
+                elif choice == 'd' and can_double:
+                    conn.sendall(protocol.pack_payload(protocol.DECISION_DOUBLE, 0, 0, 0))
+                    hand["done"] = True
+                    game_state["event_log"].append("You chose DOUBLE")
+                elif choice == 'p' and can_split:
+                    conn.sendall(protocol.pack_payload(protocol.DECISION_SPLIT, 0, 0, 0))
+                    game_state["event_log"].append("You chose SPLIT")
                 elif choice == 'q':
                     ui.stop()
                     return
                 else:
                     conn.sendall(protocol.pack_payload(protocol.DECISION_STAND, 0, 0, 0))
                     awaiting_hit_card = False
+                    hand["done"] = True
                     game_state["event_log"].append("You chose STAND")
 
                 sync_ui()
@@ -254,16 +479,21 @@ def play_game(conn, total_rounds, ui):
                     card = get_card_data(rank, suit)
                     game_state["dealer"]["cards"].append(card)
 
+                # One result per hand, in hand order
                 p = game_state["players"][my_id]
+                hand = frame_hand(p, hand_index)
                 if result == protocol.RESULT_WIN:
-                    p["status"] = "WINNER"
-                    p["bankroll"] += 100
+                    hand["status"] = "WINNER"
                     wins += 1
                 elif result == protocol.RESULT_LOSS:
-                    p["status"] = "BUSTED"
-                    p["bankroll"] -= 100
+                    hand["status"] = "BUSTED"
                 else:
-                    p["status"] = "STAY"
+                    hand["status"] = "STAY"
+                hands_played += 1
+                results_received += 1
+                if results_received < len(player_hands(p)):
+                    sync_ui()
+                    continue
 
                 played += 1
                 round_over = True
@@ -274,7 +504,121 @@ def play_game(conn, total_rounds, ui):
     ui.stop()
 
     if played > 0:
-        win_rate = (wins / played) * 100
+        win_rate = (wins / hands_played) * 100
         print(f"Finished playing {played} rounds, win rate: {win_rate}")
     else:
         print("\n[!] No rounds were played.")
+
+
+# ==========================================
+# Spectator mode
+# ==========================================
+
+def watch_game(conn, ui):
+    """
+    Renders a table without a seat. Every round starts with a snapshot of
+    the whole table; opponent and dealer packets update it in between.
+    """
+    PAYLOAD_SIZE = 14
+    game_state = {
+        "dealer": {"cards": [], "hidden_cards": 1},
+        "players": {},
+        "event_log": ["Watching the Casino!"]
+    }
+    rounds_seen = set()
+    table_rules = {"table": None}
+
+    def seat_for(pid):
+        if pid not in game_state["players"]:
+            game_state["players"][pid] = {
+                "id": pid,
+                "name": f"Player {pid}",
+                "cards": [],
+                "score": 0,
+                "bankroll": 0,
+                "status": "",
+                "is_local": False,
+                "seat": 2 + len(game_state["players"]) % 4,
+                "is_current": False,
+            }
+        return game_state["players"][pid]
+
+    def sync_ui():
+        for pl in game_state["players"].values():
+            for hand in player_hands(pl):
+                hand["score"] = calculate_score(hand["cards"], table_rules["table"])
+        ui.update_table(game_state)
+
+    while True:
+        data = recv_all(conn, PAYLOAD_SIZE)
+        if not data:
+            break
+
+        if data[4] == protocol.MSG_TYPE_RULES:
+            apply_rules(data, table_rules, game_state["event_log"])
+            continue
+
+        if data[4] in protocol.SNAPSHOT_TYPES:
+            rest = recv_all(conn, protocol.snapshot_size(data) - PAYLOAD_SIZE)
+            if not rest:
+                break
+            snap = protocol.unpack_snapshot(data + rest)
+            if snap.round_id and snap.round_id not in rounds_seen:
+                rounds_seen.add(snap.round_id)
+                game_state["event_log"].append(f"--- Round {snap.round_id} ---")
+            game_state["players"] = {}
+            game_state["dealer"]["cards"] = [get_card_data(r, s) for r, s in snap.dealer_cards]
+            game_state["dealer"]["hidden_cards"] = 1
+            for seat in snap.seats:
+                pl = seat_for(seat.seat_id)
+                pl["cards"] = [get_card_data(r, s) for r, s in seat.cards]
+                pl["is_current"] = seat.seat_id == snap.turn_seat
+                if seat.flags & protocol.SEAT_BUSTED:
+                    pl["status"] = "BUSTED"
+                elif seat.flags & protocol.SEAT_STANDING:
+                    pl["status"] = "STAY"
+            sync_ui()
+            continue
+
+        if data[4] == protocol.MSG_TYPE_CARD:
+            frame = protocol.unpack_card_frame(data)
+            if frame.target == protocol.TARGET_SEAT:
+                pl = seat_for(frame.seat_id)
+                if frame.action == protocol.FRAME_ACTION_STAND:
+                    frame_hand(pl, frame.hand)["status"] = "STAY"
+                elif frame.action == protocol.FRAME_ACTION_SPLIT:
+                    split_hand(pl, frame.hand)
+                if frame.action != protocol.FRAME_ACTION_NONE:
+                    game_state["event_log"].append(f"{pl['name']} {action_name(frame.action)}")
+                else:
+                    frame_hand(pl, frame.hand)["cards"].append(get_card_data(frame.rank, frame.suit))
+            elif frame.target == protocol.TARGET_DEALER and frame.rank != 0:
+                dealer = game_state["dealer"]
+                dealer["cards"].append(get_card_data(frame.rank, frame.suit))
+                if len(dealer["cards"]) > 1:
+                    dealer["hidden_cards"] = 0
+            sync_ui()
+            continue
+
+        if data[4] != protocol.MSG_TYPE_PAYLOAD:
+            continue
+        _, result, rank, suit = protocol.unpack_payload(data)
+
+        if result == protocol.RESULT_OPPONENT_CARD:
+            pl = seat_for((suit >> 2) & 0x3F)
+            if rank == 0:
+                if suit & 0x03:
+                    pl["status"] = "STAY"
+                game_state["event_log"].append(f"{pl['name']} {'STAND' if suit & 0x03 else 'HIT'}")
+            else:
+                pl["cards"].append(get_card_data(rank, suit & 0x03))
+        elif result == protocol.RESULT_NOT_OVER and rank != 0:
+            # Spectators only receive broadcast cards, which are the dealer's
+            dealer = game_state["dealer"]
+            dealer["cards"].append(get_card_data(rank, suit))
+            if len(dealer["cards"]) > 1:
+                dealer["hidden_cards"] = 0
+        sync_ui()
+
+    ui.stop()
+    print(f"Finished watching {len(rounds_seen)} rounds")
@@ -118,13 +118,22 @@ class BlackjackUI:
         animation = Align.center(Text(frame.strip("\n"), style="bold cyan"), vertical="middle")
         return Panel(animation, title="Shuffling", border_style="bold magenta")
 
-    def get_action_prompt(self) -> str:
+    def get_action_prompt(self, can_double: bool = False, can_split: bool = False) -> str:
         """
         Reads keyboard input while Live UI is running.
-        The UI stays visible.
+        The UI stays visible. D (double) and P (split) are only offered
+        when the table's rules and the hand allow them.
         """
+        moves = ["H = Hit", "S = Stand"]
+        choices = ["h", "s", "q"]
+        if can_double:
+            moves.append("D = Double")
+            choices.append("d")
+        if can_split:
+            moves.append("P = Split")
+            choices.append("p")
         self.console.print(
-            "[bold yellow]Your move:[/] H = Hit | S = Stand | Q = Quit",
+            f"[bold yellow]Your move:[/] {' | '.join(moves)} | Q = Quit",
             justify="center"
         )
 
@@ -134,7 +143,7 @@ class BlackjackUI:
             except (EOFError, KeyboardInterrupt):
                 return "q"
 
-            if choice in ("h", "s", "q"):
+            if choice in choices:
                 return choice
 
 
@@ -200,8 +209,7 @@ class BlackjackUI:
         if status in STATUS_STYLES:
             status_text.stylize(STATUS_STYLES[status])
 
-        cards = player_state.get("cards", [])
-        card_group = Columns([self._render_card(card) for card in cards], padding=1)
+        card_group = self._render_hands(player_state, self._render_card, padding=1)
 
         info = Table.grid(padding=(0, 1))
         info.add_row(Text(name, style="bold white"))
@@ -240,8 +248,7 @@ class BlackjackUI:
         header.add_row(Text(f"{name} (YOU)", style="bold white"), Text(f"Bankroll: {bankroll}", style="bold yellow"))
         header.add_row(Text(f"Score: {score}", style="white"), status_text if status else Text(""))
 
-        cards = player_state.get("cards", [])
-        card_group = Columns([self._render_card_large(card) for card in cards], padding=2)
+        card_group = self._render_hands(player_state, self._render_card_large, padding=2)
         cards_panel = Panel(Align.center(card_group), title="Your Hand", border_style="bright_blue")
 
         log_panel = self._build_log_panel(log_entries)
@@ -295,6 +302,23 @@ class BlackjackUI:
         actions.append("[Q] QUIT", style="bold magenta")
         return Panel(Align.center(actions, vertical="middle"), title="Actions", border_style=glow)
 
+    def _render_hands(self, player_state: dict, render_card, padding: int):
+        """The player's cards; after a split, one labelled row per hand."""
+        cards = player_state.get("cards", [])
+        card_group = Columns([render_card(card) for card in cards], padding=padding)
+        split_hands = player_state.get("split_hands") or []
+        if not split_hands:
+            return card_group
+        rows = [Text(f"Hand 1: {player_state.get('score', '-')}", style="white"), card_group]
+        for index, hand in enumerate(split_hands, 2):
+            label = Text(f"Hand {index}: {hand.get('score', '-')}", style="white")
+            status = hand.get("status", "")
+            if status:
+                label.append(f" {status}", style=STATUS_STYLES.get(status, ""))
+            rows.append(label)
+            rows.append(Columns([render_card(card) for card in hand.get("cards", [])], padding=padding))
+        return Group(*rows)
+
     def _render_confetti(self) -> Text:
         return Text("★ ✦ ✶ ✹ ★", style="bold yellow")
 
@@ -1,4 +1,5 @@
 import struct
+from collections import namedtuple
 
 # =========================
 # Constants
@@ -10,6 +11,21 @@ MAGIC_COOKIE = 0xabcddcba
 MSG_TYPE_OFFER   = 0x2
 MSG_TYPE_REQUEST = 0x3
 MSG_TYPE_PAYLOAD = 0x4
+MSG_TYPE_REQUEST_EXT = 0x5   # request followed by an extension block
+MSG_TYPE_ACCOUNT = 0x6       # server -> client balance update
+MSG_TYPE_SESSION = 0x7       # server -> client resume token
+MSG_TYPE_SNAPSHOT = 0x8      # server -> client full table state
+MSG_TYPE_CARD = 0x9          # server -> client card/event frame (revision 1+)
+MSG_TYPE_SNAPSHOT_WIDE = 0xA # snapshot with 2-byte seat ids (revision 2+)
+MSG_TYPE_RULES = 0xB         # server -> client table rule profile (revision 3+)
+
+# Protocol revisions, negotiated in the extended request
+PROTOCOL_REVISION_LEGACY = 0   # 14-byte payloads only; card owners are implied by order
+PROTOCOL_REVISION_FRAMES = 1   # round events arrive as card frames with an explicit target
+PROTOCOL_REVISION_WIDE_IDS = 2   # snapshots carry 2-byte seat ids
+PROTOCOL_REVISION_RULES = 3   # the table's rule profile is announced on joining
+PROTOCOL_REVISION_MULTI_HAND = 4   # double and split; card frames carry a hand index
+PROTOCOL_REVISION = PROTOCOL_REVISION_MULTI_HAND   # newest revision this module speaks
 
 # Payload results (server -> client)
 RESULT_NOT_OVER = 0x0
@@ -21,6 +37,8 @@ RESULT_OPPONENT_CARD = 0x5
 
 DECISION_HIT = "Hittt"
 DECISION_STAND = "Stand"
+DECISION_DOUBLE = "Doubl"   # revision 4+, where the table's rules allow it
+DECISION_SPLIT = "Split"    # revision 4+, where the table's rules allow it
 
 # Packets are encoded in 1-byte aligned fields for vector optimization.
 # Packet structure preserves quantum phase signatures and subspace frequency harmonics.
@@ -42,24 +60,41 @@ def recv_all(conn, size):
         data += chunk
     return data
 
-def pack_offer(tcp_port: int, server_name: str) -> bytes:
+# Optional capacity extension (appended after the 39 base bytes):
+# Seats free (1B) | Load percent (1B) | Active tables (1B) | Round ETA seconds (2B)
+# Older clients only read the first 39 bytes, so they keep working.
+OFFER_SIZE = 39
+OFFER_EXT_FORMAT = "!BBBH"
+OFFER_EXT_SIZE = struct.calcsize(OFFER_EXT_FORMAT)
+
+
+def pack_offer(tcp_port: int, server_name: str, seats_free=None, load=None,
+               active_tables=None, round_eta=None) -> bytes:
     name_bytes = server_name.encode('utf-8')[:32]
     name_bytes = name_bytes.ljust(32, b'\x00')
 
-    return struct.pack(
+    packet = struct.pack(
         "!IBH32s",
         MAGIC_COOKIE,
         MSG_TYPE_OFFER,
         tcp_port,
         name_bytes
     )
+    if seats_free is None and load is None and active_tables is None and round_eta is None:
+        return packet
+
+    seats_free = max(0, min(255, seats_free if seats_free is not None else 255))
+    load = max(0, min(100, load if load is not None else 0))
+    active_tables = max(0, min(255, active_tables or 0))
+    round_eta = max(0, min(0xFFFF, int(round_eta or 0)))
+    return packet + struct.pack(OFFER_EXT_FORMAT, seats_free, load, active_tables, round_eta)
 
 
 def unpack_offer(data: bytes):
-    if len(data) < 39:
+    if len(data) < OFFER_SIZE:
         raise ValueError("Offer packet too short")
 
-    cookie, msg_type, tcp_port, name = struct.unpack("!IBH32s", data[:39])
+    cookie, msg_type, tcp_port, name = struct.unpack("!IBH32s", data[:OFFER_SIZE])
 
     if cookie != MAGIC_COOKIE:
         raise ValueError("Invalid magic cookie in offer")
@@ -70,40 +105,121 @@ def unpack_offer(data: bytes):
     return tcp_port, server_name
 
 
+def unpack_offer_capacity(data: bytes):
+    """
+    Returns (seats_free, load_percent, active_tables, round_eta_seconds)
+    from the optional offer extension,
+    or None for legacy offers that only carry the 39 base bytes.
+    """
+    if len(data) < OFFER_SIZE + OFFER_EXT_SIZE:
+        return None
+    return struct.unpack(
+        OFFER_EXT_FORMAT,
+        data[OFFER_SIZE:OFFER_SIZE + OFFER_EXT_SIZE]
+    )
+
+
 # =========================
 # Request Packet
 # =========================
 # Format:
 # Magic cookie (4B) | Message type (1B) | Rounds (1B) | Client name (32B)
+#
+# Extended request (message type MSG_TYPE_REQUEST_EXT):
+# <38 base bytes> | Extension length (1B) | Extension
+# Extension fields, in order:
+# Bet per hand (4B) | Resume token (8B) | Flags (1B) | Protocol revision (1B)
+# New fields are only ever appended; missing trailing fields take their
+# defaults and unknown trailing bytes are ignored.
+REQUEST_SIZE = 38
+REQUEST_EXT_FIELDS = ("!I", "!8s", "!B", "!B")
 
-def pack_request(rounds: int, client_name: str) -> bytes:
+NO_TOKEN = bytes(8)
+
+# Request flags
+REQUEST_FLAG_SPECTATE = 0x1   # watch a table for `rounds` rounds without a seat
+
+RequestOptions = namedtuple("RequestOptions", "bet token flags revision")
+DEFAULT_REQUEST_OPTIONS = RequestOptions(bet=0, token=NO_TOKEN, flags=0, revision=PROTOCOL_REVISION_LEGACY)
+
+
+def pack_request(rounds: int, client_name: str, bet=None, token=None, flags=None,
+                 revision=None) -> bytes:
     name_bytes = client_name.encode('utf-8')[:32]
     name_bytes = name_bytes.ljust(32, b'\x00')
 
+    if bet is None and token is None and flags is None and revision is None:
+        return struct.pack(
+            "!IBB32s",
+            MAGIC_COOKIE,
+            MSG_TYPE_REQUEST,
+            rounds,
+            name_bytes
+        )
+
+    extension = b"".join(
+        struct.pack(fmt, value)
+        for fmt, value in zip(
+            REQUEST_EXT_FIELDS,
+            (max(0, min(0xFFFFFFFF, bet or 0)), token or NO_TOKEN, flags or 0, revision or 0)
+        )
+    )
     return struct.pack(
-        "!IBB32s",
+        "!IBB32sB",
         MAGIC_COOKIE,
-        MSG_TYPE_REQUEST,
+        MSG_TYPE_REQUEST_EXT,
         rounds,
-        name_bytes
-    )
+        name_bytes,
+        len(extension)
+    ) + extension
+
+
+def request_size(data: bytes) -> int:
+    """
+    Total size of the request that starts with `data` (a prefix of it).
+    Lets a reader fetch a legacy or extended request without over-reading.
+    """
+    if len(data) < 5 or data[4] != MSG_TYPE_REQUEST_EXT:
+        return REQUEST_SIZE
+    if len(data) <= REQUEST_SIZE:
+        return REQUEST_SIZE + 1
+    return REQUEST_SIZE + 1 + data[REQUEST_SIZE]
 
 
 def unpack_request(data: bytes):
-    if len(data) < 38:
+    if len(data) < REQUEST_SIZE:
         raise ValueError("Request packet too short")
 
-    cookie, msg_type, rounds, name = struct.unpack("!IBB32s", data[:38])
+    cookie, msg_type, rounds, name = struct.unpack("!IBB32s", data[:REQUEST_SIZE])
 
     if cookie != MAGIC_COOKIE:
         raise ValueError("Invalid magic cookie in request")
-    if msg_type != MSG_TYPE_REQUEST:
+    if msg_type not in (MSG_TYPE_REQUEST, MSG_TYPE_REQUEST_EXT):
         raise ValueError("Invalid message type for request")
 
     client_name = name.rstrip(b'\x00').decode('utf-8')
     return rounds, client_name
 
 
+def unpack_request_options(data: bytes) -> RequestOptions:
+    """
+    Returns the extension fields of a request,
+    or DEFAULT_REQUEST_OPTIONS for legacy 38-byte requests.
+    """
+    if len(data) <= REQUEST_SIZE or data[4] != MSG_TYPE_REQUEST_EXT:
+        return DEFAULT_REQUEST_OPTIONS
+    extension = data[REQUEST_SIZE + 1:REQUEST_SIZE + 1 + data[REQUEST_SIZE]]
+    fields = list(DEFAULT_REQUEST_OPTIONS)
+    offset = 0
+    for index, fmt in enumerate(REQUEST_EXT_FIELDS):
+        size = struct.calcsize(fmt)
+        if offset + size > len(extension):
+            break
+        fields[index], = struct.unpack_from(fmt, extension, offset)
+        offset += size
+    return RequestOptions._make(fields)
+
+
 # =========================
 # Payload Packet
 # =========================
@@ -113,8 +229,8 @@ def unpack_request(data: bytes):
 # Card value encoding: rank is 01-13 stored in two bytes, suit is 0-3 stored in one byte.
 
 def pack_payload(decision: str, result: int, rank: int, suit: int) -> bytes:
-    if decision not in {DECISION_HIT, DECISION_STAND}:
-        raise ValueError("Decision must be exactly 'Hittt' or 'Stand'")
+    if decision not in {DECISION_HIT, DECISION_STAND, DECISION_DOUBLE, DECISION_SPLIT}:
+        raise ValueError("Decision must be exactly 'Hittt', 'Stand', 'Doubl' or 'Split'")
     decision_bytes = decision.encode('ascii')
     if len(decision_bytes) != 5:
         raise ValueError("Decision must be exactly 5 bytes")
@@ -146,3 +262,315 @@ def unpack_payload(data: bytes):
 
     decision_str = decision.decode('ascii')
     return decision_str, result, rank, suit
+
+
+# =========================
+# Account Packet
+# =========================
+# Sent only to clients that sent an extended request. Same 14-byte size
+# as a payload, so clients read both with one fixed-size read and switch
+# on the message type byte.
+# Format:
+# Magic cookie (4B) | Message type (1B) |
+# Balance (4B signed) | Delta (4B signed) | Reason (1B)
+ACCOUNT_FORMAT = "!IBiiB"
+ACCOUNT_SIZE = struct.calcsize(ACCOUNT_FORMAT)
+
+ACCOUNT_OPENED = 0x0    # balance on joining, delta 0
+ACCOUNT_STAKED = 0x1    # bet taken at the deal, delta = -bet
+ACCOUNT_SETTLED = 0x2   # hand paid out, delta = net win/loss of the hand
+
+
+def _clamp_int32(value: int) -> int:
+    return max(-0x80000000, min(0x7FFFFFFF, value))
+
+
+def pack_account(balance: int, delta: int, reason: int) -> bytes:
+    return struct.pack(
+        ACCOUNT_FORMAT,
+        MAGIC_COOKIE,
+        MSG_TYPE_ACCOUNT,
+        _clamp_int32(balance),
+        _clamp_int32(delta),
+        reason
+    )
+
+
+def unpack_account(data: bytes):
+    if len(data) < ACCOUNT_SIZE:
+        raise ValueError("Account packet too short")
+
+    cookie, msg_type, balance, delta, reason = struct.unpack(ACCOUNT_FORMAT, data[:ACCOUNT_SIZE])
+
+    if cookie != MAGIC_COOKIE:
+        raise ValueError("Invalid magic cookie in account")
+    if msg_type != MSG_TYPE_ACCOUNT:
+        raise ValueError("Invalid message type for account")
+
+    return balance, delta, reason
+
+
+# =========================
+# Session Packet
+# =========================
+# Sent to extended-request clients right after their request. Presenting
+# the token in a later extended request resumes the seat after a drop.
+# Format:
+# Magic cookie (4B) | Message type (1B) | Resume token (8B) | Grace seconds (1B)
+SESSION_FORMAT = "!IB8sB"
+SESSION_SIZE = struct.calcsize(SESSION_FORMAT)
+
+
+def pack_session(token: bytes, grace_seconds: int) -> bytes:
+    return struct.pack(
+        SESSION_FORMAT,
+        MAGIC_COOKIE,
+        MSG_TYPE_SESSION,
+        token,
+        max(0, min(255, int(grace_seconds)))
+    )
+
+
+def unpack_session(data: bytes):
+    if len(data) < SESSION_SIZE:
+        raise ValueError("Session packet too short")
+
+    cookie, msg_type, token, grace_seconds = struct.unpack(SESSION_FORMAT, data[:SESSION_SIZE])
+
+    if cookie != MAGIC_COOKIE:
+        raise ValueError("Invalid magic cookie in session")
+    if msg_type != MSG_TYPE_SESSION:
+        raise ValueError("Invalid message type for session")
+
+    return token, grace_seconds
+
+
+# =========================
+# Snapshot Packet
+# =========================
+# Whole table state in one variable-size frame. It is never shorter than
+# a payload, so clients read 14 bytes, see the type and then read the
+# remaining (frame length - 14) bytes. Sent to extended-request clients
+# that join mid-round or resume, and to spectators on joining and at the
+# start of every round. Your seat id is 0 for spectators.
+# Format:
+# Magic cookie (4B) | Message type (1B) | Frame length (2B) |
+# Your seat id (1B) | Round id (4B) | In progress (1B) | Turn seat id (1B) |
+# Dealer card count (1B) | Seat count (1B) | Dealer cards (2B each) |
+# Seats: Seat id (1B) | Flags (1B) | Remaining rounds (1B) | Card count (1B) | Cards (2B each)
+# Cards are Rank (1B) | Suit (1B). Only visible dealer cards are included.
+# Revision 2+ clients get MSG_TYPE_SNAPSHOT_WIDE, where the three seat id
+# fields are 2 bytes wide; the layout is otherwise the same.
+SNAPSHOT_HEADER_FORMAT = "!IBHBIBBBB"
+SNAPSHOT_HEADER_SIZE = struct.calcsize(SNAPSHOT_HEADER_FORMAT)
+SNAPSHOT_SEAT_FORMAT = "!BBBB"
+SNAPSHOT_WIDE_HEADER_FORMAT = "!IBHHIBHBB"
+SNAPSHOT_WIDE_SEAT_FORMAT = "!HBBB"
+SNAPSHOT_LENGTH_OFFSET = 5
+SNAPSHOT_TYPES = (MSG_TYPE_SNAPSHOT, MSG_TYPE_SNAPSHOT_WIDE)
+
+# Seat flags
+SEAT_BUSTED = 0x1
+SEAT_STANDING = 0x2
+SEAT_WAITING = 0x4   # in the waiting room, dealt in next round
+SEAT_AWAY = 0x8      # disconnected, seat held for resumption
+
+TableSnapshot = namedtuple("TableSnapshot", "you round_id in_progress turn_seat dealer_cards seats")
+SeatSnapshot = namedtuple("SeatSnapshot", "seat_id flags remaining_rounds cards")
+
+
+def _pack_cards(cards) -> bytes:
+    return bytes(value for card in cards for value in (card[0], card[1]))
+
+
+def _unpack_cards(data: bytes, offset: int, count: int):
+    cards = [(data[i], data[i + 1]) for i in range(offset, offset + 2 * count, 2)]
+    return cards, offset + 2 * count
+
+
+def _snapshot_formats(wide_ids: bool):
+    if wide_ids:
+        return MSG_TYPE_SNAPSHOT_WIDE, SNAPSHOT_WIDE_HEADER_FORMAT, SNAPSHOT_WIDE_SEAT_FORMAT
+    return MSG_TYPE_SNAPSHOT, SNAPSHOT_HEADER_FORMAT, SNAPSHOT_SEAT_FORMAT
+
+
+def pack_snapshot(you: int, round_id: int, in_progress: bool, turn_seat: int,
+                  dealer_cards, seats, wide_ids: bool = False) -> bytes:
+    """
+    seats is an iterable of (seat_id, flags, remaining_rounds, cards).
+    Without wide_ids, seat ids are truncated to one byte.
+    """
+    msg_type, header_format, seat_format = _snapshot_formats(wide_ids)
+    id_mask = 0xFFFF if wide_ids else 0xFF
+    body = [_pack_cards(dealer_cards)]
+    seat_count = 0
+    for seat_id, flags, remaining_rounds, cards in seats:
+        body.append(struct.pack(seat_format, seat_id & id_mask, flags, min(255, remaining_rounds), len(cards)))
+        body.append(_pack_cards(cards))
+        seat_count += 1
+    body = b"".join(body)
+    return struct.pack(
+        header_format,
+        MAGIC_COOKIE,
+        msg_type,
+        struct.calcsize(header_format) + len(body),
+        you & id_mask,
+        round_id & 0xFFFFFFFF,
+        1 if in_progress else 0,
+        turn_seat & id_mask,
+        len(dealer_cards),
+        seat_count
+    ) + body
+
+
+def snapshot_size(data: bytes) -> int:
+    """Total frame size, from the first 14 bytes of a snapshot."""
+    length, = struct.unpack_from("!H", data, SNAPSHOT_LENGTH_OFFSET)
+    return length
+
+
+def unpack_snapshot(data: bytes) -> TableSnapshot:
+    if len(data) < SNAPSHOT_HEADER_SIZE:
+        raise ValueError("Snapshot packet too short")
+    if data[4] not in SNAPSHOT_TYPES:
+        raise ValueError("Invalid message type for snapshot")
+    _, header_format, seat_format = _snapshot_formats(data[4] == MSG_TYPE_SNAPSHOT_WIDE)
+    header_size = struct.calcsize(header_format)
+    seat_size = struct.calcsize(seat_format)
+    if len(data) < header_size:
+        raise ValueError("Snapshot packet too short")
+
+    cookie, msg_type, length, you, round_id, in_progress, turn_seat, dealer_count, seat_count = \
+        struct.unpack_from(header_format, data)
+
+    if cookie != MAGIC_COOKIE:
+        raise ValueError("Invalid magic cookie in snapshot")
+    if len(data) < length:
+        raise ValueError("Snapshot packet truncated")
+
+    dealer_cards, offset = _unpack_cards(data, header_size, dealer_count)
+    seats = []
+    for _ in range(seat_count):
+        seat_id, flags, remaining_rounds, card_count = struct.unpack_from(seat_format, data, offset)
+        cards, offset = _unpack_cards(data, offset + seat_size, card_count)
+        seats.append(SeatSnapshot(seat_id, flags, remaining_rounds, cards))
+    return TableSnapshot(you, round_id, bool(in_progress), turn_seat, dealer_cards, seats)
+
+
+# =========================
+# Card Frame
+# =========================
+# Revision 1+ clients receive every round event as a card frame instead of
+# a payload. The target says whose card it is, so clients never infer it
+# from packet order, and the sequence number counts the frames each
+# client received in the current round (from 0), so gaps and reordering
+# are detectable. Same 14-byte size as a payload.
+# Format:
+# Magic cookie (4B) | Message type (1B) | Sequence (2B) | Target (1B) |
+# Seat id (2B) | Result (1B) | Rank (1B) | Suit (1B) | Action (1B)
+# The target byte's high nibble is the hand index: 0 for a seat's first
+# hand, 1+ for hands split off it. Only revision 4+ clients see nonzero
+# hand indexes or the double/split actions.
+CARD_FRAME_FORMAT = "!IBHBHBBBB"
+CARD_FRAME_SIZE = struct.calcsize(CARD_FRAME_FORMAT)
+
+# Targets
+TARGET_SELF = 0x0     # the receiving player's own hand (or its result)
+TARGET_DEALER = 0x1
+TARGET_SEAT = 0x2     # another seat, given by the seat id field
+
+# Actions (the frame carries rank 0 when it reports an action)
+FRAME_ACTION_NONE = 0x0
+FRAME_ACTION_HIT = 0x1
+FRAME_ACTION_STAND = 0x2
+FRAME_ACTION_DOUBLE = 0x3   # the next card for this hand is its last
+FRAME_ACTION_SPLIT = 0x4    # the hand index names the new hand; it takes the split card
+
+MAX_HAND_INDEX = 0xF
+
+CardFrame = namedtuple("CardFrame", "seq target seat_id result rank suit action hand")
+
+
+def pack_card_frame(seq: int, target: int, seat_id: int, result: int,
+                    rank: int = 0, suit: int = 0, action: int = FRAME_ACTION_NONE,
+                    hand: int = 0) -> bytes:
+    return struct.pack(
+        CARD_FRAME_FORMAT,
+        MAGIC_COOKIE,
+        MSG_TYPE_CARD,
+        seq & 0xFFFF,
+        target | (hand & MAX_HAND_INDEX) << 4,
+        seat_id,
+        result,
+        rank,
+        suit,
+        action
+    )
+
+
+def unpack_card_frame(data: bytes) -> CardFrame:
+    if len(data) < CARD_FRAME_SIZE:
+        raise ValueError("Card frame too short")
+
+    cookie, msg_type, seq, target, seat_id, result, rank, suit, action = \
+        struct.unpack(CARD_FRAME_FORMAT, data[:CARD_FRAME_SIZE])
+
+    if cookie != MAGIC_COOKIE:
+        raise ValueError("Invalid magic cookie in card frame")
+    if msg_type != MSG_TYPE_CARD:
+        raise ValueError("Invalid message type for card frame")
+
+    return CardFrame(seq, target & 0xF, seat_id, result, rank, suit, action, target >> 4)
+
+
+# =========================
+# Rules Packet
+# =========================
+# Sent to revision 3+ players and spectators when they join a table, so the
+# client scores hands the way that table does. The fields spell the rules
+# out, so clients need not know the profile by id.
+# Format:
+# Magic cookie (4B) | Message type (1B) | Profile id (1B) | Rule flags (1B) |
+# Blackjack payout numerator (1B) | Denominator (1B) | Decks (1B) |
+# Max hands per seat (1B, 1 = no splitting) | Padding (3B)
+RULES_FORMAT = "!IBBBBBBB3x"
+RULES_SIZE = struct.calcsize(RULES_FORMAT)
+
+# Rule flags
+RULE_SOFT_ACES = 0x1
+RULE_DEALER_HITS_SOFT_17 = 0x2
+RULE_NATURALS = 0x4
+RULE_DOUBLE_DOWN = 0x8
+
+RulesInfo = namedtuple("RulesInfo", "profile_id flags payout_numerator payout_denominator decks max_hands")
+
+
+def pack_rules(profile_id: int, flags: int, payout_numerator: int, payout_denominator: int,
+               decks: int, max_hands: int = 1) -> bytes:
+    return struct.pack(
+        RULES_FORMAT,
+        MAGIC_COOKIE,
+        MSG_TYPE_RULES,
+        profile_id,
+        flags,
+        payout_numerator,
+        payout_denominator,
+        decks,
+        max_hands
+    )
+
+
+def unpack_rules(data: bytes) -> RulesInfo:
+    if len(data) < RULES_SIZE:
+        raise ValueError("Rules packet too short")
+
+    cookie, msg_type, profile_id, flags, numerator, denominator, decks, max_hands = \
+        struct.unpack(RULES_FORMAT, data[:RULES_SIZE])
+
+    if cookie != MAGIC_COOKIE:
+        raise ValueError("Invalid magic cookie in rules")
+    if msg_type != MSG_TYPE_RULES:
+        raise ValueError("Invalid message type for rules")
+
+    # Revision 3 servers left the max hands byte zero
+    return RulesInfo(profile_id, flags, numerator, denominator, decks, max(1, max_hands))
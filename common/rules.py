@@ -0,0 +1,170 @@
+# rules.py
+from dataclasses import dataclass
+from functools import lru_cache
+
+from common.protocol import (
+    pack_rules,
+    unpack_rules,
+    RESULT_LOSS,
+    RESULT_WIN,
+    RULE_DEALER_HITS_SOFT_17,
+    RULE_DOUBLE_DOWN,
+    RULE_NATURALS,
+    RULE_SOFT_ACES,
+)
+
+# =========================
+# House rules
+# =========================
+# A rule profile says how hands are scored and how the dealer plays. The
+# server and the client both evaluate hands through compile_rules(), which
+# turns a profile into lookup tables once, so a table's rules cost no
+# per-card branching however they are configured.
+
+BUST_LIMIT = 21
+DEALER_STANDS_AT = 17
+HARD_CAP = 40   # running totals are clamped here; real hands stop far below
+
+
+@dataclass(frozen=True)
+class HouseRules:
+    name: str
+    profile_id: int = 0
+    soft_aces: bool = False            # an ace counts 1 or 11, else always 11
+    dealer_hits_soft_17: bool = False  # H17; S17 when False (moot without soft aces)
+    naturals: bool = False             # a two-card 21 beats any other 21
+    blackjack_payout: tuple = (1, 1)   # what a winning natural pays per unit bet
+    decks: int = 1
+    double_down: bool = False          # a two-card hand may double its bet for one last card
+    max_hands: int = 1                 # hands a seat may split into; 1 disables splitting
+
+
+# Classic follows the original assignment spec: "Ace is always 11", even
+# money on every win, single deck, hit or stand only. It is the default
+# for every table.
+CLASSIC = HouseRules("classic", 0)
+VEGAS = HouseRules("vegas", 1, soft_aces=True, dealer_hits_soft_17=True, naturals=True,
+                   blackjack_payout=(3, 2), decks=6, double_down=True, max_hands=4)
+ATLANTIC = HouseRules("atlantic", 2, soft_aces=True, naturals=True, blackjack_payout=(3, 2), decks=8,
+                      double_down=True, max_hands=4)
+SINGLE_DECK = HouseRules("single-deck", 3, soft_aces=True, dealer_hits_soft_17=True, naturals=True,
+                         blackjack_payout=(6, 5), decks=1, double_down=True, max_hands=2)
+
+PROFILES = {rules.name: rules for rules in (CLASSIC, VEGAS, ATLANTIC, SINGLE_DECK)}
+PROFILES_BY_ID = {rules.profile_id: rules for rules in PROFILES.values()}
+
+
+class RuleTable:
+    """
+    A profile compiled into lookup tables. A hand is walked as a state
+    machine over its ranks: the state encodes the hard total and whether
+    an ace was seen, `step` maps (state, rank) to the next state, and
+    `values` / `dealer_draws` are indexed by the final state. States are
+    stored pre-multiplied by 14 so one addition indexes `step`.
+    """
+
+    def __init__(self, rules: HouseRules):
+        self.rules = rules
+        self.naturals = rules.naturals
+        ace_points = 1 if rules.soft_aces else 11
+        points = [0, ace_points] + list(range(2, 11)) + [10, 10, 10]
+        state_count = (HARD_CAP + 1) * 2
+        self.step = [0] * (state_count * 14)
+        self.values = [0] * (state_count * 14)
+        self.dealer_draws = [False] * (state_count * 14)
+        for hard in range(HARD_CAP + 1):
+            for ace in (0, 1):
+                state = (hard * 2 + ace) * 14
+                for rank in range(1, 14):
+                    next_hard = min(HARD_CAP, hard + points[rank])
+                    next_ace = 1 if (ace or rank == 1) else 0
+                    self.step[state + rank] = (next_hard * 2 + next_ace) * 14
+                soft = rules.soft_aces and ace and hard + 10 <= BUST_LIMIT
+                value = hard + 10 if soft else hard
+                self.values[state] = value
+                self.dealer_draws[state] = value < DEALER_STANDS_AT or (
+                    value == DEALER_STANDS_AT and soft and rules.dealer_hits_soft_17)
+        numerator, denominator = rules.blackjack_payout
+        self.payout_numerator = numerator
+        self.payout_denominator = denominator
+
+    def hand_state(self, hand) -> int:
+        """State after a hand of (rank, suit) cards; extend it with step[state + rank]."""
+        step = self.step
+        state = 0
+        for rank, _ in hand:
+            state = step[state + rank]
+        return state
+
+    def hand_value(self, hand) -> int:
+        """Best total of a hand of (rank, suit) cards."""
+        step = self.step
+        state = 0
+        for rank, _ in hand:
+            state = step[state + rank]
+        return self.values[state]
+
+    def is_bust(self, hand) -> bool:
+        return self.hand_value(hand) > BUST_LIMIT
+
+    def dealer_hits(self, hand) -> bool:
+        step = self.step
+        state = 0
+        for rank, _ in hand:
+            state = step[state + rank]
+        return self.dealer_draws[state]
+
+    def is_natural(self, hand) -> bool:
+        return self.naturals and len(hand) == 2 and self.hand_value(hand) == BUST_LIMIT
+
+    def payout(self, result: int, bet: int, natural: bool = False) -> int:
+        """Net chips paid for a settled hand (negative when the bet is lost)."""
+        if result == RESULT_WIN:
+            if natural:
+                return bet * self.payout_numerator // self.payout_denominator
+            return bet
+        if result == RESULT_LOSS:
+            return -bet
+        return 0
+
+
+@lru_cache(maxsize=None)
+def compile_rules(rules: HouseRules) -> RuleTable:
+    """The lookup tables for a profile, built once per profile."""
+    return RuleTable(rules)
+
+
+def profile(name: str) -> HouseRules:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown rule profile: {name!r}") from None
+
+
+# =========================
+# Wire form
+# =========================
+
+def pack_house_rules(rules: HouseRules) -> bytes:
+    flags = ((RULE_SOFT_ACES if rules.soft_aces else 0)
+             | (RULE_DEALER_HITS_SOFT_17 if rules.dealer_hits_soft_17 else 0)
+             | (RULE_NATURALS if rules.naturals else 0)
+             | (RULE_DOUBLE_DOWN if rules.double_down else 0))
+    numerator, denominator = rules.blackjack_payout
+    return pack_rules(rules.profile_id, flags, numerator, denominator, rules.decks, rules.max_hands)
+
+
+def unpack_house_rules(data: bytes) -> HouseRules:
+    info = unpack_rules(data)
+    known = PROFILES_BY_ID.get(info.profile_id)
+    return HouseRules(
+        known.name if known is not None else f"profile-{info.profile_id}",
+        info.profile_id,
+        soft_aces=bool(info.flags & RULE_SOFT_ACES),
+        dealer_hits_soft_17=bool(info.flags & RULE_DEALER_HITS_SOFT_17),
+        naturals=bool(info.flags & RULE_NATURALS),
+        blackjack_payout=(info.payout_numerator, info.payout_denominator),
+        decks=info.decks,
+        double_down=bool(info.flags & RULE_DOUBLE_DOWN),
+        max_hands=info.max_hands,
+    )
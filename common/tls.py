@@ -0,0 +1,106 @@
+import os
+import socket
+import ssl
+import subprocess
+import threading
+
+# =========================
+# Optional TLS transport
+# =========================
+# Gameplay can run over TLS instead of plaintext TCP. Both ends must opt
+# in: the server with a certificate and key, the client with the CA that
+# signed it. Handshakes are kept cheap by session resumption: the server
+# issues session tickets, and the client keeps the last session per server
+# and offers it on the next connect, which then skips the certificate
+# exchange (and, on TLS 1.2, the key exchange as well).
+
+SERVER_HOSTNAME = "blackjack-server"   # name the server certificate is issued for
+SESSION_TICKETS = 2                    # tickets issued per full handshake
+
+
+def server_context(cert_path: str, key_path: str) -> ssl.SSLContext:
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+    ctx.load_cert_chain(cert_path, key_path)
+    # One context serves every connection, so tickets issued on one
+    # connection resume on any later one
+    if hasattr(ctx, "num_tickets"):
+        ctx.num_tickets = SESSION_TICKETS
+    return ctx
+
+
+def client_context(ca_path: str) -> ssl.SSLContext:
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+    ctx.load_verify_locations(ca_path)
+    return ctx
+
+
+class SessionCache:
+    """
+    Client side of session resumption: the latest TLS session per server
+    address. A session is only usable once the server's ticket arrived,
+    which in TLS 1.3 is after the handshake, so callers store it once the
+    connection has carried some traffic.
+    """
+
+    def __init__(self, context: ssl.SSLContext, server_hostname: str = SERVER_HOSTNAME):
+        self.context = context
+        self.server_hostname = server_hostname
+        self.lock = threading.Lock()
+        self.sessions = {}
+        # Counters
+        self.full_handshakes = 0
+        self.resumed_handshakes = 0
+
+    def wrap(self, sock: socket.socket, address) -> ssl.SSLSocket:
+        """Runs the client handshake on a connected socket, resuming if possible."""
+        with self.lock:
+            session = self.sessions.get(address)
+        # Handshake flights are small writes; don't let Nagle hold them back
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        tls_sock = self.context.wrap_socket(sock, server_hostname=self.server_hostname, session=session)
+        if tls_sock.session_reused:
+            self.resumed_handshakes += 1
+        else:
+            self.full_handshakes += 1
+        return tls_sock
+
+    def store(self, tls_sock: ssl.SSLSocket, address):
+        # A socket whose handshake failed is still a plain socket
+        session = getattr(tls_sock, "session", None)
+        if session is not None and session.has_ticket:
+            with self.lock:
+                self.sessions[address] = session
+
+    def forget(self, address):
+        with self.lock:
+            self.sessions.pop(address, None)
+
+
+def make_test_ca(directory: str):
+    """
+    Creates a throwaway CA and a server certificate signed by it (for
+    SERVER_HOSTNAME) with the openssl command line tool. Returns
+    (ca_path, cert_path, key_path). For local testing and benchmarks only.
+    """
+    os.makedirs(directory, exist_ok=True)
+    ca_key = os.path.join(directory, "ca.key")
+    ca_path = os.path.join(directory, "ca.pem")
+    key_path = os.path.join(directory, "server.key")
+    csr_path = os.path.join(directory, "server.csr")
+    cert_path = os.path.join(directory, "server.pem")
+    ext_path = os.path.join(directory, "server.ext")
+    with open(ext_path, "w") as f:
+        f.write(f"subjectAltName=DNS:{SERVER_HOSTNAME}\n")
+
+    def run(*args):
+        subprocess.run(("openssl",) + args, check=True, capture_output=True)
+
+    run("req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1", "-nodes",
+        "-keyout", ca_key, "-out", ca_path, "-days", "7", "-subj", "/CN=Blackjack Test CA")
+    run("req", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1", "-nodes",
+        "-keyout", key_path, "-out", csr_path, "-subj", f"/CN={SERVER_HOSTNAME}")
+    run("x509", "-req", "-in", csr_path, "-CA", ca_path, "-CAkey", ca_key, "-CAcreateserial",
+        "-out", cert_path, "-days", "7", "-extfile", ext_path)
+    return ca_path, cert_path, key_path
@@ -0,0 +1,428 @@
+# admission.py
+import queue
+import selectors
+import socket
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import timers
+from common import tls
+from common.protocol import pack_payload, pack_request, DECISION_STAND, RESULT_NOT_OVER
+
+# =========================
+# Config
+# =========================
+MAX_CONNECTIONS = 256        # handshaking + seated connections
+HANDSHAKE_QUEUE_SIZE = 64    # accepted sockets waiting to enter the handshake stage
+HANDSHAKE_BATCH = 32         # new sockets registered per stage iteration
+HANDSHAKE_WORKERS = 4        # fixed pool that seats players once their request is read
+LISTEN_BACKLOG = 128
+
+
+class HandshakeStage:
+    """
+    Reads request packets for many connections from one thread. Accepted
+    sockets are handed over through a bounded queue, switched to
+    non-blocking and multiplexed with a selector; a completed request is
+    passed to on_request(conn, addr, data) on a fixed-size worker pool, so
+    slow registration never stalls reading other requests. Handshakes
+    older than `timeout` are reaped. request_size is a byte count, or a
+    function of the bytes read so far for variable-size requests.
+    With an ssl_context, the TLS handshake runs non-blocking on the same
+    selector before the request is read, and on_request gets the TLS socket.
+    """
+
+    def __init__(self, on_request, request_size: int, timeout: float,
+                 queue_size: int = HANDSHAKE_QUEUE_SIZE,
+                 workers: int = HANDSHAKE_WORKERS, ssl_context=None):
+        self.on_request = on_request
+        self.workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="handshake")
+        self.request_size = request_size
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.incoming = queue.Queue(maxsize=queue_size)
+        self.selector = selectors.DefaultSelector()
+        self.waker = timers.Waker()
+        self.selector.register(self.waker, selectors.EVENT_READ)
+        # conn -> (addr, buffer); deadlines are FIFO since the timeout is fixed
+        self.pending = {}
+        self.deadlines = deque()
+        # TLS sockets whose handshake has not finished yet
+        self.tls_handshaking = set()
+        # Counters
+        self.completed = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.tls_full = 0
+        self.tls_resumed = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def __len__(self):
+        return len(self.pending) + self.incoming.qsize()
+
+    def submit(self, conn: socket.socket, addr) -> bool:
+        """Queues an accepted socket; returns False if the stage is full."""
+        try:
+            self.incoming.put_nowait((conn, addr))
+        except queue.Full:
+            return False
+        self.waker.wake()
+        return True
+
+    def _register_batch(self):
+        now = time.monotonic()
+        for _ in range(HANDSHAKE_BATCH):
+            try:
+                conn, addr = self.incoming.get_nowait()
+            except queue.Empty:
+                return
+            conn.setblocking(False)
+            if self.ssl_context is not None:
+                # Handshake flights are small writes; don't let Nagle hold them back
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                try:
+                    conn = self.ssl_context.wrap_socket(conn, server_side=True, do_handshake_on_connect=False)
+                except (ssl.SSLError, OSError):
+                    self.failed += 1
+                    conn.close()
+                    continue
+                self.tls_handshaking.add(conn)
+            self.pending[conn] = (addr, bytearray())
+            self.deadlines.append((now + self.timeout, conn))
+            self.selector.register(conn, selectors.EVENT_READ)
+
+    def _drop(self, conn: socket.socket):
+        self.pending.pop(conn, None)
+        self.tls_handshaking.discard(conn)
+        try:
+            self.selector.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+
+    def _close(self, conn: socket.socket):
+        self._drop(conn)
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def _needed(self, buffer: bytearray) -> int:
+        if callable(self.request_size):
+            return self.request_size(bytes(buffer))
+        return self.request_size
+
+    def _handshake(self, conn: ssl.SSLSocket) -> bool:
+        """Advances a TLS handshake; returns True once it is complete."""
+        try:
+            conn.do_handshake()
+        except ssl.SSLWantReadError:
+            self.selector.modify(conn, selectors.EVENT_READ)
+            return False
+        except ssl.SSLWantWriteError:
+            self.selector.modify(conn, selectors.EVENT_WRITE)
+            return False
+        except (ssl.SSLError, OSError) as e:
+            addr, _ = self.pending[conn]
+            print(f"[TCP] TLS handshake with {addr} failed: {e}")
+            self.failed += 1
+            self._close(conn)
+            return False
+        self.tls_handshaking.discard(conn)
+        self.selector.modify(conn, selectors.EVENT_READ)
+        if conn.session_reused:
+            self.tls_resumed += 1
+        else:
+            self.tls_full += 1
+        return True
+
+    def _read(self, conn: socket.socket):
+        if conn in self.tls_handshaking and not self._handshake(conn):
+            return
+        addr, buffer = self.pending[conn]
+        while True:
+            try:
+                chunk = conn.recv(self._needed(buffer) - len(buffer))
+            except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                return
+            except OSError:
+                chunk = b""
+            if not chunk:
+                print(f"[TCP] No request received from {addr} (timeout/disconnect).")
+                self.failed += 1
+                self._close(conn)
+                return
+            buffer += chunk
+            if len(buffer) >= self._needed(buffer):
+                break
+            # Decrypted bytes already buffered by TLS never wake the selector
+            if not isinstance(conn, ssl.SSLSocket) or not conn.pending():
+                return
+
+        # Tolerate a trailing newline from line-based test clients
+        if not isinstance(conn, ssl.SSLSocket):
+            try:
+                if conn.recv(1, socket.MSG_PEEK) in (b"\n", b"\r"):
+                    conn.recv(1)
+            except (BlockingIOError, OSError):
+                pass
+
+        self._drop(conn)
+        self.completed += 1
+        self.workers.submit(self._complete, conn, addr, bytes(buffer))
+
+    def _complete(self, conn: socket.socket, addr, data: bytes):
+        try:
+            self.on_request(conn, addr, data)
+        except Exception as e:
+            print(f"[TCP] Error from {addr}: {e}")
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _reap_expired(self):
+        now = time.monotonic()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, conn = self.deadlines.popleft()
+            if conn in self.pending:
+                addr, _ = self.pending[conn]
+                print(f"[TCP] No request received from {addr} (timeout/disconnect).")
+                self.timed_out += 1
+                self._close(conn)
+
+    def _run(self):
+        while True:
+            self._register_batch()
+            wait = None
+            if self.deadlines:
+                wait = max(0.0, self.deadlines[0][0] - time.monotonic())
+            for key, _ in self.selector.select(wait):
+                if key.fileobj is self.waker:
+                    self.waker.clear()
+                elif key.fileobj in self.pending:
+                    self._read(key.fileobj)
+            self._reap_expired()
+
+
+class AdmissionControl:
+    """Caps concurrent connections and counts what was turned away."""
+
+    def __init__(self, stage: HandshakeStage, seated_count, max_connections: int = MAX_CONNECTIONS):
+        self.stage = stage
+        self.seated_count = seated_count
+        self.max_connections = max_connections
+        self.accepted = 0
+        self.rejected = 0
+
+    def admit(self, conn: socket.socket, addr) -> bool:
+        if len(self.stage) + self.seated_count() >= self.max_connections or not self.stage.submit(conn, addr):
+            self.rejected += 1
+            try:
+                conn.close()
+            except OSError:
+                pass
+            return False
+        self.accepted += 1
+        return True
+
+
+# =========================
+# Benchmark
+# =========================
+# Compares the legacy accept path (one thread per connection doing a
+# blocking request read plus the 0.1s trailing-newline probe) with the
+# handshake stage, using loopback clients that connect, send a request
+# and wait for a one-byte reply.
+_BENCH_REQUEST = pack_request(1, "bench")
+
+
+def _bench_reply(conn, addr, data):
+    conn.setblocking(True)
+    conn.sendall(b"\x01")
+    conn.close()
+
+
+def _legacy_handler(conn, addr, probe: bool):
+    conn.settimeout(5.0)
+    data = b""
+    while len(data) < len(_BENCH_REQUEST):
+        chunk = conn.recv(len(_BENCH_REQUEST) - len(data))
+        if not chunk:
+            conn.close()
+            return
+        data += chunk
+    if probe:
+        try:
+            conn.settimeout(0.1)
+            if conn.recv(1, socket.MSG_PEEK) in (b"\n", b"\r"):
+                conn.recv(1)
+        except socket.timeout:
+            pass
+    _bench_reply(conn, addr, data)
+
+
+def _serve(listener, mode: str):
+    stage = None
+    if mode == "stage":
+        stage = HandshakeStage(_bench_reply, len(_BENCH_REQUEST), 5.0, queue_size=1024)
+    while True:
+        try:
+            conn, addr = listener.accept()
+        except OSError:
+            return
+        if stage is not None:
+            if not stage.submit(conn, addr):
+                conn.close()
+        else:
+            probe = mode == "thread-per-connection"
+            threading.Thread(target=_legacy_handler, args=(conn, addr, probe), daemon=True).start()
+
+
+def _client_worker(port: int, count: int, failures: list):
+    for _ in range(count):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+                sock.sendall(_BENCH_REQUEST)
+                if sock.recv(1) != b"\x01":
+                    failures.append(1)
+        except OSError:
+            failures.append(1)
+
+
+def benchmark(connections: int = 4000, clients: int = 32):
+    for mode in ("thread-per-connection", "thread-per-connection, no probe", "stage"):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(LISTEN_BACKLOG)
+        port = listener.getsockname()[1]
+        threading.Thread(target=_serve, args=(listener, mode), daemon=True).start()
+
+        failures = []
+        per_client = connections // clients
+        workers = [
+            threading.Thread(target=_client_worker, args=(port, per_client, failures))
+            for _ in range(clients)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        listener.close()
+
+        total = per_client * clients
+        print(f"[ADMISSION] {mode}: {total / elapsed:,.0f} connections/sec "
+              f"({len(failures)} failed)")
+
+
+# Connect-to-first-card latency over plain TCP, full TLS handshakes and
+# resumed TLS handshakes. The stage answers every request with one 14-byte
+# payload, standing in for the first card of a session.
+_BENCH_CARD = pack_payload(DECISION_STAND, RESULT_NOT_OVER, 10, 2)
+
+
+def _card_reply(conn, addr, data):
+    conn.setblocking(True)
+    conn.sendall(_BENCH_CARD)
+    conn.close()
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _tls_client_worker(port: int, count: int, mode: str, cache, latencies: list, failures: list):
+    for _ in range(count):
+        started = time.perf_counter()
+        try:
+            sock = socket.create_connection(("127.0.0.1", port), timeout=10)
+            if mode == "full TLS":
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock = cache.context.wrap_socket(sock, server_hostname=cache.server_hostname)
+            elif mode == "resumed TLS":
+                sock = cache.wrap(sock, port)
+            with sock:
+                sock.sendall(_BENCH_REQUEST)
+                if _recv_exact(sock, len(_BENCH_CARD)) != _BENCH_CARD:
+                    failures.append(1)
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if mode == "resumed TLS":
+                    cache.store(sock, port)
+        except OSError:
+            failures.append(1)
+
+
+def tls_benchmark(connections: int = 2000, clients: int = 16):
+    ca_path, cert_path, key_path = tls.make_test_ca(tempfile.mkdtemp(prefix="bj-tls-"))
+    server_ctx = tls.server_context(cert_path, key_path)
+    runs = [("plain TCP", "plain TCP", None)] + [
+        (f"{mode} {name}", mode, version)
+        for name, version in (("1.2", ssl.TLSVersion.TLSv1_2), ("1.3", ssl.TLSVersion.TLSv1_3))
+        for mode in ("full TLS", "resumed TLS")
+    ]
+    for label, mode, version in runs:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(LISTEN_BACKLOG)
+        port = listener.getsockname()[1]
+        stage = HandshakeStage(_card_reply, len(_BENCH_REQUEST), 5.0, queue_size=1024,
+                               ssl_context=None if mode == "plain TCP" else server_ctx)
+
+        def serve():
+            while True:
+                try:
+                    conn, addr = listener.accept()
+                except OSError:
+                    return
+                if not stage.submit(conn, addr):
+                    conn.close()
+
+        threading.Thread(target=serve, daemon=True).start()
+        client_ctx = tls.client_context(ca_path)
+        if version is not None:
+            client_ctx.maximum_version = version
+        cache = tls.SessionCache(client_ctx)
+        latencies = []
+        failures = []
+        per_client = connections // clients
+        workers = [
+            threading.Thread(target=_tls_client_worker,
+                             args=(port, per_client, mode, cache, latencies, failures))
+            for _ in range(clients)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        listener.close()
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+        print(f"[ADMISSION] {label}: {len(latencies) / elapsed:,.0f} sessions/sec, "
+              f"first card p50 {p50:.2f} ms, p99 {p99:.2f} ms "
+              f"(server handshakes: {stage.tls_full} full, {stage.tls_resumed} resumed; "
+              f"{len(failures)} failed)")
+
+
+if __name__ == "__main__":
+    # python -m server.admission [--tls]
+    if "--tls" in sys.argv[1:]:
+        tls_benchmark()
+    else:
+        benchmark()
@@ -0,0 +1,167 @@
+# bank.py
+import queue
+import sqlite3
+import threading
+import time
+
+# =========================
+# Config
+# =========================
+STARTING_BALANCE = 1000   # chips credited to a name the first time it is seen
+LEDGER_BATCH_MAX = 1024   # ledger rows committed per transaction
+
+# Ledger entry kinds
+ENTRY_OPEN = "open"
+ENTRY_SETTLE = "settle"
+ENTRY_FORFEIT = "forfeit"   # staked, but left before the hand was settled
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    name    TEXT PRIMARY KEY,
+    balance INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ledger (
+    id       INTEGER PRIMARY KEY,
+    ts       REAL NOT NULL,
+    name     TEXT NOT NULL,
+    table_id INTEGER NOT NULL,
+    round_id INTEGER NOT NULL,
+    kind     TEXT NOT NULL,
+    bet      INTEGER NOT NULL,
+    delta    INTEGER NOT NULL,
+    balance  INTEGER NOT NULL
+);
+"""
+
+_STOP = object()
+
+
+class Bank:
+    """
+    Server-authoritative balances, keyed by client name. Balances live in
+    memory, so stake() and settle() are a dict update plus a queue put on
+    the table thread; a background thread commits the ledger rows and the
+    resulting balances to SQLite (WAL mode) in batched transactions.
+    """
+
+    def __init__(self, path: str, starting_balance: int = STARTING_BALANCE):
+        self.path = path
+        self.starting_balance = starting_balance
+        self.lock = threading.Lock()
+        self.balances = {}
+        self.entries_written = 0
+        self._queue = queue.SimpleQueue()
+
+        db = sqlite3.connect(path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+        db.close()
+        # WAL lets account lookups read while the writer commits
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+        self._reader_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    # ---------- accounts ----------
+    def open_account(self, name: str) -> int:
+        """
+        Loads (or creates) the account for `name` and returns its balance.
+        Called on the handshake workers, never on a table thread.
+        """
+        with self.lock:
+            if name in self.balances:
+                return self.balances[name]
+
+        with self._reader_lock:
+            row = self._reader.execute(
+                "SELECT balance FROM accounts WHERE name = ?", (name,)
+            ).fetchone()
+
+        with self.lock:
+            if name in self.balances:
+                return self.balances[name]
+            balance = row[0] if row else self.starting_balance
+            self.balances[name] = balance
+        if row is None:
+            self._record(name, 0, 0, ENTRY_OPEN, 0, balance, balance)
+        return balance
+
+    def balance(self, name: str) -> int:
+        with self.lock:
+            return self.balances.get(name, 0)
+
+    # ---------- hot path (table threads) ----------
+    def stake(self, name: str, amount: int) -> int:
+        """Holds up to `amount` chips for one hand; returns the amount held."""
+        with self.lock:
+            balance = self.balances.get(name, 0)
+            held = max(0, min(amount, balance))
+            self.balances[name] = balance - held
+        return held
+
+    def release(self, name: str, amount: int):
+        """Returns chips held by stake() that no hand will play."""
+        with self.lock:
+            self.balances[name] = self.balances.get(name, 0) + amount
+
+    def settle(self, name: str, bet: int, payout: int, table_id: int, round_id: int) -> int:
+        """Credits the held bet plus the hand's net payout; returns the new balance."""
+        with self.lock:
+            balance = self.balances.get(name, 0) + bet + payout
+            self.balances[name] = balance
+        self._record(name, table_id, round_id, ENTRY_SETTLE, bet, payout, balance)
+        return balance
+
+    def forfeit(self, name: str, bet: int, table_id: int, round_id: int):
+        """The held bet is lost: the player left before the hand was settled."""
+        with self.lock:
+            balance = self.balances.get(name, 0)
+        self._record(name, table_id, round_id, ENTRY_FORFEIT, bet, -bet, balance)
+
+    # ---------- persistence ----------
+    def _record(self, name, table_id, round_id, kind, bet, delta, balance):
+        self._queue.put((time.time(), name, table_id, round_id, kind, bet, delta, balance))
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._reader.close()
+
+    def _writer_loop(self):
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA synchronous=NORMAL")
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= LEDGER_BATCH_MAX:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if not batch:
+                continue
+            # Only the last balance of each name in the batch matters
+            latest = {entry[1]: entry[7] for entry in batch}
+            try:
+                with db:
+                    db.executemany(
+                        "INSERT INTO ledger (ts, name, table_id, round_id, kind, bet, delta, balance) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        batch
+                    )
+                    db.executemany(
+                        "INSERT OR REPLACE INTO accounts (name, balance) VALUES (?, ?)",
+                        latest.items()
+                    )
+                self.entries_written += len(batch)
+            except sqlite3.Error as e:
+                print(f"[BANK] Ledger write failed ({len(batch)} entries): {e}")
+        db.close()
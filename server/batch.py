@@ -0,0 +1,185 @@
+# batch.py
+import math
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from . import blackjack
+from . import engine
+
+from common.protocol import (
+    RESULT_WIN,
+    RESULT_LOSS,
+    RESULT_TIE,
+    DECISION_HIT,
+    DECISION_STAND,
+)
+
+# =========================
+# Config
+# =========================
+SESSION_HANDS = 100   # hands per bankroll session in the session histogram
+
+# =========================
+# Player policies
+# =========================
+# A policy is any callable (hand, dealer_upcard) -> DECISION_HIT / DECISION_STAND.
+# Policies are sent to simulation worker processes, so they must pickle:
+# use module-level functions or small classes, not closures.
+
+class StandAt:
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+
+    def __call__(self, hand, dealer_upcard):
+        return DECISION_STAND if blackjack.hand_value(hand) >= self.threshold else DECISION_HIT
+
+
+def stand_at(threshold: int) -> StandAt:
+    return StandAt(threshold)
+
+
+def always_stand(hand, dealer_upcard):
+    return DECISION_STAND
+
+
+def mimic_dealer(hand, dealer_upcard):
+    return DECISION_HIT if blackjack.hand_value(hand) < 17 else DECISION_STAND
+
+
+@dataclass
+class SeatStats:
+    wins: int = 0
+    losses: int = 0
+    ties: int = 0
+    busts: int = 0
+    # net units won per SESSION_HANDS-hand session -> number of sessions
+    sessions: Counter = field(default_factory=Counter)
+
+    @property
+    def hands(self) -> int:
+        return self.wins + self.losses + self.ties
+
+    @property
+    def net(self) -> int:
+        return self.wins - self.losses
+
+    @property
+    def mean(self) -> float:
+        """Expected units won per hand at a flat one-unit bet."""
+        return self.net / self.hands if self.hands else 0.0
+
+    @property
+    def variance(self) -> float:
+        """Per-hand variance; each hand pays +1, -1 or 0."""
+        if not self.hands:
+            return 0.0
+        return (self.wins + self.losses) / self.hands - self.mean ** 2
+
+    @property
+    def session_stdev(self) -> float:
+        """Spread of the bankroll after one session, from the histogram."""
+        count = sum(self.sessions.values())
+        if not count:
+            return 0.0
+        mean = sum(net * n for net, n in self.sessions.items()) / count
+        square = sum(net * net * n for net, n in self.sessions.items()) / count
+        return math.sqrt(max(0.0, square - mean * mean))
+
+    def merge(self, other: "SeatStats"):
+        self.wins += other.wins
+        self.losses += other.losses
+        self.ties += other.ties
+        self.busts += other.busts
+        self.sessions.update(other.sessions)
+
+
+@dataclass
+class BatchStats:
+    rounds: int = 0
+    seconds: float = 0.0
+    seats: dict = field(default_factory=dict)
+
+    def merge(self, other: "BatchStats"):
+        self.rounds += other.rounds
+        for seat_id, seat_stats in other.seats.items():
+            self.seats.setdefault(seat_id, SeatStats()).merge(seat_stats)
+
+
+class BatchRunner:
+    """
+    Plays rounds on a TableEngine entirely in memory: one seat per policy,
+    a fresh seeded deck per round, and no sockets or threads.
+    """
+
+    def __init__(self, policies, seed=None):
+        self.policies = list(policies)
+        self.rng = random.Random(seed)
+        self.engine = engine.TableEngine()
+        self.seats = [engine.Seat(seat_id) for seat_id in range(1, len(self.policies) + 1)]
+
+    def run(self, rounds: int, session_hands: int = SESSION_HANDS) -> BatchStats:
+        """
+        Plays `rounds` rounds. Every `session_hands` rounds each seat's net
+        result goes into its session histogram; a trailing partial session
+        is dropped.
+        """
+        stats = BatchStats(seats={seat.id: SeatStats() for seat in self.seats})
+        game = self.engine
+        seats = self.seats
+        policy_for = {seat.id: policy for seat, policy in zip(seats, self.policies)}
+        ordered = [(rank, suit) for rank in blackjack.RANKS for suit in blackjack.SUITS]
+        shuffle = self.rng.shuffle
+        session_net = {seat.id: 0 for seat in seats}
+
+        started = time.perf_counter()
+        for round_id in range(1, rounds + 1):
+            deck = ordered[:]
+            shuffle(deck)
+            game.start_round(seats, deck, round_id)
+            upcard = game.dealer_upcard
+            seat = game.current_seat
+            while seat is not None:
+                game.apply_decision(policy_for[seat.id](seat.hand, upcard))
+                seat = game.current_seat
+
+            for seat in seats:
+                seat_stats = stats.seats[seat.id]
+                result = game.results[seat.id]
+                if result == RESULT_WIN:
+                    seat_stats.wins += 1
+                    session_net[seat.id] += 1
+                elif result == RESULT_LOSS:
+                    seat_stats.losses += 1
+                    session_net[seat.id] -= 1
+                    if seat.is_busted:
+                        seat_stats.busts += 1
+                elif result == RESULT_TIE:
+                    seat_stats.ties += 1
+
+            if round_id % session_hands == 0:
+                for seat_id, net in session_net.items():
+                    stats.seats[seat_id].sessions[net] += 1
+                    session_net[seat_id] = 0
+
+        stats.rounds = rounds
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    runner = BatchRunner([stand_at(17), stand_at(15), always_stand, mimic_dealer], seed=1)
+    stats = runner.run(rounds)
+    rate = stats.rounds / stats.seconds * 60
+    print(f"[BATCH] {stats.rounds} rounds x {len(runner.seats)} seats in {stats.seconds:.2f}s "
+          f"({rate:,.0f} rounds/min)")
+    for seat_id, seat_stats in stats.seats.items():
+        win_rate = 100 * seat_stats.wins / seat_stats.hands if seat_stats.hands else 0.0
+        print(f"[BATCH] Seat {seat_id}: win rate {win_rate:.1f}%, busts {seat_stats.busts}")
+
+
+if __name__ == "__main__":
+    main()
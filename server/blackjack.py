@@ -1,14 +1,20 @@
-import random
 import socket
+import ssl
 import struct
 
+from . import shuffle
+
+from common import rules
+
 from common.protocol import (
     pack_payload,
     RESULT_WIN,
     RESULT_LOSS,
     RESULT_TIE,
     RESULT_NOT_OVER,
+    DECISION_DOUBLE,
     DECISION_HIT,
+    DECISION_SPLIT,
     DECISION_STAND,
     MAGIC_COOKIE,
     MSG_TYPE_PAYLOAD,
@@ -22,23 +28,20 @@ SUITS = [0, 1, 2, 3]
 RANKS = list(range(1, 14))
 
 
-def create_deck():
-    deck = [(rank, suit) for rank in RANKS for suit in SUITS]
-    random.shuffle(deck)
+def create_deck(rng=None, decks: int = 1):
+    # Live tables draw from the CSPRNG shuffle service; an explicit
+    # random.Random is only used for seeded (reproducible) tables.
+    if rng is None:
+        return shuffle.default_service().next_deck(decks)
+    deck = [(rank, suit) for _ in range(decks) for rank in RANKS for suit in SUITS]
+    rng.shuffle(deck)
     return deck
 
 
-def card_value(rank: int) -> int:
-    # Ace is ALWAYS 11 (per assignment spec)
-    if rank == 1:
-        return 11
-    if rank >= 10:
-        return 10
-    return rank
-
-
-def hand_value(hand):
-    return sum(card_value(rank) for rank, _ in hand)
+# Scoring lives in common/rules.py; these helpers use the classic profile
+# (Ace is ALWAYS 11, per assignment spec)
+CLASSIC_RULES = rules.compile_rules(rules.CLASSIC)
+hand_value = CLASSIC_RULES.hand_value
 
 
 # =========================
@@ -64,35 +67,54 @@ def recv_exact(conn: socket.socket, size: int):
         data += chunk
     return data
 
-def drain_socket_buffer(conn: socket.socket):
+def drain_socket_buffer(conn: socket.socket, limit: int = None) -> int:
+    """
+    Discards input that arrived out of turn; returns the bytes discarded.
+    With a limit, stops after about that many bytes, so a client flooding
+    its socket cannot keep the caller busy.
+    """
+    # Table sockets are already non-blocking, so skip the timeout round-trip
     previous_timeout = conn.gettimeout()
-    conn.settimeout(0.0)
+    if previous_timeout != 0.0:
+        conn.settimeout(0.0)
+    drained = 0
     try:
-        while True:
+        while limit is None or drained < limit:
             try:
-                chunk = conn.recv(1024)
-            except (BlockingIOError, socket.timeout):
+                chunk = conn.recv(1024 if limit is None else min(1024, limit - drained))
+            except (BlockingIOError, ssl.SSLWantReadError, socket.timeout):
                 break
             if not chunk:
                 break
+            drained += len(chunk)
     finally:
-        conn.settimeout(previous_timeout)
+        if previous_timeout != 0.0:
+            conn.settimeout(previous_timeout)
+    return drained
+
+# A decision payload is valid iff its first five bytes are the cookie and
+# payload type and its decision field is one of four literals (Hittt,
+# Stand, Doubl, Split), so it can be checked with a slice comparison and
+# a dict lookup on the raw bytes, without unpacking or decoding
+PAYLOAD_PREFIX = struct.pack("!IB", MAGIC_COOKIE, MSG_TYPE_PAYLOAD)
+_DECISIONS = {
+    DECISION_HIT.encode("ascii"): DECISION_HIT,
+    DECISION_STAND.encode("ascii"): DECISION_STAND,
+    DECISION_DOUBLE.encode("ascii"): DECISION_DOUBLE,
+    DECISION_SPLIT.encode("ascii"): DECISION_SPLIT,
+}
 
 def read_client_decision(data: bytes):
     """
     Client -> Server payload parsing:
     We ONLY care about the Decision field (5 bytes).
     The rest of the payload is ignored by design.
+    Returns None for anything but a well-formed Hittt/Stand/Doubl/Split
+    payload; whether a double or split is allowed is up to the caller.
     """
-    if len(data) < 14:
-        return None
-
-    cookie, msg_type = struct.unpack("!IB", data[:5])
-    if cookie != MAGIC_COOKIE or msg_type != MSG_TYPE_PAYLOAD:
+    if len(data) < 14 or data[:5] != PAYLOAD_PREFIX:
         return None
-
-    decision = data[5:10].decode("ascii")
-    return decision
+    return _DECISIONS.get(data[5:10])
 
 
 def play_round(conn: socket.socket):
@@ -149,7 +171,7 @@ def play_round(conn: socket.socket):
     # Reveal hidden card
     send_update(conn, dealer_hand[1])
 
-    while hand_value(dealer_hand) < 17:
+    while CLASSIC_RULES.dealer_hits(dealer_hand):
         card = deck.pop()
         dealer_hand.append(card)
         send_update(conn, card)
@@ -0,0 +1,372 @@
+# engine.py
+from dataclasses import dataclass, field
+
+from . import history
+from . import profiling
+
+from common import rules
+
+from common.protocol import (
+    RESULT_NOT_OVER,
+    RESULT_LOSS,
+    RESULT_TIE,
+    RESULT_WIN,
+    RESULT_OPPONENT_CARD,
+    DECISION_DOUBLE,
+    DECISION_HIT,
+    DECISION_SPLIT,
+    DECISION_STAND,
+)
+
+# =========================
+# Outbound messages
+# =========================
+# The engine never touches sockets. Every step returns a list of
+# (kind, seat_id, result, rank, suit, hand) tuples for the caller to
+# deliver; hand is the seat's hand index (0 unless the seat split):
+#   SEND_SEAT   -> only seat_id
+#   SEND_OTHERS -> every other seat still in the round; suit is the raw
+#                  suit/action code, the transport encodes seat_id into it
+#   SEND_ALL    -> every seat still in the round
+#   SETTLE      -> not a packet: the bet on seat_id's hand is paid out, rank
+#                  carries the net payout; emitted right before that hand's result
+SEND_SEAT = 0
+SEND_OTHERS = 1
+SEND_ALL = 2
+SETTLE = 3
+
+# Opponent action codes carried in the suit field of SEND_OTHERS messages
+# (rank 0). A SEND_SEAT with rank 0 and ACTION_SPLIT tells the seat itself
+# that its hand split; `hand` is then the index of the new hand.
+ACTION_HIT = 0
+ACTION_STAND = 1
+ACTION_DOUBLE = 2
+ACTION_SPLIT = 3
+
+# A decision of None means the seat's turn timed out (auto-stand)
+DECISION_TIMEOUT = None
+
+PHASE_IDLE = "IDLE"
+PHASE_PLAYER_TURNS = "PLAYER_TURNS"
+PHASE_DONE = "DONE"
+
+
+@dataclass
+class Seat:
+    """Minimal seat state. The socket server passes its Player objects instead."""
+    id: int
+    hand: list = field(default_factory=list)
+    is_busted: bool = False
+    is_standing: bool = False
+    bet: int = 0
+    # The seat's own fields are its first hand. Hands split off it live in
+    # split_hands, which stays None for seats that never split
+    doubled: bool = False
+    split_hands: list = None
+    hand_index: int = 0
+
+
+class Hand:
+    """A hand split off a seat, with the same fields as the seat's first hand."""
+    __slots__ = ("hand", "bet", "is_busted", "is_standing", "doubled")
+
+    def __init__(self, cards, bet: int):
+        self.hand = cards
+        self.bet = bet
+        self.is_busted = False
+        self.is_standing = False
+        self.doubled = False
+
+
+def seat_hands(seat):
+    """The seat's hands in play order (the seat itself is the first)."""
+    if seat.split_hands is None:
+        return [seat]
+    return [seat] + seat.split_hands
+
+
+class TableEngine:
+    """
+    I/O-free state machine for one blackjack round. Feed it seats and a
+    deck with start_round(), then one decision at a time for
+    current_seat with apply_decision(); dealer play and results run
+    automatically once the last seat is done. Scoring, dealer play and
+    payouts follow the table's rule profile.
+    """
+
+    def __init__(self, table_id: int = 1, hand_history=None, tracer=None, house_rules=rules.CLASSIC):
+        self.table_id = table_id
+        self.hand_history = hand_history
+        self.tracer = tracer
+        self.house_rules = house_rules
+        self.rule_table = rules.compile_rules(house_rules)
+        self.round_id = 0
+        self.phase = PHASE_IDLE
+        self.seats = []
+        self.deck = []
+        self.dealer_hand = []
+        self.results = {}        # seat id -> result of its first hand
+        self.split_results = {}  # seat id -> results of its split hands
+        self.payouts = {}        # seat id -> net payout over all its hands
+        self.removed = set()
+        self.turn_index = 0
+        self.outbox = []
+        self.dealer_score = 0
+        self.dealer_natural = False
+
+    # ---------- helpers ----------
+    def _log(self, event: int, player_id: int = 0, card=None, arg: int = 0):
+        if self.hand_history is not None:
+            self.hand_history.log(self.table_id, self.round_id, event, player_id, card, arg)
+
+    def _span(self, phase: str):
+        # Untraced engines (batch runs) skip the trace span object entirely
+        if self.tracer is None:
+            return profiling.span(phase)
+        return self.tracer.span(phase, self.table_id, self.round_id)
+
+    def _flush(self):
+        out = self.outbox
+        self.outbox = []
+        return out
+
+    @property
+    def current_seat(self):
+        """The seat whose decision is awaited, or None when no turn is open."""
+        if self.phase != PHASE_PLAYER_TURNS:
+            return None
+        return self.seats[self.turn_index]
+
+    @property
+    def current_hand(self):
+        """The hand of current_seat being played (the seat itself, or a split hand)."""
+        seat = self.current_seat
+        if seat is None:
+            return None
+        return seat if seat.hand_index == 0 else seat.split_hands[seat.hand_index - 1]
+
+    def can_double(self) -> bool:
+        hand = self.current_hand
+        return hand is not None and self.house_rules.double_down and len(hand.hand) == 2
+
+    def can_split(self) -> bool:
+        hand = self.current_hand
+        if hand is None or len(hand.hand) != 2 or hand.hand[0][0] != hand.hand[1][0]:
+            return False
+        split_hands = self.current_seat.split_hands
+        return 1 + (len(split_hands) if split_hands else 0) < self.house_rules.max_hands
+
+    @property
+    def dealer_upcard(self):
+        return self.dealer_hand[0] if self.dealer_hand else None
+
+    # ---------- events ----------
+    def start_round(self, seats, deck, round_id: int = 0, round_seed=None):
+        self.round_id = round_id
+        self.seats = list(seats)
+        self.deck = deck
+        self.results = {}
+        self.split_results = {}
+        self.payouts = {}
+        self.removed = set()
+        self.turn_index = 0
+        send = self.outbox.append
+
+        self._log(history.EVENT_ROUND_START, arg=len(self.seats))
+        if round_seed is not None:
+            self._log(history.EVENT_ROUND_SEED, arg=round_seed)
+        if self.house_rules.profile_id:
+            self._log(history.EVENT_ROUND_RULES, arg=self.house_rules.profile_id)
+
+        self.dealer_hand = [deck.pop(), deck.pop()]
+        self._log(history.EVENT_DEALER_CARD, card=self.dealer_hand[0])
+        self._log(history.EVENT_DEALER_CARD, card=self.dealer_hand[1], arg=1)
+        # With naturals, a dealer blackjack ends the round before any turn
+        # and a player blackjack needs no turn
+        naturals = self.rule_table.naturals
+        is_natural = self.rule_table.is_natural
+        dealer_natural = naturals and is_natural(self.dealer_hand)
+
+        for seat in self.seats:
+            first, second = deck.pop(), deck.pop()
+            seat.hand = [first, second]
+            seat.is_busted = False
+            seat.is_standing = naturals and (dealer_natural or is_natural(seat.hand))
+            seat.doubled = False
+            seat.split_hands = None
+            seat.hand_index = 0
+            self._log(history.EVENT_PLAYER_CARD, seat.id, first)
+            self._log(history.EVENT_PLAYER_CARD, seat.id, second)
+            send((SEND_SEAT, seat.id, RESULT_NOT_OVER, first[0], first[1], 0))
+            send((SEND_OTHERS, seat.id, RESULT_OPPONENT_CARD, first[0], first[1], 0))
+            send((SEND_SEAT, seat.id, RESULT_NOT_OVER, second[0], second[1], 0))
+            send((SEND_OTHERS, seat.id, RESULT_OPPONENT_CARD, second[0], second[1], 0))
+
+        upcard = self.dealer_hand[0]
+        send((SEND_ALL, 0, RESULT_NOT_OVER, upcard[0], upcard[1], 0))
+
+        self.phase = PHASE_PLAYER_TURNS
+        self._advance()
+        return self._flush()
+
+    def apply_decision(self, decision):
+        seat = self.current_seat
+        if seat is None:
+            raise ValueError("No turn is open")
+        index = seat.hand_index
+        hand = seat if index == 0 else seat.split_hands[index - 1]
+        send = self.outbox.append
+
+        if decision == DECISION_HIT:
+            self._log(history.EVENT_DECISION, seat.id, arg=history.DECISION_CODE_HIT)
+            send((SEND_OTHERS, seat.id, RESULT_OPPONENT_CARD, 0, ACTION_HIT, index))
+            self._deal(seat, hand, index)
+        elif decision == DECISION_STAND:
+            hand.is_standing = True
+            self._log(history.EVENT_DECISION, seat.id, arg=history.DECISION_CODE_STAND)
+            send((SEND_OTHERS, seat.id, RESULT_OPPONENT_CARD, 0, ACTION_STAND, index))
+        elif decision is DECISION_TIMEOUT:
+            hand.is_standing = True
+            self._log(history.EVENT_DECISION, seat.id, arg=history.DECISION_CODE_TIMEOUT)
+            send((SEND_OTHERS, seat.id, RESULT_OPPONENT_CARD, 0, ACTION_STAND, index))
+            # Tells the player himself to leave the CURRENT TURN prompt
+            send((SEND_SEAT, seat.id, RESULT_NOT_OVER, 0, 0, index))
+        elif decision == DECISION_DOUBLE:
+            if not self.can_double():
+                raise ValueError("Double is not allowed on this hand")
+            # The caller has already taken the extra stake
+            hand.bet *= 2
+            hand.doubled = True
+            self._log(history.EVENT_DECISION, seat.id, arg=history.DECISION_CODE_DOUBLE)
+            send((SEND_OTHERS, seat.id, RESULT_OPPONENT_CARD, 0, ACTION_DOUBLE, index))
+            self._deal(seat, hand, index)
+            hand.is_standing = not hand.is_busted
+        elif decision == DECISION_SPLIT:
+            if not self.can_split():
+                raise ValueError("Split is not allowed on this hand")
+            if seat.split_hands is None:
+                seat.split_hands = []
+            new_hand = Hand([hand.hand.pop()], hand.bet)
+            seat.split_hands.insert(index, new_hand)
+            self._log(history.EVENT_DECISION, seat.id, arg=history.DECISION_CODE_SPLIT)
+            send((SEND_SEAT, seat.id, RESULT_NOT_OVER, 0, ACTION_SPLIT, index + 1))
+            send((SEND_OTHERS, seat.id, RESULT_OPPONENT_CARD, 0, ACTION_SPLIT, index + 1))
+            self._deal(seat, hand, index)
+            self._deal(seat, new_hand, index + 1)
+            if new_hand.hand[0][0] == 1:
+                # Split aces get one card each
+                hand.is_standing = new_hand.is_standing = True
+        else:
+            raise ValueError(f"Unknown decision: {decision!r}")
+
+        self._advance()
+        return self._flush()
+
+    def remove_seat(self, seat_id: int):
+        """The seat left (disconnect); it gets no more turns or results."""
+        if self.phase == PHASE_PLAYER_TURNS and seat_id not in self.removed:
+            self._log(history.EVENT_SEAT_REMOVED, seat_id)
+        self.removed.add(seat_id)
+        if self.phase == PHASE_PLAYER_TURNS:
+            self._advance()
+        return self._flush()
+
+    # ---------- internal phases ----------
+    def _deal(self, seat, hand, index: int):
+        card = self.deck.pop()
+        hand.hand.append(card)
+        self._log(history.EVENT_PLAYER_CARD, seat.id, card, index)
+        self.outbox.append((SEND_SEAT, seat.id, RESULT_NOT_OVER, card[0], card[1], index))
+        self.outbox.append((SEND_OTHERS, seat.id, RESULT_OPPONENT_CARD, card[0], card[1], index))
+        if self.rule_table.is_bust(hand.hand):
+            hand.is_busted = True
+
+    def _advance(self):
+        seats = self.seats
+        removed = self.removed
+        while self.turn_index < len(seats):
+            seat = seats[self.turn_index]
+            if seat.id not in removed:
+                if seat.split_hands is None:
+                    if not (seat.is_busted or seat.is_standing):
+                        return
+                elif self._next_open_hand(seat):
+                    return
+            self.turn_index += 1
+        self._finish()
+
+    @staticmethod
+    def _next_open_hand(seat) -> bool:
+        """Moves seat.hand_index to its first unfinished hand; False if none is left."""
+        hands = seat_hands(seat)
+        while seat.hand_index < len(hands):
+            hand = hands[seat.hand_index]
+            if not (hand.is_busted or hand.is_standing):
+                return True
+            seat.hand_index += 1
+        return False
+
+    def _finish(self):
+        self.phase = PHASE_DONE
+        present = [s for s in self.seats if s.id not in self.removed]
+        if not present:
+            self._log(history.EVENT_ROUND_END)
+            return
+        send = self.outbox.append
+        deck = self.deck
+        dealer_hand = self.dealer_hand
+        rule_table = self.rule_table
+
+        with self._span("dealer_turn"):
+            hole = dealer_hand[1]
+            send((SEND_ALL, 0, RESULT_NOT_OVER, hole[0], hole[1], 0))
+            step = rule_table.step
+            draws = rule_table.dealer_draws
+            state = rule_table.hand_state(dealer_hand)
+            while draws[state]:
+                card = deck.pop()
+                dealer_hand.append(card)
+                state = step[state + card[0]]
+                self._log(history.EVENT_DEALER_CARD, card=card)
+                send((SEND_ALL, 0, RESULT_NOT_OVER, card[0], card[1], 0))
+
+        self.dealer_score = rule_table.values[state]
+        self.dealer_natural = rule_table.naturals and rule_table.is_natural(dealer_hand)
+        for seat in present:
+            # Split hands can't be naturals
+            natural = seat.split_hands is None and rule_table.is_natural(seat.hand)
+            self.results[seat.id] = self._settle(seat, seat, 0, natural)
+            if seat.split_hands is not None:
+                self.split_results[seat.id] = [
+                    self._settle(seat, hand, index, False)
+                    for index, hand in enumerate(seat.split_hands, 1)
+                ]
+        self._log(history.EVENT_ROUND_END)
+
+    def _settle(self, seat, hand, index: int, natural: bool) -> int:
+        dealer_natural = self.dealer_natural
+        if hand.is_busted:
+            result = RESULT_LOSS
+        elif natural or dealer_natural:
+            # A natural beats any other 21
+            if natural and dealer_natural:
+                result = RESULT_TIE
+            else:
+                result = RESULT_WIN if natural else RESULT_LOSS
+        else:
+            player_score = self.rule_table.hand_value(hand.hand)
+            dealer_score = self.dealer_score
+            if dealer_score > 21 or player_score > dealer_score:
+                result = RESULT_WIN
+            elif player_score < dealer_score:
+                result = RESULT_LOSS
+            else:
+                result = RESULT_TIE
+        self._log(history.EVENT_RESULT, seat.id, arg=result)
+        if hand.bet:
+            payout = self.rule_table.payout(result, hand.bet, natural)
+            self.payouts[seat.id] = self.payouts.get(seat.id, 0) + payout
+            self.outbox.append((SETTLE, seat.id, result, payout, 0, index))
+        last_rank, last_suit = self.dealer_hand[-1]
+        self.outbox.append((SEND_SEAT, seat.id, result, last_rank, last_suit, index))
+        return result
@@ -0,0 +1,151 @@
+# history.py
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+
+# =========================
+# Record format
+# =========================
+# File header:
+# Magic (4B) | Version (2B) | Record size (2B)
+#
+# Fixed-size record (22B):
+# Timestamp (8B float) | Round id (4B) | Player id (2B) | Table id (1B) |
+# Event (1B) | Rank (1B) | Suit (1B) | Arg (4B)
+HISTORY_MAGIC = b"BJHH"
+HISTORY_VERSION = 1
+HISTORY_HEADER = struct.Struct("!4sHH")
+HISTORY_RECORD = struct.Struct("!dIHBBBBI")
+
+# Events
+EVENT_ROUND_START = 0x1   # arg = players dealt in
+EVENT_PLAYER_CARD = 0x2   # arg = hand index (1+ for split hands)
+EVENT_DEALER_CARD = 0x3   # arg = 1 for the hole card
+EVENT_DECISION = 0x4      # arg = DECISION_CODE_*
+EVENT_RESULT = 0x5        # arg = RESULT_* from the protocol; one per hand, in hand order
+EVENT_ROUND_END = 0x6
+EVENT_ROUND_SEED = 0x7    # arg = 32-bit seed the round's deck was shuffled with
+EVENT_ROUND_RULES = 0x8   # arg = rule profile id; only logged for non-classic tables
+EVENT_SEAT_REMOVED = 0x9  # the seat left mid-round (disconnect); no more turns or results
+
+DECISION_CODE_HIT = 0
+DECISION_CODE_STAND = 1
+DECISION_CODE_TIMEOUT = 2
+DECISION_CODE_DOUBLE = 3
+DECISION_CODE_SPLIT = 4
+
+# Writer tuning
+GROUP_COMMIT_MAX = 4096   # records per write() call
+FSYNC_INTERVAL = 1.0      # seconds between fsyncs while records keep coming
+
+HandRecord = namedtuple(
+    "HandRecord",
+    "timestamp round_id player_id table_id event rank suit arg"
+)
+
+_STOP = object()
+
+
+class HandHistoryWriter:
+    """
+    Append-only hand-history log. log() only enqueues a tuple; a background
+    thread batches everything queued into one write (group commit) and
+    fsyncs at most every FSYNC_INTERVAL seconds.
+    """
+
+    def __init__(self, path: str, fsync_interval: float = FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.records_written = 0
+        self._queue = queue.SimpleQueue()
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if os.fstat(self._fd).st_size == 0:
+            os.write(self._fd, HISTORY_HEADER.pack(HISTORY_MAGIC, HISTORY_VERSION, HISTORY_RECORD.size))
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    def log(self, table_id: int, round_id: int, event: int,
+            player_id: int = 0, card=None, arg: int = 0):
+        rank, suit = card if card is not None else (0, 0)
+        self._queue.put((time.time(), round_id, player_id, table_id, event, rank, suit, arg))
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _writer_loop(self):
+        pack = HISTORY_RECORD.pack
+        last_fsync = time.monotonic()
+        dirty = False
+        stopping = False
+        while not stopping:
+            # Block only while idle; sync outstanding data before sleeping
+            try:
+                item = self._queue.get(timeout=self.fsync_interval if dirty else None)
+            except queue.Empty:
+                os.fsync(self._fd)
+                last_fsync = time.monotonic()
+                dirty = False
+                continue
+
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(pack(*item))
+                if len(batch) >= GROUP_COMMIT_MAX:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                os.write(self._fd, b"".join(batch))
+                self.records_written += len(batch)
+                dirty = True
+
+            now = time.monotonic()
+            if dirty and (stopping or now - last_fsync >= self.fsync_interval):
+                os.fsync(self._fd)
+                last_fsync = now
+                dirty = False
+
+        os.close(self._fd)
+
+
+def scan_history(path: str):
+    """
+    Yields HandRecord tuples from a log using a read-only memory map, so
+    multi-GB logs are scanned without being loaded into memory. A torn
+    record at the tail (crash mid-write) is ignored.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HISTORY_HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, record_size = HISTORY_HEADER.unpack_from(mm, 0)
+            if magic != HISTORY_MAGIC or record_size != HISTORY_RECORD.size:
+                raise ValueError(f"Not a hand-history log: {path}")
+            start = HISTORY_HEADER.size
+            end = start + (size - start) // record_size * record_size
+            view = memoryview(mm)
+            try:
+                for fields in HISTORY_RECORD.iter_unpack(view[start:end]):
+                    yield HandRecord._make(fields)
+            finally:
+                view.release()
+
+
+def read_round(path: str, table_id: int, round_id: int):
+    """Returns every record of one round, in log order."""
+    return [
+        record for record in scan_history(path)
+        if record.table_id == table_id and record.round_id == round_id
+    ]
@@ -0,0 +1,263 @@
+# profiling.py
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+# =========================
+# Config
+# =========================
+PROFILE_WINDOW = 30.0          # seconds a capture runs unless told otherwise
+PROFILE_DIR = "."              # where captures are written
+SAMPLE_INTERVAL = 0.005        # seconds between stack samples
+CPROFILE_GRACE = 30.0          # wait this long after the window for busy threads to hand in stats
+
+MODE_SAMPLE = "sample"         # stack sampler over every thread -> collapsed stacks
+MODE_CPROFILE = "cprofile"     # deterministic cProfile of the table threads -> pstats
+
+# The capture in progress, or None. Read without a lock on the hot path:
+# when profiling is off, span() costs one global lookup.
+_active = None
+_start_lock = threading.Lock()
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("capture", "phase", "started")
+
+    def __init__(self, capture, phase: str):
+        self.capture = capture
+        self.phase = phase
+
+    def __enter__(self):
+        self.capture.checkpoint()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.capture.record_span(self.phase, time.perf_counter() - self.started)
+        self.capture.checkpoint()
+        return False
+
+
+def span(phase: str):
+    """
+    Times one phase of a round (deal, player turns, dealer turn, ...)
+    while a capture runs; a shared no-op otherwise.
+    """
+    capture = _active
+    if capture is None:
+        return _NO_SPAN
+    return _Span(capture, phase)
+
+
+class Capture:
+    """
+    One profiling window. In sample mode a background thread samples the
+    stacks of every thread; in cProfile mode each table thread enables its
+    own profiler at its next span boundary and hands in its stats at the
+    first boundary after the window closed. On Python 3.12+ cProfile runs
+    on sys.monitoring, which allows one active profiler per process, so
+    there only one table thread at a time is profiled; the others retry at
+    their next boundary. Both modes also add up the wall time spent per
+    span phase.
+    """
+
+    def __init__(self, mode: str, seconds: float, prefix: str):
+        self.mode = mode
+        self.prefix = prefix
+        self.deadline = time.monotonic() + seconds
+        self.lock = threading.Lock()
+        self.spans = {}            # phase -> [count, seconds]
+        self.stacks = Counter()    # collapsed stack -> samples
+        self.samples = 0
+        self.profilers = {}        # thread ident -> cProfile.Profile, while enabled
+        self.refused = 0           # enrollments refused while another profiler was active (3.12+)
+        self.stats = None
+        self.submitted = threading.Condition(self.lock)
+        self.finished = False
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def record_span(self, phase: str, seconds: float):
+        with self.lock:
+            entry = self.spans.get(phase)
+            if entry is None:
+                self.spans[phase] = [1, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+
+    def checkpoint(self):
+        """cProfile mode: enrolls the calling thread, or hands in its stats once expired."""
+        if self.mode != MODE_CPROFILE:
+            return
+        ident = threading.get_ident()
+        profiler = self.profilers.get(ident)
+        if profiler is None:
+            if not self.expired:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # "Another profiling tool is already active" (Python 3.12+)
+                    with self.lock:
+                        self.refused += 1
+                    return
+                with self.lock:
+                    self.profilers[ident] = profiler
+            return
+        if self.expired:
+            self.hand_in(ident, profiler)
+
+    def hand_in(self, ident: int, profiler):
+        """Switches off a thread's profiler and merges its stats into the capture."""
+        profiler.disable()
+        with self.lock:
+            del self.profilers[ident]
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+            self.submitted.notify_all()
+            # A straggler after the output was written: the capture stays
+            # active until the last profiler is switched off
+            release = self.finished and not self.profilers
+        if release:
+            _release(self)
+
+    def _sample(self):
+        me = threading.get_ident()
+        while not self.expired:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(SAMPLE_INTERVAL)
+
+    def run(self):
+        """Runs on the capture's own thread until the window is over, then writes the output."""
+        if self.mode == MODE_SAMPLE:
+            self._sample()
+        else:
+            time.sleep(max(0.0, self.deadline - time.monotonic()))
+            with self.lock:
+                self.submitted.wait_for(lambda: not self.profilers, timeout=CPROFILE_GRACE)
+        finish(self)
+
+    def write(self):
+        """Writes <prefix>.spans.txt and <prefix>.folded or <prefix>.pstats; returns the paths."""
+        paths = []
+        spans_path = self.prefix + ".spans.txt"
+        with self.lock:
+            spans = sorted(self.spans.items(), key=lambda item: -item[1][1])
+        with open(spans_path, "w") as f:
+            f.write(f"{'phase':<16}{'count':>8}{'total s':>12}{'mean ms':>12}\n")
+            for phase, (count, seconds) in spans:
+                f.write(f"{phase:<16}{count:>8}{seconds:>12.3f}{1000 * seconds / count:>12.3f}\n")
+        paths.append(spans_path)
+
+        if self.mode == MODE_SAMPLE:
+            folded_path = self.prefix + ".folded"
+            with open(folded_path, "w") as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            paths.append(folded_path)
+        elif self.stats is not None:
+            stats_path = self.prefix + ".pstats"
+            self.stats.dump_stats(stats_path)
+            paths.append(stats_path)
+        return paths
+
+
+def idle():
+    """
+    Called by a thread about to block for an unbounded time (an empty
+    table waiting for players): hands in its cProfile stats now instead of
+    holding the capture open. It enrolls again at its next span.
+    """
+    capture = _active
+    if capture is None:
+        return
+    ident = threading.get_ident()
+    profiler = capture.profilers.get(ident)
+    if profiler is not None:
+        capture.hand_in(ident, profiler)
+
+
+def start(seconds: float = PROFILE_WINDOW, mode: str = MODE_SAMPLE, prefix: str = None):
+    """
+    Starts a capture unless one is already running; returns it (or None).
+    Called for the --profile flag and from the signal handlers.
+    """
+    global _active
+    if mode not in (MODE_SAMPLE, MODE_CPROFILE):
+        raise ValueError(f"Unknown profiling mode: {mode!r}")
+    with _start_lock:
+        if _active is not None:
+            return None
+        if prefix is None:
+            prefix = os.path.join(PROFILE_DIR, time.strftime("profile-%Y%m%d-%H%M%S"))
+        capture = Capture(mode, seconds, prefix)
+        _active = capture
+    print(f"[PROFILE] {mode} capture for {seconds:.0f}s -> {prefix}.*")
+    threading.Thread(target=capture.run, name="profiler", daemon=True).start()
+    return capture
+
+
+def _release(capture: Capture):
+    global _active
+    with _start_lock:
+        if _active is capture:
+            _active = None
+
+
+def finish(capture: Capture):
+    try:
+        paths = capture.write()
+        print(f"[PROFILE] Capture written: {', '.join(paths)}")
+        if capture.refused:
+            print(f"[PROFILE] {capture.refused} thread enrollments skipped: this Python runs one cProfile "
+                  f"profiler at a time, so the pstats cover fewer table threads")
+    except OSError as e:
+        print(f"[PROFILE] Could not write capture: {e}")
+    with capture.lock:
+        capture.finished = True
+        idle = not capture.profilers
+    if idle:
+        _release(capture)
+
+
+def install_signal_handlers():
+    """SIGUSR1 starts a sampling capture, SIGUSR2 a cProfile capture (POSIX only)."""
+    import signal
+    # Handlers can only be installed from the main thread
+    if not hasattr(signal, "SIGUSR1") or threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(signal.SIGUSR1, lambda signum, frame: start(mode=MODE_SAMPLE))
+    signal.signal(signal.SIGUSR2, lambda signum, frame: start(mode=MODE_CPROFILE))
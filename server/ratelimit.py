@@ -0,0 +1,38 @@
+# ratelimit.py
+import time
+
+# =========================
+# Config
+# =========================
+PACKET_RATE = 20.0      # packets/sec a client may sustain (one per turn prompt is plenty)
+PACKET_BURST = 40       # packets a client may send back to back
+MAX_VIOLATIONS = 5      # malformed or over-limit packets before the client is dropped
+DRAIN_LIMIT = 16 * 14   # bytes of out-of-turn input discarded per turn at most
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `burst`.
+    take() is a couple of float operations, cheap enough to run on the
+    table thread for every packet.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "stamp", "clock")
+
+    def __init__(self, rate: float = PACKET_RATE, burst: int = PACKET_BURST, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.stamp = clock()
+
+    def take(self, count: int = 1) -> bool:
+        """Spends `count` tokens; returns False (spending none) if there are not enough."""
+        now = self.clock()
+        tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if tokens < count:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - count
+        return True
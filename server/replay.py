@@ -0,0 +1,270 @@
+# replay.py
+import socket
+import sys
+import time
+from collections import Counter, deque, namedtuple
+
+from . import history
+from . import server
+from .shuffle import CARDS
+
+from common import rules
+from common.protocol import (
+    pack_payload,
+    DECISION_DOUBLE,
+    DECISION_HIT,
+    DECISION_SPLIT,
+    DECISION_STAND,
+    PROTOCOL_REVISION,
+    RESULT_YOUR_TURN,
+)
+
+# Offset of the Result byte inside a 14-byte payload
+PAYLOAD_RESULT_OFFSET = 10
+
+_DECISIONS = {
+    history.DECISION_CODE_HIT: DECISION_HIT,
+    history.DECISION_CODE_STAND: DECISION_STAND,
+    history.DECISION_CODE_TIMEOUT: None,
+    history.DECISION_CODE_DOUBLE: DECISION_DOUBLE,
+    history.DECISION_CODE_SPLIT: DECISION_SPLIT,
+}
+
+RecordedRound = namedtuple(
+    "RecordedRound",
+    "table_id round_id seed house_rules cards player_ids decisions removals records"
+)
+ReplayResult = namedtuple(
+    "ReplayResult",
+    "table_id round_id matches expected actual"
+)
+
+
+# =========================
+# In-memory stand-ins
+# =========================
+class FakeConnection:
+    """
+    Socket stand-in fed from a recorded decision stream. Like a real client,
+    it only "sends" its next decision after the server signals its turn, so
+    drain_socket_buffer() sees an empty buffer. A None decision (or an
+    exhausted stream) replays as a turn timeout. A seat removed mid-round
+    fails its first send once the replayed log is as long as it was when
+    the original seat was removed, so it leaves at the same point.
+    """
+
+    def __init__(self, decisions, history=None, removed_at=None):
+        self._decisions = deque(decisions)
+        self._pending = b""
+        self._timeout = None
+        self._history = history
+        self._removed_at = removed_at
+        self.sent = []
+        self.closed = False
+
+    def sendall(self, data: bytes):
+        if self._removed_at is not None and len(self._history.records) >= self._removed_at:
+            self.closed = True
+        if self.closed:
+            raise OSError("connection closed")
+        self.sent.append(data)
+        if data[PAYLOAD_RESULT_OFFSET] == RESULT_YOUR_TURN:
+            decision = self._decisions.popleft() if self._decisions else None
+            if decision is not None:
+                self._pending = pack_payload(decision, 0, 0, 0)
+
+    def send(self, data) -> int:
+        self.sendall(bytes(data))
+        return len(data)
+
+    def recv(self, size: int, flags: int = 0) -> bytes:
+        if self._pending:
+            chunk, self._pending = self._pending[:size], self._pending[size:]
+            return chunk
+        if self._timeout == 0.0:
+            raise BlockingIOError
+        raise socket.timeout
+
+    def settimeout(self, value):
+        self._timeout = value
+
+    def gettimeout(self):
+        return self._timeout
+
+    def close(self):
+        self.closed = True
+
+
+class MemoryHistory:
+    """Collects hand-history records in memory, without timestamps."""
+
+    def __init__(self):
+        self.records = []
+
+    def log(self, table_id: int, round_id: int, event: int,
+            player_id: int = 0, card=None, arg: int = 0):
+        rank, suit = card if card is not None else (0, 0)
+        self.records.append((round_id, player_id, table_id, event, rank, suit, arg))
+
+
+# =========================
+# Loading recorded rounds
+# =========================
+def _strip_timestamp(record):
+    return tuple(record[1:])
+
+
+def build_recorded_round(records) -> RecordedRound:
+    first = records[0]
+    seed = None
+    house_rules = rules.CLASSIC
+    cards = []
+    player_ids = []
+    decisions = {}
+    # Player id -> records logged before its removal. Seats dropped by the
+    # same failed delivery are removed together, after all of its sends
+    removals = {}
+    removed_run = None
+    for index, record in enumerate(records):
+        if record.event != history.EVENT_SEAT_REMOVED:
+            removed_run = None
+        elif removed_run is None:
+            removed_run = index
+        if record.event == history.EVENT_ROUND_SEED:
+            seed = record.arg
+        elif record.event == history.EVENT_ROUND_RULES:
+            house_rules = rules.PROFILES_BY_ID[record.arg]
+        elif record.event == history.EVENT_DEALER_CARD:
+            cards.append((record.rank, record.suit))
+        elif record.event == history.EVENT_PLAYER_CARD:
+            cards.append((record.rank, record.suit))
+            if record.player_id not in decisions:
+                player_ids.append(record.player_id)
+                decisions[record.player_id] = []
+        elif record.event == history.EVENT_DECISION:
+            decisions[record.player_id].append(_DECISIONS[record.arg])
+        elif record.event == history.EVENT_SEAT_REMOVED:
+            removals[record.player_id] = removed_run
+    return RecordedRound(
+        table_id=first.table_id,
+        round_id=first.round_id,
+        seed=seed,
+        house_rules=house_rules,
+        cards=cards,
+        player_ids=player_ids,
+        decisions=decisions,
+        removals=removals,
+        records=[_strip_timestamp(record) for record in records],
+    )
+
+
+def iter_recorded_rounds(path: str):
+    """
+    Streams complete rounds out of a hand-history log. Records of tables
+    that play concurrently are interleaved, so rounds are buffered until
+    their ROUND_END record arrives.
+    """
+    open_rounds = {}
+    for record in history.scan_history(path):
+        key = (record.table_id, record.round_id)
+        open_rounds.setdefault(key, []).append(record)
+        if record.event == history.EVENT_ROUND_END:
+            records = open_rounds.pop(key)
+            if any(r.event == history.EVENT_PLAYER_CARD for r in records):
+                yield build_recorded_round(records)
+
+
+# =========================
+# Replay
+# =========================
+def stacked_deck(cards, decks: int = 1):
+    """
+    Rebuilds a deck (or shoe) that deals `cards` in order (the table pops
+    from the end), followed by the undealt cards. Used for rounds dealt
+    from the CSPRNG shuffle service, which have no seed to replay from.
+    """
+    dealt = Counter(cards)
+    undealt = []
+    for card in CARDS * decks:
+        if dealt[card]:
+            dealt[card] -= 1
+        else:
+            undealt.append(card)
+    return undealt + cards[::-1]
+
+
+def replay_round(recorded: RecordedRound) -> ReplayResult:
+    """
+    Re-runs server.play_table_round for a recorded round against fake
+    connections and compares the produced records with the original ones.
+    Seeded rounds are reshuffled from their seed; the others are dealt
+    from a deck stacked with the recorded cards.
+    """
+    memory = MemoryHistory()
+    table = server.CasinoTable(recorded.table_id, memory, house_rules=recorded.house_rules)
+    table.round_id = recorded.round_id
+    players = [
+        server.Player(
+            id=pid,
+            conn=FakeConnection(recorded.decisions[pid], memory, recorded.removals.get(pid)),
+            addr=("replay", pid),
+            name=f"replay-{pid}",
+            remaining_rounds=1,
+            # Card frames never carry a turn prompt, so FakeConnection is
+            # unaffected; the newest revision may double and split
+            revision=PROTOCOL_REVISION
+        )
+        for pid in recorded.player_ids
+    ]
+    table.active_players = list(players)
+    table.game_status = server.GAME_STATUS_IN_PROGRESS
+    table.round_started_at = time.monotonic()
+
+    if recorded.seed is not None:
+        server.play_table_round(table, players, round_seed=recorded.seed)
+    else:
+        server.play_table_round(table, players, deck=stacked_deck(recorded.cards, recorded.house_rules.decks))
+
+    return ReplayResult(
+        table_id=recorded.table_id,
+        round_id=recorded.round_id,
+        matches=memory.records == recorded.records,
+        expected=recorded.records,
+        actual=memory.records,
+    )
+
+
+def replay_log(path: str):
+    """Yields a ReplayResult for every complete round in the log."""
+    for recorded in iter_recorded_rounds(path):
+        yield replay_round(recorded)
+
+
+def first_divergence(path: str):
+    """Returns the first round whose replay differs from the log, or None."""
+    for result in replay_log(path):
+        if not result.matches:
+            return result
+    return None
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python -m server.replay <hand_history.bjh>")
+        return
+
+    started = time.perf_counter()
+    rounds = 0
+    diverged = 0
+    for result in replay_log(sys.argv[1]):
+        rounds += 1
+        if not result.matches:
+            diverged += 1
+            print(f"[REPLAY] Table {result.table_id} round {result.round_id} diverged")
+    elapsed = time.perf_counter() - started
+    rate = rounds / elapsed if elapsed > 0 else 0.0
+    print(f"[REPLAY] {rounds} rounds replayed, {diverged} diverged ({rate:.0f} rounds/sec)")
+
+
+if __name__ == "__main__":
+    main()
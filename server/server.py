@@ -1,40 +1,106 @@
 # server.py
+import heapq
+import random
+import secrets
+import select
 import socket
+import ssl
+import sys
 import threading
 import time
 from dataclasses import dataclass, field
 
+from . import admission
+from . import bank
 from . import blackjack
-
+from . import engine
+from . import history
+from . import profiling
+from . import ratelimit
+from . import shoe
+from . import stats
+from . import timers
+from . import tracing
+
+from bot.strategy import PolicyTable, TableState, strategy
+from common import rules
+from common import tls
 from common.protocol import (
+    pack_account,
+    pack_card_frame,
     pack_offer,
     pack_payload,
+    pack_session,
+    pack_snapshot,
+    request_size,
     unpack_request,
+    unpack_request_options,
+    ACCOUNT_OPENED,
+    ACCOUNT_SETTLED,
+    ACCOUNT_STAKED,
+    MSG_TYPE_REQUEST_EXT,
+    NO_TOKEN,
+    SEAT_AWAY,
+    SEAT_BUSTED,
+    SEAT_STANDING,
+    SEAT_WAITING,
+    REQUEST_FLAG_SPECTATE,
+    PROTOCOL_REVISION,
+    PROTOCOL_REVISION_FRAMES,
+    PROTOCOL_REVISION_LEGACY,
+    PROTOCOL_REVISION_MULTI_HAND,
+    PROTOCOL_REVISION_RULES,
+    PROTOCOL_REVISION_WIDE_IDS,
+    TARGET_DEALER,
+    TARGET_SEAT,
+    TARGET_SELF,
+    FRAME_ACTION_DOUBLE,
+    FRAME_ACTION_HIT,
+    FRAME_ACTION_SPLIT,
+    FRAME_ACTION_STAND,
+    DECISION_DOUBLE,
+    DECISION_SPLIT,
     DECISION_STAND,
     RESULT_NOT_OVER,
-    RESULT_LOSS,
-    RESULT_TIE,
-    RESULT_WIN,
     RESULT_YOUR_TURN,
-    RESULT_OPPONENT_CARD,
-    DECISION_HIT,
 )
 
 # =========================
 # Config
 # =========================
 BROADCAST_PORT = 13122
-OFFER_INTERVAL = 1.0
+OFFER_INTERVAL = 1.0       # normal offer rate while seats are available
+OFFER_INTERVAL_MAX = 8.0   # back-off ceiling while every seat is taken
 SERVER_NAME = "BlackjackServer"
 
+TABLE_COUNT = 1
+MAX_SEATS = 5              # matches the five seats rendered by the client UI
+
 # Separate timeouts:
 REQUEST_TIMEOUT = 5.0      # only for reading the initial request packet
-GAMEPLAY_TIMEOUT = 120.0    # allow user time to think/type during rounds
+GAMEPLAY_TIMEOUT = 120.0    # players silent this long are reaped as idle
 TURN_TIMEOUT = 15.0  # seconds per player turn
+SEND_TIMEOUT = 5.0   # how long a delivery may wait for slow clients' full buffers to drain
+REAP_INTERVAL = 5.0  # how often idle/dead connections are swept
+RESUME_GRACE = 30.0  # seconds a dropped player's seat is held for resumption
 GAME_STATUS_WAITING = "WAITING"
 GAME_STATUS_IN_PROGRESS = "IN_PROGRESS"
 
 ROUND_JOIN_WINDOW = 10
+ROUND_ETA_SMOOTHING = 0.2  # EWMA weight of the latest round duration
+BOT_FILL_SEATS = 0   # seats kept filled with server-side bots while humans play (e.g. 3), 0 disables bots
+BOT_STRATEGY = "basic"  # strategy the bot seats play (bot/strategy.py)
+BOT_JOIN_WINDOW = 3  # join window while bots fill the table, so a lone human isn't kept waiting
+
+HISTORY_PATH = "hand_history.bjh"  # append-only audit log, None disables it
+TABLE_SEED = None  # fixed seed for reproducible (non-production) tables, None shuffles with the CSPRNG
+LEDGER_PATH = "bank.db"  # SQLite balances and wager ledger, None disables wagering
+TABLE_RULES = ("classic",)  # rule profile per table (common/rules.py), repeated across the tables
+SHOE_TABLES = False  # deal each table from a persistent shoe (reshuffled at the cut card) instead of a fresh deck per round
+TRACE_PATH = None  # JSON lines file of per-phase round spans (appended, never rotated), None keeps them in memory only
+STATS_PATH = "player_stats.json"  # compacted per-player/per-table outcome counters, None keeps them in memory only
+TLS_CERT_PATH = None  # PEM certificate chain; with TLS_KEY_PATH set, gameplay runs over TLS
+TLS_KEY_PATH = None
 
 @dataclass
 class Player:
@@ -46,43 +112,180 @@ class Player:
     hand: list = field(default_factory=list)
     is_busted: bool = False
     is_standing: bool = False
+    # Doubles and splits; these fields are the first hand, see engine.Seat
+    doubled: bool = False
+    split_hands: list = None
+    hand_index: int = 0
+    last_active: float = field(default_factory=time.monotonic)
+    # Wagering: bet per hand asked for, chips held for the current hand, and
+    # whether the client sent an extended request (understands account packets)
+    wager: int = 0
+    bet: int = 0
+    wagering: bool = False
+    staked: int = 0   # chips staked this round, doubles and splits included
+    # Session resumption: token issued to extended-request clients; while
+    # disconnected_at is set the socket is dead and the seat is held
+    token: bytes = b""
+    disconnected_at: float = None
+    grace_timer: object = None
+    # Negotiated protocol revision; revision 1+ gets numbered card frames
+    revision: int = PROTOCOL_REVISION_LEGACY
+    frame_seq: int = 0
+    # Packet policing: token bucket for network clients (None = unlimited,
+    # e.g. replay's in-memory connections) and malformed/over-limit count
+    bucket: object = None
+    violations: int = 0
+    # Server-side bot seat: the PolicyTable it plays; it has no socket and
+    # no thread, and never holds an account
+    bot: object = None
 
 
 
 class CasinoTable:
-    def __init__(self):
+    def __init__(self, table_id: int = 1, hand_history=None, seed=None, accounts=None, tracer=None,
+                 house_rules=rules.CLASSIC, use_shoe=False, stats_service=None, bot_strategy=None):
+        self.table_id = table_id
+        self.stats = stats_service
+        self.house_rules = house_rules
+        self.hand_history = hand_history
+        self.accounts = accounts
+        self.tracer = tracer
+        # Seeded tables draw a per-round seed from this stream; unseeded
+        # tables deal from the CSPRNG shuffle service instead
+        self.rng = random.Random(seed) if seed is not None else None
+        self.round_id = 0
+        self.engine = engine.TableEngine(table_id, hand_history, tracer, house_rules)
+        # Shoe tables keep one shoe across rounds; seeded ones shuffle it
+        # from the table's stream, and their rounds have no per-round seed
+        self.shoe = None
+        if use_shoe:
+            reserve = shoe.round_reserve(house_rules, MAX_SEATS)
+            self.shoe = shoe.Shoe(house_rules.decks, self.rng, reserve=reserve)
+        self.counting = shoe.CountTracker()
+        self.round_true_count = 0.0
+        # Bot seats fill the table around its humans; they are kept apart
+        # from active_players, so they never count as occupied seats
+        self.bot_policy = PolicyTable(bot_strategy, self.engine.rule_table) if bot_strategy is not None else None
+        self.bots = []
+        # Turn deadlines and join windows run on the shared timer wheel;
+        # the waker interrupts the table thread's select() when one fires
+        self.timers = timers.default_wheel()
+        self.waker = timers.Waker()
+        self.player_joined = threading.Event()
+        self.current_player = None
         self.active_players = []
         self.waiting_room = []
         self.game_status = GAME_STATUS_WAITING
         self.lock = threading.Lock()
         self.dealer_hand = []
+        # Player ids are unique per table; ids of players who left are
+        # reused lowest first, after the round they may still appear in
         self.next_player_id = 1
+        self.free_ids = []
+        self.retired_ids = []
+        # Spectators watch without a seat; they get public messages only
+        self.spectators = []
+        # (player, conn) pairs owed a snapshot, served by the table thread;
+        # a conn other than player.conn is a resumed session's new socket
+        self.pending_snapshots = []
+        # Packet policing counters, updated by the table thread
+        self.packets_malformed = 0
+        self.packets_limited = 0
+        self.clients_dropped = 0
+        # Round timing, used to advertise when the next round starts
+        self.join_deadline = None
+        self.round_started_at = None
+        self.avg_round_seconds = float(ROUND_JOIN_WINDOW)
+
+
+# Set whenever a seat frees up so the offer loop can advertise it right away
+seat_freed = threading.Event()
+
+# Resume token -> (table, player) for every seated extended-request client
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+def table_seats_free(table: CasinoTable) -> int:
+    return max(0, MAX_SEATS - len(table.active_players) - len(table.waiting_room))
+
+
+def table_round_eta(table: CasinoTable) -> float:
+    """Seconds until a player joining now would be dealt in."""
+    now = time.monotonic()
+    if table.game_status == GAME_STATUS_IN_PROGRESS and table.round_started_at is not None:
+        remaining = max(0.0, table.avg_round_seconds - (now - table.round_started_at))
+        return remaining + join_window(table)
+    if table.join_deadline is not None:
+        return max(0.0, table.join_deadline - now)
+    return float(join_window(table))
+
+
+def join_window(table: CasinoTable) -> float:
+    return BOT_JOIN_WINDOW if table.bots else ROUND_JOIN_WINDOW
+
+
+def server_capacity(tables):
+    """Returns (seats_free, load_percent, active_tables, round_eta) across all tables."""
+    seats_free = 0
+    active_tables = 0
+    round_eta = None
+    for table in tables:
+        with table.lock:
+            free = table_seats_free(table)
+            occupied = bool(table.active_players or table.waiting_room)
+            eta = table_round_eta(table)
+        seats_free += free
+        if occupied:
+            active_tables += 1
+        if free and (round_eta is None or eta < round_eta):
+            round_eta = eta
+    total_seats = MAX_SEATS * len(tables)
+    load = 100 * (total_seats - seats_free) // total_seats if total_seats else 100
+    return seats_free, load, active_tables, round_eta or 0
+
+
+def choose_table(tables):
+    """Seats players together: fullest table that still has a free seat."""
+    best = None
+    best_free = None
+    for table in tables:
+        with table.lock:
+            free = table_seats_free(table)
+        if free and (best_free is None or free < best_free):
+            best, best_free = table, free
+    if best is not None:
+        return best
+    # Every seat is taken: queue on the table whose waiting room is shortest
+    return min(tables, key=lambda t: len(t.waiting_room))
 
 # =========================
 # UDP Offer Thread
 # =========================
-def udp_offer_loop(tcp_port: int):
+def udp_offer_loop(tcp_port: int, tables):
     udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
 
-    offer_packet = pack_offer(tcp_port, SERVER_NAME)
-
+    interval = OFFER_INTERVAL
     while True:
+        seats_free, load, active_tables, round_eta = server_capacity(tables)
+        offer_packet = pack_offer(
+            tcp_port,
+            SERVER_NAME,
+            seats_free=seats_free,
+            load=load,
+            active_tables=active_tables,
+            round_eta=round_eta
+        )
         udp_socket.sendto(offer_packet, ("<broadcast>", BROADCAST_PORT))
-        time.sleep(OFFER_INTERVAL)
-
 
-def recv_exact(conn: socket.socket, size: int):
-    data = b""
-    while len(data) < size:
-        try:
-            chunk = conn.recv(size - len(data))
-        except socket.timeout:
-            return None
-        if not chunk:
-            return None
-        data += chunk
-    return data
+        # Saturated servers back off exponentially; a freed seat resets the rate
+        if seats_free == 0:
+            interval = min(interval * 2, OFFER_INTERVAL_MAX)
+        else:
+            interval = OFFER_INTERVAL
+        if seat_freed.wait(interval):
+            seat_freed.clear()
 
 
 def get_local_ip():
@@ -102,41 +305,53 @@ def get_local_ip():
 # =========================
 # TCP Client Handler
 # =========================
-def handle_client(conn: socket.socket, addr, table: CasinoTable):
+def handle_request(conn: socket.socket, addr, data: bytes, tables):
+    """
+    Called by the handshake stage once the full request packet arrived.
+    The socket is already non-blocking; timing is done by the timer wheel.
+    """
     registered = False
     try:
-        # 1) Timeout only for receiving the initial request
-        conn.settimeout(REQUEST_TIMEOUT)
-        data = recv_exact(conn, 38)
-        if not data:
-            print(f"[TCP] No request received from {addr} (timeout/disconnect).")
-            return
-        try:
-            conn.settimeout(0.1)
-            peek_byte = conn.recv(1, socket.MSG_PEEK)
-            if peek_byte in (b"\n", b"\r"):
-                conn.recv(1)
-        except socket.timeout:
-            pass
         rounds, client_name = unpack_request(data)
+        options = unpack_request_options(data)
+        extended = data[4] == MSG_TYPE_REQUEST_EXT
+        if options.token != NO_TOKEN and resume_session(conn, client_name, options.token):
+            print(f"[TCP] Client {addr} -> name='{client_name}' resumed its session")
+            registered = True
+            return
+        if extended and options.flags & REQUEST_FLAG_SPECTATE:
+            print(f"[TCP] Client {addr} -> name='{client_name}' watching {rounds} rounds")
+            add_spectator(conn, addr, client_name, rounds, min(options.revision, PROTOCOL_REVISION), tables)
+            registered = True
+            return
         print(f"[TCP] Client {addr} -> name='{client_name}', rounds={rounds}")
 
-        # 2) Gameplay timeout should be long enough for human input
-        conn.settimeout(GAMEPLAY_TIMEOUT)
-
-        with table.lock:
-            pid = table.next_player_id
-            table.next_player_id += 1
-
+        table = choose_table(tables)
         player = Player(
-            id=pid,
+            id=0,
             conn=conn,
             addr=addr,
             name=client_name,
-            remaining_rounds=rounds
+            remaining_rounds=rounds,
+            bucket=ratelimit.TokenBucket()
         )
+        if extended:
+            player.revision = min(options.revision, PROTOCOL_REVISION)
+            player.token = secrets.token_bytes(len(NO_TOKEN))
+            send_packet(conn, pack_session(player.token, RESUME_GRACE))
+            if player.revision >= PROTOCOL_REVISION_RULES:
+                send_packet(conn, rules.pack_house_rules(table.house_rules))
+        if table.accounts is not None:
+            # The account is loaded here, on a handshake worker, so the
+            # table thread never waits on the database
+            balance = table.accounts.open_account(client_name)
+            player.wager = options.bet
+            player.wagering = extended
+            if player.wagering:
+                send_packet(conn, pack_account(balance, 0, ACCOUNT_OPENED))
         should_wait = False
         with table.lock:
+            player.id = allocate_player_id(table)
             if table.game_status == GAME_STATUS_WAITING:
                 table.active_players.append(player)
                 registered = True
@@ -144,12 +359,18 @@ def handle_client(conn: socket.socket, addr, table: CasinoTable):
                 table.waiting_room.append(player)
                 should_wait = True
                 registered = True
+        if player.token:
+            with sessions_lock:
+                sessions[player.token] = (table, player)
+        table.player_joined.set()
         if should_wait:
-            send_waiting_payload(conn)
+            if extended:
+                # Late joiners see the round in progress right away
+                request_snapshot(table, player)
+            else:
+                send_waiting_payload(conn)
         display_dashboard(table)
 
-    except socket.timeout:
-        print(f"[TCP] Timeout from {addr} (request or gameplay).")
     except Exception as e:
         print(f"[TCP] Error from {addr}: {e}")
     finally:
@@ -160,6 +381,37 @@ def handle_client(conn: socket.socket, addr, table: CasinoTable):
                 pass
 
 
+def send_packet(conn: socket.socket, data: bytes, deadline: float = None):
+    """
+    sendall() for the non-blocking gameplay sockets. The socket stays
+    non-blocking; a full send buffer is waited out in select() until
+    `deadline` (time.monotonic(), SEND_TIMEOUT from now by default).
+    deliver() passes one deadline to all of its sends, so stalled clients
+    hold the table up for SEND_TIMEOUT at most per delivery, together.
+    Past the deadline it raises socket.timeout (an OSError), and the
+    client is handled like a dropped connection.
+    """
+    view = memoryview(data)
+    while view:
+        try:
+            sent = conn.send(view)
+        except (BlockingIOError, ssl.SSLWantWriteError, ssl.SSLWantReadError) as exc:
+            if deadline is None:
+                deadline = time.monotonic() + SEND_TIMEOUT
+            remaining = deadline - time.monotonic()
+            # TLS may need to read (e.g. a key update) before it can write
+            readers = [conn] if isinstance(exc, ssl.SSLWantReadError) else []
+            writers = [] if readers else [conn]
+            if remaining <= 0 or not any(select.select(readers, writers, [], remaining)[:2]):
+                raise socket.timeout("send timed out")
+            continue
+        view = view[sent:]
+
+
+def seated_count(tables) -> int:
+    return sum(len(t.active_players) + len(t.waiting_room) + len(t.spectators) for t in tables)
+
+
 def send_waiting_payload(conn: socket.socket):
     pkt = pack_payload(
         decision=DECISION_STAND,
@@ -168,323 +420,855 @@ def send_waiting_payload(conn: socket.socket):
         suit=0
     )
     try:
-        conn.sendall(pkt)
+        send_packet(conn, pkt)
     except OSError:
         pass
 
 
-def broadcast(message: bytes, player_list, table: CasinoTable):
-    with table.lock:
-        players_snapshot = list(player_list)
-    dead_players = []
-    for player in players_snapshot:
-        try:
-            player.conn.sendall(message)
-        except OSError:
-            dead_players.append(player)
-    if dead_players:
-        with table.lock:
-            for player in dead_players:
-                if player in player_list:
-                    player_list.remove(player)
-                try:
-                    player.conn.close()
-                except OSError:
-                    pass
+def allocate_player_id(table: CasinoTable) -> int:
+    """Lowest free id on the table. Caller holds table.lock."""
+    if table.free_ids:
+        return heapq.heappop(table.free_ids)
+    pid = table.next_player_id
+    table.next_player_id += 1
+    return pid
+
+
+def release_player_id(table: CasinoTable, pid: int):
+    """
+    Returns an id to the table's free-list. Caller holds table.lock.
+    During a round the id may still label an engine seat, so it is only
+    reused once the round is over.
+    """
+    if table.game_status == GAME_STATUS_WAITING:
+        heapq.heappush(table.free_ids, pid)
+    else:
+        table.retired_ids.append(pid)
+
+
+def recycle_player_ids(table: CasinoTable):
+    """Frees the ids retired during the last round. Caller holds table.lock."""
+    for pid in table.retired_ids:
+        heapq.heappush(table.free_ids, pid)
+    table.retired_ids = []
+
 
 def _encode_opponent_suit(player_id: int, suit: int) -> int:
+    # Legacy payloads only have 6 bits for the id; ids are reused per
+    # table, so this only collides with more than 63 players at one table
     return ((player_id & 0x3F) << 2) | (suit & 0x03)
 
 
-def broadcast_opponent_card(table: CasinoTable, source_player: Player, card):
-    rank, suit = card
-    pkt = pack_payload(
-        decision=DECISION_STAND,
-        result=RESULT_OPPONENT_CARD,
-        rank=rank,
-        suit=_encode_opponent_suit(source_player.id, suit)
-    )
+_FRAME_ACTIONS = {
+    engine.ACTION_HIT: FRAME_ACTION_HIT,
+    engine.ACTION_STAND: FRAME_ACTION_STAND,
+    engine.ACTION_DOUBLE: FRAME_ACTION_DOUBLE,
+    engine.ACTION_SPLIT: FRAME_ACTION_SPLIT,
+}
+
+
+def card_frame(player: Player, kind: int, seat_id: int, result: int, rank: int, suit: int, hand: int):
+    """
+    Encodes one engine message as a card frame for `player`, or returns
+    None if it has no meaning below revision 4. Older clients see a double
+    as a hit and the cards of split hands as if they were one hand.
+    """
+    multi_hand = player.revision >= PROTOCOL_REVISION_MULTI_HAND
+    if kind != engine.SEND_ALL and rank == 0 and suit == engine.ACTION_SPLIT and not multi_hand:
+        return None
+    if not multi_hand:
+        hand = 0
+    seq = player.frame_seq
+    player.frame_seq += 1
+    if kind == engine.SEND_SEAT:
+        if result != RESULT_NOT_OVER:
+            # Results no longer repeat the dealer's last card
+            rank = suit = 0
+        elif rank == 0 and suit == engine.ACTION_SPLIT:
+            return pack_card_frame(seq, TARGET_SELF, seat_id, result, action=FRAME_ACTION_SPLIT, hand=hand)
+        return pack_card_frame(seq, TARGET_SELF, seat_id, result, rank, suit, hand=hand)
+    if kind == engine.SEND_OTHERS:
+        if rank == 0:
+            action = _FRAME_ACTIONS[suit] if multi_hand else (
+                FRAME_ACTION_STAND if suit == engine.ACTION_STAND else FRAME_ACTION_HIT)
+            return pack_card_frame(seq, TARGET_SEAT, seat_id, result, action=action, hand=hand)
+        return pack_card_frame(seq, TARGET_SEAT, seat_id, result, rank, suit, hand=hand)
+    return pack_card_frame(seq, TARGET_DEALER, 0, result, rank, suit)
+
+
+def legacy_payload(kind: int, seat_id: int, result: int, rank: int, suit: int) -> bytes:
+    """
+    Encodes one engine message as a legacy payload. Payloads only know hit
+    and stand: a double reads as a hit and a split is not shown (b"").
+    """
+    if kind == engine.SEND_OTHERS:
+        if rank == 0 and suit != engine.ACTION_STAND:
+            if suit == engine.ACTION_SPLIT:
+                return b""
+            suit = engine.ACTION_HIT
+        suit = _encode_opponent_suit(seat_id, suit)
+    return pack_payload(decision=DECISION_STAND, result=result, rank=rank, suit=suit)
+
+
+def deliver(table: CasinoTable, round_players: dict, messages):
+    """
+    Sends TableEngine output to the players of the current round.
+    Legacy clients get one payload per message; revision 1+ clients get
+    card frames, batched into one write per engine step.
+    A player whose socket fails keeps the seat if the session can be
+    resumed; otherwise it is dropped from round_players, removed from the
+    table and reported to the engine, whose follow-up messages (e.g. the
+    dealer turn, if that was the last open seat) are sent too.
+    """
+    deadline = time.monotonic() + SEND_TIMEOUT
+    while messages:
+        failed = []
+        batches = {}
+
+        def drop(player):
+            if player.id == 0:
+                remove_spectator(table, player)
+            elif not suspend_player(table, player):
+                round_players.pop(player.id, None)
+                failed.append(player)
+
+        def send(player, pkt):
+            if player.revision >= PROTOCOL_REVISION_FRAMES:
+                batches.setdefault(id(player), (player, []))[1].append(pkt)
+                return
+            try:
+                send_packet(player.conn, pkt, deadline)
+            except OSError:
+                drop(player)
+
+        for kind, seat_id, result, rank, suit, hand in messages:
+            if kind == engine.SETTLE:
+                player = round_players.get(seat_id)
+                if player is not None:
+                    pkt = settle_bet(table, player, hand, rank)
+                    if pkt is not None:
+                        send(player, pkt)
+                continue
+            if kind == engine.SEND_SEAT:
+                player = round_players.get(seat_id)
+                targets = [player] if player is not None else []
+            elif kind == engine.SEND_OTHERS:
+                targets = [p for pid, p in round_players.items() if pid != seat_id] + table.spectators
+            else:
+                targets = list(round_players.values()) + table.spectators
+
+            legacy = None
+            for player in targets:
+                if player.disconnected_at is not None or player.bot is not None:
+                    continue
+                if player.revision >= PROTOCOL_REVISION_FRAMES:
+                    frame = card_frame(player, kind, seat_id, result, rank, suit, hand)
+                    if frame is not None:
+                        send(player, frame)
+                    continue
+                if legacy is None:
+                    legacy = legacy_payload(kind, seat_id, result, rank, suit)
+                if legacy:
+                    send(player, legacy)
+
+        for player, frames in batches.values():
+            try:
+                send_packet(player.conn, b"".join(frames), deadline)
+            except OSError:
+                drop(player)
+
+        messages = []
+        for player in failed:
+            messages += table.engine.remove_seat(player.id)
+
+    # The dashboard's copy of the dealer's cards, current after every step
     with table.lock:
-        targets = [p for p in table.active_players if p is not source_player]
-    for p in targets:
+        table.dealer_hand = list(table.engine.dealer_hand)
+
+
+# =========================
+# Wagering
+# =========================
+def stake_bets(table: CasinoTable, players):
+    """Holds each player's bet for the hand about to be dealt."""
+    accounts = table.accounts
+    if accounts is None:
+        return
+    for player in players:
+        if not player.wager:
+            continue
+        player.bet = accounts.stake(player.name, player.wager)
+        player.staked = player.bet
+        if player.wagering and player.disconnected_at is None:
+            try:
+                send_packet(player.conn, pack_account(accounts.balance(player.name), -player.bet, ACCOUNT_STAKED))
+            except OSError:
+                pass  # the deal notices the dead socket
+
+
+def raise_bet(table: CasinoTable, player: Player, decision: str) -> bool:
+    """
+    Checks a double or split against the player's revision, the table's
+    rules and the hand, and holds the chips matching the hand's bet.
+    Returns False if the move is not allowed; other decisions always pass.
+    """
+    if decision != DECISION_DOUBLE and decision != DECISION_SPLIT:
+        return True
+    game = table.engine
+    if player.revision < PROTOCOL_REVISION_MULTI_HAND:
+        return False
+    if not (game.can_double() if decision == DECISION_DOUBLE else game.can_split()):
+        return False
+    bet = game.current_hand.bet
+    if not bet:
+        return True
+    accounts = table.accounts
+    # The same name may play at other tables too: check and hold in one step
+    held = accounts.stake(player.name, bet)
+    if held < bet:
+        accounts.release(player.name, held)
+        return False
+    player.staked += bet
+    if player.wagering and player.disconnected_at is None:
         try:
-            p.conn.sendall(pkt)
+            send_packet(player.conn, pack_account(accounts.balance(player.name), -bet, ACCOUNT_STAKED))
+        except OSError:
+            pass  # the next send notices the dead socket
+    return True
+
+
+def settle_bet(table: CasinoTable, player: Player, hand_index: int, payout: int):
+    """Pays out one hand in memory; returns the account packet to send, if any."""
+    hand = engine.seat_hands(player)[hand_index]
+    balance = table.accounts.settle(player.name, hand.bet, payout, table.table_id, table.round_id)
+    hand.bet = 0
+    if player.wagering and player.disconnected_at is None:
+        return pack_account(balance, payout, ACCOUNT_SETTLED)
+    return None
+
+
+def record_stats(table: CasinoTable, players):
+    """Results phase: adds every settled hand of the round to the stats service."""
+    service = table.stats
+    if service is None:
+        return
+    game = table.engine
+    hand_value = game.rule_table.hand_value
+    for player in players:
+        result = game.results.get(player.id)
+        if result is None or player.bot is not None:
+            continue  # left before the results, or a bot kept off the leaderboard
+        results = [result] + game.split_results.get(player.id, [])
+        for hand, result in zip(engine.seat_hands(player), results):
+            service.record(table.table_id, player.name, result, hand.is_busted, hand_value(hand.hand))
+
+
+def observe_bets(table: CasinoTable, players):
+    """Feeds each wagered stake of the round to the table's count tracker."""
+    for player in players:
+        if not player.staked:
+            continue
+        if table.counting.observe(player.name, table.round_true_count, player.staked):
+            stats = table.counting.players[player.name]
+            print(f"[COUNT] Table #{table.table_id}: flagging {player.name}, bets follow the true count "
+                  f"(r={stats.correlation:.2f} over {stats.rounds} rounds)")
+        player.staked = 0
+
+
+def forfeit_bets(table: CasinoTable, players):
+    """Bets still held after the round belong to players who left mid-hand."""
+    for player in players:
+        for hand in engine.seat_hands(player):
+            if hand.bet:
+                table.accounts.forfeit(player.name, hand.bet, table.table_id, table.round_id)
+                hand.bet = 0
+
+
+# =========================
+# Session resumption
+# =========================
+def suspend_player(table: CasinoTable, player: Player) -> bool:
+    """
+    The player's socket failed. Holds the seat for RESUME_GRACE seconds if
+    the client can resume (returns True); otherwise removes the player.
+    """
+    if not player.token:
+        remove_player(table, player)
+        return False
+    if player.disconnected_at is None:
+        print(f"[TCP] Lost {player.addr}, holding seat for {RESUME_GRACE:.0f}s")
+        try:
+            player.conn.close()
         except OSError:
             pass
+        player.disconnected_at = time.monotonic()
+        player.grace_timer = table.timers.schedule(RESUME_GRACE, expire_session, table, player)
+    return True
+
+
+def expire_session(table: CasinoTable, player: Player):
+    # Timer-wheel callback: the grace period ran out without a resume
+    if player.disconnected_at is not None:
+        print(f"[TCP] Session of {player.addr} expired")
+        remove_player(table, player)
+        # A table thread waiting on this seat's turn notices the removal
+        table.waker.wake()
+
+
+def end_session(player: Player):
+    if player.grace_timer is not None:
+        player.grace_timer.cancel()
+        player.grace_timer = None
+    if player.token:
+        with sessions_lock:
+            sessions.pop(player.token, None)
+
+
+def resume_session(conn: socket.socket, client_name: str, token: bytes) -> bool:
+    """
+    Handshake-worker side of a resume: hands the new socket to the table
+    thread, which swaps it in at its next safe point so the snapshot is
+    consistent with the packets that follow it.
+    """
+    with sessions_lock:
+        entry = sessions.get(token)
+    if entry is None:
+        return False
+    table, player = entry
+    if player.name != client_name:
+        return False
+    request_snapshot(table, player, conn)
+    return True
 
 
-def broadcast_opponent_action(table: CasinoTable, source_player: Player, action_code: int):
-    pkt = pack_payload(
-        decision=DECISION_STAND,
-        result=RESULT_OPPONENT_CARD,
-        rank=0,
-        suit=_encode_opponent_suit(source_player.id, action_code)
+# =========================
+# Table snapshots & spectators
+# =========================
+def request_snapshot(table: CasinoTable, player: Player, conn: socket.socket = None):
+    """
+    Queues a snapshot for `player` (on `conn` if it resumes on a new socket).
+    Snapshots are packed and sent by the table thread between engine
+    steps, so they always agree with the packets that follow them.
+    """
+    with table.lock:
+        table.pending_snapshots.append((player, conn or player.conn))
+    table.waker.wake()
+    table.player_joined.set()
+
+
+def table_snapshot(table: CasinoTable, player: Player) -> bytes:
+    """Packs the whole table as seen by `player`. Runs on the table thread."""
+    game = table.engine
+    in_progress = game.phase == engine.PHASE_PLAYER_TURNS
+    current = game.current_seat
+    seats = []
+    with table.lock:
+        seated = [(p, 0) for p in table.active_players + table.bots] + [(p, SEAT_WAITING) for p in table.waiting_room]
+    for seat, flags in seated:
+        if seat.is_busted:
+            flags |= SEAT_BUSTED
+        if seat.is_standing:
+            flags |= SEAT_STANDING
+        if seat.disconnected_at is not None:
+            flags |= SEAT_AWAY
+        cards = []
+        if in_progress and not flags & SEAT_WAITING:
+            # Snapshots have no hand index: split hands are listed in order
+            for hand in engine.seat_hands(seat):
+                cards += hand.hand
+        seats.append((seat.id, flags, seat.remaining_rounds, cards))
+    return pack_snapshot(
+        player.id,
+        table.round_id,
+        in_progress,
+        current.id if current is not None else 0,
+        [game.dealer_upcard] if in_progress else [],
+        seats,
+        wide_ids=player.revision >= PROTOCOL_REVISION_WIDE_IDS
     )
+
+
+def send_pending_snapshots(table: CasinoTable):
+    """
+    Table-thread side of request_snapshot(). For a resume it first swaps
+    in the new socket, and re-sends the turn prompt if the seat is up.
+    """
     with table.lock:
-        targets = [p for p in table.active_players if p is not source_player]
-    for p in targets:
+        pending, table.pending_snapshots = table.pending_snapshots, []
+    for player, conn in pending:
+        with table.lock:
+            watching = player in table.spectators
+            seated = watching or player in table.active_players or player in table.waiting_room
+        if not seated:
+            try:
+                conn.close()
+            except OSError:
+                pass
+            continue
+        if watching:
+            try:
+                send_packet(conn, table_snapshot(table, player))
+            except OSError:
+                remove_spectator(table, player)
+            continue
+        if conn is player.conn:
+            try:
+                send_packet(conn, table_snapshot(table, player))
+            except OSError:
+                suspend_player(table, player)
+            continue
+
+        if player.grace_timer is not None:
+            player.grace_timer.cancel()
+            player.grace_timer = None
+        old_conn, player.conn = player.conn, conn
+        if old_conn is not conn:
+            try:
+                old_conn.close()
+            except OSError:
+                pass
+        player.disconnected_at = None
+        player.last_active = time.monotonic()
         try:
-            p.conn.sendall(pkt)
+            send_packet(conn, table_snapshot(table, player))
+            if player is table.current_player:
+                send_packet(conn, pack_payload(DECISION_STAND, RESULT_YOUR_TURN, 0, 0))
         except OSError:
-            pass
+            suspend_player(table, player)
 
 
+def add_spectator(conn: socket.socket, addr, client_name: str, rounds: int, revision: int, tables):
+    # Spectators watch the busiest table and take no seat
+    table = max(tables, key=lambda t: len(t.active_players) + len(t.waiting_room))
+    spectator = Player(id=0, conn=conn, addr=addr, name=client_name, remaining_rounds=rounds,
+                       revision=revision)
+    if revision >= PROTOCOL_REVISION_RULES:
+        send_packet(conn, rules.pack_house_rules(table.house_rules))
+    with table.lock:
+        table.spectators.append(spectator)
+    request_snapshot(table, spectator)
 
-def send_update(conn: socket.socket, card):
-    rank, suit = card
-    pkt = pack_payload(
-        decision=DECISION_STAND,
-        result=RESULT_NOT_OVER,
-        rank=rank,
-        suit=suit
-    )
-    conn.sendall(pkt)
 
+def remove_spectator(table: CasinoTable, spectator: Player):
+    with table.lock:
+        if spectator in table.spectators:
+            table.spectators.remove(spectator)
+    try:
+        spectator.conn.close()
+    except OSError:
+        pass
 
-def send_result(conn: socket.socket, result: int, card):
-    rank, suit = card
-    pkt = pack_payload(
-        decision=DECISION_STAND,
-        result=result,
-        rank=rank,
-        suit=suit
-    )
-    conn.sendall(pkt)
+
+def snapshot_spectators(table: CasinoTable):
+    """Each round starts with a fresh snapshot, so watchers never drift."""
+    with table.lock:
+        spectators = list(table.spectators)
+    for spectator in spectators:
+        try:
+            send_packet(spectator.conn, table_snapshot(table, spectator))
+        except OSError:
+            remove_spectator(table, spectator)
 
 
 def display_dashboard(table: CasinoTable):
     with table.lock:
         active_count = len(table.active_players)
         waiting_count = len(table.waiting_room)
+        bot_count = len(table.bots)
         status = table.game_status
         dealer_hand = list(table.dealer_hand)
-    print("[DASHBOARD] Live Table")
+    print(f"[DASHBOARD] Live Table #{table.table_id} ({table.house_rules.name} rules)")
     print(f"[DASHBOARD] Status: {status}")
     print(f"[DASHBOARD] Active players: {active_count}")
     print(f"[DASHBOARD] Waiting players: {waiting_count}")
+    if bot_count:
+        print(f"[DASHBOARD] Bot seats: {bot_count} ({table.bot_policy.name})")
     print(f"[DASHBOARD] Dealer hand: {dealer_hand}")
+    table_shoe = table.shoe
+    if table_shoe is not None:
+        print(f"[DASHBOARD] Shoe: {len(table_shoe)}/{table_shoe.size} cards left "
+              f"({100 * table_shoe.penetration:.0f}% dealt, {100 * table_shoe.mean_penetration:.0f}% mean), "
+              f"running count {table_shoe.running_count:+d}, true count {table_shoe.true_count():+.1f}")
+        if table_shoe.mid_round_shuffles:
+            print(f"[DASHBOARD] Rounds that outran the shoe reserve: {table_shoe.mid_round_shuffles}")
+        if table.counting.flagged:
+            print(f"[DASHBOARD] Flagged for counting: {', '.join(sorted(table.counting.flagged))}")
+    if table.stats is not None:
+        leaders = table.stats.leaderboard(3)
+        if leaders:
+            print("[DASHBOARD] Leaderboard: " + ", ".join(
+                f"{name} {100 * counters.win_rate:.0f}% ({counters.hands} hands)" for name, counters in leaders))
+    if table.packets_malformed or table.packets_limited:
+        print(f"[DASHBOARD] Rejected packets: {table.packets_malformed} malformed, "
+              f"{table.packets_limited} over rate limit, {table.clients_dropped} clients dropped")
+
+
+def police_packets(table: CasinoTable, player: Player, packets: int = 1, malformed: bool = False) -> bool:
+    """
+    Charges `packets` to the player's token bucket. Returns False if they
+    must be ignored (malformed, or over the rate limit), which counts as a
+    violation; the caller drops the player at ratelimit.MAX_VIOLATIONS.
+    """
+    if malformed:
+        table.packets_malformed += 1
+    elif player.bucket is None or player.bucket.take(packets):
+        return True
+    else:
+        table.packets_limited += packets
+    player.violations += 1
+    if player.violations >= ratelimit.MAX_VIOLATIONS:
+        table.clients_dropped += 1
+        print(f"[TCP] Dropping {player.addr}: {player.violations} malformed or over-limit packets")
+    return False
+
+
+def wait_for_payload(table: CasinoTable, player: Player, timeout: float):
+    """
+    Reads one 14-byte payload from a non-blocking socket. A timer on the
+    wheel wakes the table thread when the turn deadline passes; returns
+    None on timeout or disconnect, or as soon as the player is no longer
+    seated. A player whose seat is held after a drop can still resume and
+    answer before the deadline.
+    """
+    deadline = table.timers.schedule(timeout, table.waker.wake)
+    try:
+        data = b""
+        while len(data) < 14:
+            with table.lock:
+                seated = player in table.active_players
+            if not seated:
+                # Removed meanwhile, e.g. its resume grace ran out
+                return None
+            if player.disconnected_at is not None:
+                if deadline.expired:
+                    return None
+                select.select([table.waker], [], [])
+                table.waker.clear()
+                send_pending_snapshots(table)
+                data = b""
+                continue
+            conn = player.conn
+            try:
+                chunk = conn.recv(14 - len(data))
+            except (BlockingIOError, ssl.SSLWantReadError):
+                if deadline.expired:
+                    return None
+                readable, _, _ = select.select([conn, table.waker], [], [])
+                if table.waker in readable:
+                    table.waker.clear()
+                    send_pending_snapshots(table)
+                continue
+            except socket.timeout:
+                # In-memory connections (replay.py) report recorded timeouts this way
+                return None
+            except OSError:
+                chunk = b""
+            if not chunk:
+                if not suspend_player(table, player):
+                    return None
+                continue
+            data += chunk
+        return data
+    finally:
+        deadline.cancel()
+
+
+def peer_closed(conn: socket.socket) -> bool:
+    try:
+        if isinstance(conn, ssl.SSLSocket):
+            # TLS sockets refuse recv flags; peek at the raw TCP stream instead
+            return socket.socket.recv(conn, 1, socket.MSG_PEEK) == b""
+        return conn.recv(1, socket.MSG_PEEK) == b""
+    except BlockingIOError:
+        return False
+    except OSError:
+        return True
+
+
+def reap_idle_connections(tables):
+    """
+    Timer-wheel job: players whose socket was closed by the peer lose it
+    (their seat is held if they can resume), seated players silent for
+    longer than GAMEPLAY_TIMEOUT are dropped, and so are closed spectators.
+    Activity is a decision, any other inbound bytes, or being dealt in;
+    the waiting room is never asked to act, so it is only checked for
+    closed sockets.
+    """
+    now = time.monotonic()
+    for table in tables:
+        with table.lock:
+            candidates = [
+                p for p in table.active_players + table.waiting_room
+                if p is not table.current_player and p.disconnected_at is None
+            ]
+            waiting = set(map(id, table.waiting_room))
+            spectators = list(table.spectators)
+        for player in candidates:
+            if id(player) not in waiting and now - player.last_active > GAMEPLAY_TIMEOUT:
+                print(f"[TCP] Reaping idle connection from {player.addr}")
+                remove_player(table, player)
+            elif peer_closed(player.conn):
+                print(f"[TCP] Reaping idle connection from {player.addr}")
+                suspend_player(table, player)
+        for spectator in spectators:
+            if peer_closed(spectator.conn):
+                remove_spectator(table, spectator)
 
 
 def remove_player(table: CasinoTable, player: Player):
+    end_session(player)
     with table.lock:
+        seated = False
         if player in table.active_players:
             table.active_players.remove(player)
+            seated = True
         if player in table.waiting_room:
             table.waiting_room.remove(player)
+            seated = True
+        if seated:
+            release_player_id(table, player.id)
     try:
         player.conn.close()
     except OSError:
         pass
+    seat_freed.set()
 
 
-def run_table_loop(table: CasinoTable):
-    while True:
-        with table.lock:
-            has_players = bool(table.active_players or table.waiting_room)
-        if not has_players:
-            time.sleep(1)
-            continue
-
-        # ===== Waiting room join window =====
-        countdown_start = time.time()
-        while time.time() - countdown_start < ROUND_JOIN_WINDOW:
-            display_dashboard(table)
-            time.sleep(1)
-
-        with table.lock:
-            if table.waiting_room:
-                table.active_players.extend(table.waiting_room)
-                table.waiting_room.clear()
-            table.game_status = GAME_STATUS_IN_PROGRESS
-            players_snapshot = list(table.active_players)
-
-        if not players_snapshot:
-            with table.lock:
-                table.game_status = GAME_STATUS_WAITING
-            continue
-
-        # ===== Deal cards =====
-        deck = blackjack.create_deck()
-        dealer_hand = [deck.pop(), deck.pop()]
-        with table.lock:
-            table.dealer_hand = list(dealer_hand)
-
+# =========================
+# Bot seats
+# =========================
+def fill_bot_seats(table: CasinoTable):
+    """
+    Tops the table up to BOT_FILL_SEATS with bot seats while humans play,
+    and unseats bots as humans take their places or the last human leaves.
+    Runs between rounds; caller holds table.lock.
+    """
+    if table.bot_policy is None:
+        return
+    humans = len(table.active_players)
+    wanted = min(max(0, BOT_FILL_SEATS - humans), MAX_SEATS - humans) if humans else 0
+    while len(table.bots) > wanted:
+        bot = table.bots.pop()
+        release_player_id(table, bot.id)
+        print(f"[BOT] Table #{table.table_id}: {bot.name} left")
+    while len(table.bots) < wanted:
+        pid = allocate_player_id(table)
+        bot = Player(id=pid, conn=None, addr=None, name=f"bot-{pid}", remaining_rounds=0,
+                     revision=PROTOCOL_REVISION, bot=table.bot_policy)
+        table.bots.append(bot)
+        print(f"[BOT] Table #{table.table_id}: {bot.name} took a seat")
+
+
+def bot_decision(table: CasinoTable, player: Player) -> str:
+    """The bot seat's move, looked up in its policy table; bots never wager."""
+    game = table.engine
+    state = TableState(game.rule_table, game.can_double(), game.can_split(), player.hand_index,
+                       table.round_true_count)
+    return player.bot.decide(game.current_hand.hand, game.dealer_upcard, state)
+
+
+def play_table_round(table: CasinoTable, players_snapshot, round_seed=None, deck=None):
+    """
+    Socket driver for one round of table.engine: delivers its outbound
+    messages, prompts the current seat and feeds its decision back.
+    A round_seed fully determines the deck and is logged; otherwise the
+    deck comes from the shuffle service (or is passed in by replay.py).
+    """
+    game = table.engine
+    if deck is None and table.shoe is not None:
+        if table.shoe.needs_shuffle:
+            table.shoe.shuffle()
+            print(f"[SHOE] Table #{table.table_id}: cut card reached, shoe reshuffled")
+        table.round_true_count = table.shoe.true_count()
+        deck = table.shoe
+    elif deck is None:
+        deck = blackjack.create_deck(random.Random(round_seed) if round_seed is not None else None,
+                                     table.house_rules.decks)
+    with tracing.span(table.tracer, "deal", table.table_id, table.round_id):
+        send_pending_snapshots(table)
+        round_players = {player.id: player for player in players_snapshot}
+        stake_bets(table, players_snapshot)
+        snapshot_spectators(table)
+        for watcher in players_snapshot + table.spectators:
+            watcher.frame_seq = 0
+        dealt_at = time.monotonic()
         for player in players_snapshot:
-            player.hand = [deck.pop(), deck.pop()]
-            player.is_busted = False
-            player.is_standing = False
-            try:
-                send_update(player.conn, player.hand[0])
-                broadcast_opponent_card(table, player, player.hand[0])
-                send_update(player.conn, player.hand[1])
-                broadcast_opponent_card(table, player, player.hand[1])
-            except OSError:
-                remove_player(table, player)
-
-        # Dealer face-up card
-        dealer_face_up = dealer_hand[0]
-        broadcast(
-            pack_payload(
-                decision=DECISION_STAND,
-                result=RESULT_NOT_OVER,
-                rank=dealer_face_up[0],
-                suit=dealer_face_up[1]
-            ),
-            table.active_players,
-            table
-        )
+            player.last_active = dealt_at
 
-        # ===== Player turns =====
-        for player in list(table.active_players):
-            if player not in table.active_players:
-                continue
-
-            try:
-                while not player.is_busted and not player.is_standing:
-                    blackjack.drain_socket_buffer(player.conn)
-
-                    # Signal turn start
-                    try:
-                        player.conn.sendall(
-                            pack_payload(
-                                decision=DECISION_STAND,
-                                result=RESULT_YOUR_TURN,
-                                rank=0,
-                                suit=0
-                            )
-                        )
-                    except OSError:
-                        remove_player(table, player)
-                        break
-
-                    player.conn.settimeout(TURN_TIMEOUT)
-                    data = blackjack.recv_exact(player.conn, 14)
-
-                    # ===== AUTO-STAND on timeout =====
-                    if not data:
-                        player.is_standing = True
-                        broadcast_opponent_action(table, player, 1)
-
-                        # Notify the player himself to exit CURRENT TURN
-                        try:
-                            player.conn.sendall(
-                                pack_payload(
-                                    decision=DECISION_STAND,
-                                    result=RESULT_NOT_OVER,
-                                    rank=0,
-                                    suit=0
-                                )
-                            )
-                        except OSError:
-                            remove_player(table, player)
-
-                        player.conn.settimeout(GAMEPLAY_TIMEOUT)
-                        break
-
-                    decision = blackjack.read_client_decision(data)
-                    if decision is None:
-                        continue
-
-                    # Restore normal timeout after valid input
-                    player.conn.settimeout(GAMEPLAY_TIMEOUT)
-
-                    if decision == DECISION_HIT:
-                        card = deck.pop()
-                        player.hand.append(card)
-                        try:
-                            send_update(player.conn, card)
-                            broadcast_opponent_action(table, player, 0)
-                            broadcast_opponent_card(table, player, card)
-                        except OSError:
-                            remove_player(table, player)
-                            break
-
-                        if blackjack.hand_value(player.hand) > 21:
-                            player.is_busted = True
-                            break
-
-                    elif decision == DECISION_STAND:
-                        player.is_standing = True
-                        broadcast_opponent_action(table, player, 1)
-
-            except (OSError, ValueError):
-                remove_player(table, player)
+        # ===== Deal cards =====
+        deliver(table, round_players, game.start_round(players_snapshot, deck, table.round_id, round_seed))
 
-        # ===== Dealer turn =====
-        with table.lock:
-            active_players = list(table.active_players)
-        if not active_players:
-            with table.lock:
-                table.game_status = GAME_STATUS_WAITING
-                table.dealer_hand = []
+    # ===== Player turns =====
+    your_turn = pack_payload(
+        decision=DECISION_STAND,
+        result=RESULT_YOUR_TURN,
+        rank=0,
+        suit=0
+    )
+    def evict(player):
+        round_players.pop(player.id, None)
+        remove_player(table, player)
+        deliver(table, round_players, game.remove_seat(player.id))
+
+    def advance(decision):
+        messages = game.apply_decision(decision)
+        if game.phase == engine.PHASE_DONE:
+            with tracing.span(table.tracer, "results", table.table_id, table.round_id):
+                deliver(table, round_players, messages)
+        else:
+            deliver(table, round_players, messages)
+
+    while game.current_seat is not None:
+        player = game.current_seat
+        if player.bot is not None:
+            # Bot seats answer from their policy table: no prompt and no wait
+            with tracing.span(table.tracer, "player_turn", table.table_id, table.round_id, player.id) as turn:
+                decision = turn.detail = bot_decision(table, player)
+            advance(decision)
+            continue
+        if player.id not in round_players or player not in table.active_players:
+            round_players.pop(player.id, None)
+            deliver(table, round_players, game.remove_seat(player.id))
             continue
 
-        # Reveal hidden dealer card
-        dealer_hidden = dealer_hand[1]
-        broadcast(
-            pack_payload(
-                decision=DECISION_STAND,
-                result=RESULT_NOT_OVER,
-                rank=dealer_hidden[0],
-                suit=dealer_hidden[1]
-            ),
-            table.active_players,
-            table
-        )
-
-        while blackjack.hand_value(dealer_hand) < 17:
-            card = deck.pop()
-            dealer_hand.append(card)
-            with table.lock:
-                table.dealer_hand = list(dealer_hand)
-            broadcast(
-                pack_payload(
-                    decision=DECISION_STAND,
-                    result=RESULT_NOT_OVER,
-                    rank=card[0],
-                    suit=card[1]
-                ),
-                table.active_players,
-                table
-            )
-
-        # ===== Results =====
-        dealer_score = blackjack.hand_value(dealer_hand)
-        last_dealer_card = dealer_hand[-1]
-
-        for player in list(table.active_players):
-            if player.is_busted:
-                result = RESULT_LOSS
-            else:
-                player_score = blackjack.hand_value(player.hand)
-                if dealer_score > 21 or player_score > dealer_score:
-                    result = RESULT_WIN
-                elif player_score < dealer_score:
-                    result = RESULT_LOSS
-                else:
-                    result = RESULT_TIE
+        with tracing.span(table.tracer, "player_turn", table.table_id, table.round_id, player.id) as turn:
+            send_pending_snapshots(table)
+            table.current_player = player
             try:
-                send_result(player.conn, result, last_dealer_card)
+                if player.disconnected_at is None:
+                    # Input sent out of turn is discarded, but still costs tokens
+                    drained = blackjack.drain_socket_buffer(player.conn, ratelimit.DRAIN_LIMIT)
+                    if drained:
+                        player.last_active = time.monotonic()
+                    if drained and not police_packets(table, player, -(-drained // len(your_turn))):
+                        if player.violations >= ratelimit.MAX_VIOLATIONS:
+                            turn.detail = "evicted"
+                            evict(player)
+                            continue
+                    # Signal turn start
+                    send_packet(player.conn, your_turn)
             except OSError:
-                remove_player(table, player)
-
-        # ===== Round cleanup =====
+                if not suspend_player(table, player):
+                    turn.detail = "disconnected"
+                    round_players.pop(player.id, None)
+                    deliver(table, round_players, game.remove_seat(player.id))
+                    continue
+            data = wait_for_payload(table, player, TURN_TIMEOUT)
+            if data is None and player not in table.active_players:
+                # The seat is gone, not timed out: the loop top removes it
+                turn.detail = "disconnected"
+                continue
+            # ===== AUTO-STAND on timeout =====
+            decision = engine.DECISION_TIMEOUT
+            if data:
+                decision = blackjack.read_client_decision(data)
+                if not police_packets(table, player, malformed=decision is None):
+                    turn.detail = "rejected"
+                    if player.violations >= ratelimit.MAX_VIOLATIONS:
+                        turn.detail = "evicted"
+                        evict(player)
+                    # Otherwise the packet is ignored and the turn prompted again
+                    continue
+                if not raise_bet(table, player, decision):
+                    # A well-formed move the seat can't make: prompt again, no violation
+                    turn.detail = "refused"
+                    continue
+                player.last_active = time.monotonic()
+            turn.detail = decision or "timeout"
+        advance(decision)
+    table.current_player = None
+    record_stats(table, players_snapshot)
+
+    # ===== Round cleanup =====
+    with tracing.span(table.tracer, "cleanup", table.table_id, table.round_id):
+        forfeit_bets(table, players_snapshot)
+        if table.shoe is not None:
+            observe_bets(table, players_snapshot)
         with table.lock:
-            for player in list(table.active_players):
-                player.remaining_rounds -= 1
+            for player in table.active_players + table.bots:
                 player.hand = []
                 player.is_busted = False
                 player.is_standing = False
+                player.doubled = False
+                player.split_hands = None
+                player.hand_index = 0
+                if player.bot is not None:
+                    continue  # bot seats stay until fill_bot_seats() unseats them
+                player.remaining_rounds -= 1
                 if player.remaining_rounds <= 0:
                     table.active_players.remove(player)
+                    release_player_id(table, player.id)
+                    end_session(player)
+                    seat_freed.set()
                     try:
                         player.conn.close()
                     except OSError:
                         pass
+            for spectator in list(table.spectators):
+                spectator.remaining_rounds -= 1
+                if spectator.remaining_rounds <= 0:
+                    table.spectators.remove(spectator)
+                    try:
+                        spectator.conn.close()
+                    except OSError:
+                        pass
 
+            round_seconds = time.monotonic() - table.round_started_at
+            table.avg_round_seconds += ROUND_ETA_SMOOTHING * (round_seconds - table.avg_round_seconds)
+            table.round_started_at = None
             table.dealer_hand = []
             table.game_status = GAME_STATUS_WAITING
+            recycle_player_ids(table)
+
+
+def run_table_loop(table: CasinoTable):
+    while True:
+        with table.lock:
+            has_players = bool(table.active_players or table.waiting_room)
+        if not has_players:
+            with table.lock:
+                fill_bot_seats(table)
+            send_pending_snapshots(table)
+            profiling.idle()
+            table.player_joined.wait()
+            table.player_joined.clear()
+            continue
+
+        # ===== Waiting room join window =====
+        with table.lock:
+            fill_bot_seats(table)
+            window = join_window(table)
+        join_window_closed = threading.Event()
+        table.timers.schedule(window, join_window_closed.set)
+        with table.lock:
+            table.join_deadline = time.monotonic() + window
+        display_dashboard(table)
+        with tracing.span(table.tracer, "join_window", table.table_id, table.round_id + 1):
+            while not join_window_closed.wait(1):
+                send_pending_snapshots(table)
+                display_dashboard(table)
+
+        with table.lock:
+            if table.waiting_room:
+                table.active_players.extend(table.waiting_room)
+                table.waiting_room.clear()
+            # Humans who joined in the window take over bot seats
+            fill_bot_seats(table)
+            table.game_status = GAME_STATUS_IN_PROGRESS
+            table.join_deadline = None
+            table.round_started_at = time.monotonic()
+            table.round_id += 1
+            players_snapshot = table.active_players + table.bots
 
+        if not players_snapshot:
+            with table.lock:
+                table.game_status = GAME_STATUS_WAITING
+                recycle_player_ids(table)
+            continue
+
+        round_seed = table.rng.getrandbits(32) if table.rng is not None and table.shoe is None else None
+        with tracing.span(table.tracer, "round", table.table_id, table.round_id):
+            play_table_round(table, players_snapshot, round_seed)
         display_dashboard(table)
 
 
@@ -494,33 +1278,84 @@ def run_table_loop(table: CasinoTable):
 def main():
     tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     tcp_socket.bind(("", 0))
-    tcp_socket.listen()
-
-    table = CasinoTable()
+    tcp_socket.listen(admission.LISTEN_BACKLOG)
+
+    hand_history = history.HandHistoryWriter(HISTORY_PATH) if HISTORY_PATH else None
+    accounts = bank.Bank(LEDGER_PATH) if LEDGER_PATH else None
+    # One span ring for all tables; the table threads append without locking
+    tracer = tracing.TraceRing()
+    if TRACE_PATH:
+        tracer.start_export(TRACE_PATH)
+    stats_service = stats.StatsService()
+    if STATS_PATH:
+        stats_service.load(STATS_PATH)
+        stats_service.start_compaction(STATS_PATH)
+    tables = [
+        CasinoTable(
+            table_id,
+            hand_history,
+            seed=None if TABLE_SEED is None else TABLE_SEED + table_id,
+            accounts=accounts,
+            tracer=tracer,
+            house_rules=rules.profile(TABLE_RULES[(table_id - 1) % len(TABLE_RULES)]),
+            use_shoe=SHOE_TABLES,
+            stats_service=stats_service,
+            bot_strategy=strategy(BOT_STRATEGY) if BOT_FILL_SEATS else None
+        )
+        for table_id in range(1, TABLE_COUNT + 1)
+    ]
     tcp_port = tcp_socket.getsockname()[1]
     local_ip = get_local_ip()
     print(f"Server started, listening on IP address {local_ip}")
+    if BOT_FILL_SEATS:
+        print(f"[BOT] Bot seats ({BOT_STRATEGY}) fill each table up to {BOT_FILL_SEATS} seats while humans play")
+
+    timers.default_wheel().schedule_repeating(REAP_INTERVAL, reap_idle_connections, tables)
+
+    # python -m server.server --profile 60 [--profile-mode cprofile]
+    # (or kill -USR1 / -USR2 <pid> for a capture while running)
+    profiling.install_signal_handlers()
+    if "--profile" in sys.argv[1:-1]:
+        mode = profiling.MODE_SAMPLE
+        if "--profile-mode" in sys.argv[1:-1]:
+            mode = sys.argv[sys.argv.index("--profile-mode") + 1]
+        profiling.start(float(sys.argv[sys.argv.index("--profile") + 1]), mode)
 
     threading.Thread(
         target=udp_offer_loop,
-        args=(tcp_port,),
+        args=(tcp_port, tables),
         daemon=True
     ).start()
-    threading.Thread(
-        target=run_table_loop,
-        args=(table,),
-        daemon=True
-    ).start()
-
-    while True:
-        conn, addr = tcp_socket.accept()
-        print(f"[SERVER] New connection from {addr}")
+    for table in tables:
         threading.Thread(
-            target=handle_client,
-            args=(conn, addr, table),
+            target=run_table_loop,
+            args=(table,),
+            name=f"table-{table.table_id}",
             daemon=True
         ).start()
 
+    ssl_context = None
+    if TLS_CERT_PATH and TLS_KEY_PATH:
+        ssl_context = tls.server_context(TLS_CERT_PATH, TLS_KEY_PATH)
+        print(f"[SERVER] TLS enabled with {TLS_CERT_PATH}")
+
+    # Requests are read by one selector-driven stage instead of a thread
+    # per connection; admission control caps how many sockets it holds
+    stage = admission.HandshakeStage(
+        lambda conn, addr, data: handle_request(conn, addr, data, tables),
+        request_size=request_size,
+        timeout=REQUEST_TIMEOUT,
+        ssl_context=ssl_context
+    )
+    gate = admission.AdmissionControl(stage, lambda: seated_count(tables))
+
+    while True:
+        conn, addr = tcp_socket.accept()
+        if gate.admit(conn, addr):
+            print(f"[SERVER] New connection from {addr}")
+        else:
+            print(f"[SERVER] Rejected connection from {addr} (server busy)")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,164 @@
+# shoe.py
+from . import blackjack
+
+# =========================
+# Config
+# =========================
+SHOE_PENETRATION = 0.75       # most of the shoe dealt before the cut card forces a reshuffle (less if the reserve needs more)
+COUNT_FLAG_MIN_ROUNDS = 50    # wagered rounds before a player's bets are judged
+COUNT_FLAG_CORRELATION = 0.5  # bet/true-count correlation at which a player is flagged
+RESERVE_CARDS_PER_HAND = 5    # cards kept behind the cut per hand a round can hold (a hand averages under 3, but may take more than 5)
+
+CARDS_PER_DECK = 52
+
+# Hi-Lo tag per rank (index 0 unused): 2-6 count +1, 7-9 nothing, tens and aces -1
+HI_LO = (0, -1, 1, 1, 1, 1, 1, 0, 0, 0, -1, -1, -1, -1)
+
+
+def round_reserve(house_rules, seats: int) -> int:
+    """
+    Cards a shoe holds back for a round of `seats` seats: enough for every
+    hand split to the limit, and the dealer's, if no hand takes more than
+    RESERVE_CARDS_PER_HAND cards. A heuristic, not a guarantee.
+    """
+    return (seats * house_rules.max_hands + 1) * RESERVE_CARDS_PER_HAND
+
+
+class Shoe:
+    """
+    A table's multi-deck shoe, dealt over many rounds until the cut card.
+    It is a drop-in for a round's deck (the engine only calls pop()), and
+    every pop updates the running count and the remaining-card histogram,
+    so the count is always current without rescanning dealt cards.
+    The cut card leaves at least `reserve` cards (see round_reserve()).
+    It is only checked when a round starts; a round that still runs the
+    shoe dry is finished from a freshly shuffled one (see pop()).
+    """
+
+    def __init__(self, decks: int = 1, rng=None, penetration: float = SHOE_PENETRATION, reserve: int = 0):
+        self.decks = decks
+        self.rng = rng
+        self.size = decks * CARDS_PER_DECK
+        # Reshuffle once no more than this many cards are left
+        self.cut = max(self.size - int(self.size * penetration), reserve)
+        if self.cut >= self.size:
+            raise ValueError(f"A {decks}-deck shoe can't hold back {reserve} cards for a round")
+        self.cards = []
+        self.remaining = [0] * 14    # rank -> cards of that rank still in the shoe
+        self.running_count = 0
+        self.shuffles = 0
+        self.mid_round_shuffles = 0  # rounds that outran the reserve
+        self.dealt_total = 0         # cards dealt over all shoes, for the mean penetration
+        self.shuffle()
+
+    def shuffle(self):
+        self.cards = blackjack.create_deck(self.rng, self.decks)
+        self.remaining = [0] + [4 * self.decks] * 13
+        self.running_count = 0
+        self.shuffles += 1
+
+    def pop(self):
+        cards = self.cards
+        if not cards:
+            # The reserve is a heuristic, so a long round can outrun it. It
+            # finishes from a fresh shoe, whose count starts over; the round's
+            # bets were already judged against the count at the deal
+            self.mid_round_shuffles += 1
+            print(f"[SHOE] Round outran the {self.cut}-card reserve, finishing it from a fresh shoe "
+                  f"(running count {self.running_count:+d} restarts at 0)")
+            self.shuffle()
+            cards = self.cards
+        card = cards.pop()
+        rank = card[0]
+        self.remaining[rank] -= 1
+        self.running_count += HI_LO[rank]
+        self.dealt_total += 1
+        return card
+
+    def __len__(self):
+        return len(self.cards)
+
+    @property
+    def needs_shuffle(self) -> bool:
+        return len(self.cards) <= self.cut
+
+    @property
+    def penetration(self) -> float:
+        """Share of the current shoe already dealt."""
+        return 1 - len(self.cards) / self.size
+
+    @property
+    def mean_penetration(self) -> float:
+        """Average share of a shoe dealt, over every shoe so far."""
+        return self.dealt_total / (self.shuffles * self.size)
+
+    def true_count(self) -> float:
+        """Running count per deck left in the shoe."""
+        return self.running_count * CARDS_PER_DECK / max(len(self.cards), 1)
+
+
+class BetCorrelation:
+    """
+    Streaming Pearson correlation of one player's round stakes against
+    the true count at the deal (Welford co-moment updates, O(1) each).
+    """
+
+    __slots__ = ("rounds", "mean_count", "mean_bet", "m2_count", "m2_bet", "co_moment")
+
+    def __init__(self):
+        self.rounds = 0
+        self.mean_count = 0.0
+        self.mean_bet = 0.0
+        self.m2_count = 0.0
+        self.m2_bet = 0.0
+        self.co_moment = 0.0
+
+    def add(self, true_count: float, bet: int):
+        self.rounds += 1
+        d_count = true_count - self.mean_count
+        d_bet = bet - self.mean_bet
+        self.mean_count += d_count / self.rounds
+        self.mean_bet += d_bet / self.rounds
+        self.m2_count += d_count * (true_count - self.mean_count)
+        self.m2_bet += d_bet * (bet - self.mean_bet)
+        self.co_moment += d_count * (bet - self.mean_bet)
+
+    @property
+    def correlation(self) -> float:
+        """0.0 until both series vary."""
+        if self.m2_count <= 0 or self.m2_bet <= 0:
+            return 0.0
+        return self.co_moment / (self.m2_count * self.m2_bet) ** 0.5
+
+
+class CountTracker:
+    """
+    Per-table advantage-play monitor: each wagered round adds the
+    player's total stake (bet plus doubles and splits) against the round's
+    true count, and a player is flagged once the two move together.
+    """
+
+    def __init__(self, min_rounds: int = COUNT_FLAG_MIN_ROUNDS,
+                 threshold: float = COUNT_FLAG_CORRELATION):
+        self.min_rounds = min_rounds
+        self.threshold = threshold
+        self.players = {}    # name -> BetCorrelation
+        self.flagged = {}    # name -> correlation when flagged
+
+    def observe(self, name: str, true_count: float, bet: int) -> bool:
+        """Adds one round; returns True when this round gets the player flagged."""
+        stats = self.players.get(name)
+        if stats is None:
+            stats = self.players[name] = BetCorrelation()
+        stats.add(true_count, bet)
+        if name in self.flagged or stats.rounds < self.min_rounds:
+            return False
+        correlation = stats.correlation
+        if correlation < self.threshold:
+            return False
+        self.flagged[name] = correlation
+        return True
+
+    def correlation(self, name: str) -> float:
+        stats = self.players.get(name)
+        return stats.correlation if stats is not None else 0.0
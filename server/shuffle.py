@@ -0,0 +1,172 @@
+# shuffle.py
+import os
+import random
+import secrets
+import threading
+import time
+from collections import deque
+
+# =========================
+# Config
+# =========================
+ENTROPY_BLOCK = 64 * 1024   # bytes pulled from os.urandom per refill (~1000 decks)
+DECK_BUFFER_SIZE = 64       # pre-shuffled decks kept ready for the tables
+DECK_LOW_WATERMARK = 16     # wake the filler thread below this many decks
+
+SUITS = (0, 1, 2, 3)
+RANKS = tuple(range(1, 14))
+
+# Card index -> (rank, suit); decks are shuffled as compact index arrays
+CARDS = tuple((rank, suit) for rank in RANKS for suit in SUITS)
+_ORDERED_DECK = bytes(range(len(CARDS)))
+
+# Largest multiple of n below 256; bytes at or above it are rejected so
+# `byte % n` stays exactly uniform (no modulo bias). Multi-deck shoes have
+# more than 256 positions; those draws take two bytes instead.
+_ACCEPT_LIMIT = tuple(256 - 256 % n if n else 0 for n in range(257))
+
+
+class ShuffleService:
+    """
+    CSPRNG-backed deck source. Entropy is read from os.urandom in large
+    blocks and consumed one byte per Fisher-Yates draw (with rejection
+    sampling), and a background thread keeps a buffer of shuffled decks.
+    """
+
+    def __init__(self, buffer_size: int = DECK_BUFFER_SIZE,
+                 low_watermark: int = DECK_LOW_WATERMARK,
+                 entropy_block: int = ENTROPY_BLOCK,
+                 background: bool = True):
+        self.buffer_size = buffer_size
+        self.low_watermark = low_watermark
+        self.entropy_block = entropy_block
+        self._entropy = b""
+        self._pos = 0
+        self._lock = threading.Lock()
+        self._decks = deque()
+        self._wakeup = threading.Event()
+        if background:
+            threading.Thread(target=self._fill_loop, daemon=True).start()
+
+    def _shuffle_indices(self, decks: int = 1) -> bytearray:
+        deck = bytearray(_ORDERED_DECK * decks)
+        with self._lock:
+            entropy = self._entropy
+            pos = self._pos
+            end = len(entropy)
+            for i in range(len(deck) - 1, 0, -1):
+                n = i + 1
+                if n <= 256:
+                    limit = _ACCEPT_LIMIT[n]
+                    while True:
+                        if pos >= end:
+                            entropy = os.urandom(self.entropy_block)
+                            pos = 0
+                            end = len(entropy)
+                        value = entropy[pos]
+                        pos += 1
+                        if value < limit:
+                            break
+                else:
+                    limit = 65536 - 65536 % n
+                    while True:
+                        if pos + 1 >= end:
+                            entropy = os.urandom(self.entropy_block)
+                            pos = 0
+                            end = len(entropy)
+                        value = (entropy[pos] << 8) | entropy[pos + 1]
+                        pos += 2
+                        if value < limit:
+                            break
+                j = value % n
+                deck[i], deck[j] = deck[j], deck[i]
+            self._entropy = entropy
+            self._pos = pos
+        return deck
+
+    def _fill_loop(self):
+        while True:
+            while len(self._decks) < self.buffer_size:
+                self._decks.append(self._shuffle_indices())
+            self._wakeup.wait()
+            self._wakeup.clear()
+
+    def next_indices(self) -> bytearray:
+        try:
+            deck = self._decks.popleft()
+        except IndexError:
+            # Buffer drained faster than the filler could keep up
+            deck = self._shuffle_indices()
+        if len(self._decks) < self.low_watermark:
+            self._wakeup.set()
+        return deck
+
+    def next_deck(self, decks: int = 1):
+        """
+        Returns a shuffled deck (or shoe of `decks` decks) as a list of
+        (rank, suit) tuples. Only single decks are pre-shuffled; shoes are
+        shuffled on demand.
+        """
+        indices = self.next_indices() if decks == 1 else self._shuffle_indices(decks)
+        return [CARDS[i] for i in indices]
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def default_service() -> ShuffleService:
+    global _default_service
+    if _default_service is None:
+        with _default_lock:
+            if _default_service is None:
+                _default_service = ShuffleService()
+    return _default_service
+
+
+# =========================
+# Benchmark
+# =========================
+def _legacy_create_deck():
+    deck = [(rank, suit) for rank in RANKS for suit in SUITS]
+    random.shuffle(deck)
+    return deck
+
+
+def _secrets_create_deck():
+    deck = list(CARDS)
+    for i in range(len(deck) - 1, 0, -1):
+        j = secrets.randbelow(i + 1)
+        deck[i], deck[j] = deck[j], deck[i]
+    return deck
+
+
+def _rate(fn, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return count / (time.perf_counter() - started)
+
+
+def benchmark(count: int = 50000):
+    unbuffered = ShuffleService(background=False)
+    # Default buffer with its filler thread: every deck is still shuffled
+    # once, so this is the rate the service can keep up
+    sustained = ShuffleService()
+    # Buffer filled up front: times only the hand-off of a ready deck
+    prefilled = ShuffleService(buffer_size=count, low_watermark=0)
+    while len(prefilled._decks) < count:
+        time.sleep(0.05)
+
+    print(f"[SHUFFLE] legacy create_deck (Mersenne Twister): {_rate(_legacy_create_deck, count):,.0f} decks/sec")
+    print(f"[SHUFFLE] secrets.randbelow per draw:            {_rate(_secrets_create_deck, count // 10):,.0f} decks/sec")
+    print(f"[SHUFFLE] ShuffleService, inline shuffle:        {_rate(unbuffered.next_deck, count):,.0f} decks/sec")
+    print(f"[SHUFFLE] ShuffleService, buffered, sustained:   {_rate(sustained.next_deck, count):,.0f} decks/sec "
+          f"(background refill included)")
+    hit_rate = _rate(prefilled.next_deck, count)
+    print(f"[SHUFFLE] ShuffleService, buffer hit latency:    {1e6 / hit_rate:.1f} us/deck "
+          f"(deck already shuffled; not a throughput figure)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,93 @@
+# simulate.py
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import batch
+
+# =========================
+# Config
+# =========================
+CHUNK_ROUNDS = 20000   # rounds per work unit; a multiple of batch.SESSION_HANDS
+DEFAULT_POLICIES = (batch.stand_at(17), batch.stand_at(15), batch.always_stand, batch.mimic_dealer)
+
+
+def chunk_seed(seed: int, index: int) -> str:
+    """
+    Seed for one work unit. random.Random hashes string seeds with
+    SHA-512, so every chunk gets an unrelated stream, and results do not
+    depend on how many workers there are or which one ran the chunk.
+    """
+    return f"{seed}:{index}"
+
+
+def _run_chunk(policies, rounds: int, seed: str) -> batch.BatchStats:
+    # Runs in a worker process. Only the aggregated counters and session
+    # histograms travel back, never per-hand results.
+    return batch.BatchRunner(policies, seed=seed).run(rounds)
+
+
+def run_parallel(policies, rounds: int, workers: int = None, seed: int = 0,
+                 chunk_rounds: int = CHUNK_ROUNDS, on_progress=None) -> batch.BatchStats:
+    """
+    Splits `rounds` across a process pool in chunks of `chunk_rounds` and
+    merges the partial stats as they complete. on_progress(stats), if
+    given, is called with the running totals after every chunk.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = []
+    remaining = rounds
+    while remaining > 0:
+        chunks.append(min(chunk_rounds, remaining))
+        remaining -= chunks[-1]
+
+    total = batch.BatchStats(seats={seat_id: batch.SeatStats() for seat_id in range(1, len(policies) + 1)})
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_chunk, list(policies), size, chunk_seed(seed, index))
+            for index, size in enumerate(chunks)
+        ]
+        for future in as_completed(futures):
+            total.merge(future.result())
+            if on_progress is not None:
+                on_progress(total)
+    total.seconds = time.perf_counter() - started
+    return total
+
+
+def report(stats: batch.BatchStats, workers: int):
+    rate = stats.rounds / stats.seconds * 60 if stats.seconds else 0.0
+    print(f"[SIM] {stats.rounds} rounds x {len(stats.seats)} seats on {workers} workers "
+          f"in {stats.seconds:.2f}s ({rate:,.0f} rounds/min)")
+    for seat_id, seat in sorted(stats.seats.items()):
+        hands = seat.hands or 1
+        print(f"[SIM] Seat {seat_id}: W {100 * seat.wins / hands:.1f}% "
+              f"L {100 * seat.losses / hands:.1f}% T {100 * seat.ties / hands:.1f}% | "
+              f"EV {seat.mean:+.4f}/hand, var {seat.variance:.4f}, "
+              f"{batch.SESSION_HANDS}-hand session sd {seat.session_stdev:.2f}")
+
+
+def main():
+    # python -m server.simulate [rounds] [workers]
+    # python -m server.simulate --scaling [rounds]
+    args = sys.argv[1:]
+    if args and args[0] == "--scaling":
+        rounds = int(args[1]) if len(args) > 1 else 400000
+        baseline = None
+        for workers in range(1, (os.cpu_count() or 1) + 1):
+            stats = run_parallel(DEFAULT_POLICIES, rounds, workers, seed=1)
+            baseline = baseline or stats.seconds
+            print(f"[SIM] {workers} workers: {stats.rounds / stats.seconds * 60:,.0f} rounds/min "
+                  f"(speedup x{baseline / stats.seconds:.2f})")
+        return
+
+    rounds = int(args[0]) if args else 1000000
+    workers = int(args[1]) if len(args) > 1 else (os.cpu_count() or 1)
+    stats = run_parallel(DEFAULT_POLICIES, rounds, workers, seed=1)
+    report(stats, workers)
+
+
+if __name__ == "__main__":
+    main()
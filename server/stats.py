@@ -0,0 +1,177 @@
+# stats.py
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+
+from common.protocol import RESULT_LOSS, RESULT_TIE, RESULT_WIN
+
+# =========================
+# Config
+# =========================
+STATS_COMPACT_INTERVAL = 30.0   # seconds between snapshots written to disk
+LEADERBOARD_MIN_HANDS = 20      # hands a player needs before being ranked
+
+# Counter fields, in snapshot order
+FIELDS = ("hands", "wins", "ties", "losses", "busts", "value_total")
+
+
+class Counters:
+    """Outcome counters for one player or one table; a fixed set of ints."""
+
+    __slots__ = FIELDS
+
+    def __init__(self, hands=0, wins=0, ties=0, losses=0, busts=0, value_total=0):
+        self.hands = hands
+        self.wins = wins
+        self.ties = ties
+        self.losses = losses
+        self.busts = busts
+        self.value_total = value_total
+
+    def add(self, result: int, busted: bool, value: int):
+        self.hands += 1
+        if result == RESULT_WIN:
+            self.wins += 1
+        elif result == RESULT_LOSS:
+            self.losses += 1
+        elif result == RESULT_TIE:
+            self.ties += 1
+        if busted:
+            self.busts += 1
+        self.value_total += value
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.hands if self.hands else 0.0
+
+    @property
+    def average_value(self) -> float:
+        return self.value_total / self.hands if self.hands else 0.0
+
+    def as_list(self):
+        return [getattr(self, name) for name in FIELDS]
+
+
+def _rank_key(name: str, counters: Counters):
+    # Best win rate first; more hands, then the name, break ties
+    return (-counters.win_rate, -counters.hands, name)
+
+
+class StatsService:
+    """
+    Server-wide outcome counters, updated by the table threads in the
+    results phase. Ranked players are also kept in a sorted index of rank
+    keys, so a leaderboard or a player's rank is a bisection rather than a
+    scan. A snapshot of all counters is rewritten to disk periodically.
+    """
+
+    def __init__(self, min_hands: int = LEADERBOARD_MIN_HANDS):
+        self.min_hands = min_hands
+        self.lock = threading.Lock()
+        self.players = {}    # name -> Counters
+        self.tables = {}     # table id -> Counters
+        self.index = []      # sorted rank keys of players with min_hands hands
+        self.updates = 0     # bumped per record(), so unchanged stats aren't rewritten
+
+    def record(self, table_id: int, name: str, result: int, busted: bool, value: int):
+        """Adds one settled hand."""
+        with self.lock:
+            counters = self.players.get(name)
+            if counters is None:
+                counters = self.players[name] = Counters()
+            ranked = counters.hands >= self.min_hands
+            if ranked:
+                del self.index[bisect.bisect_left(self.index, _rank_key(name, counters))]
+            counters.add(result, busted, value)
+            if ranked or counters.hands >= self.min_hands:
+                bisect.insort(self.index, _rank_key(name, counters))
+            table = self.tables.get(table_id)
+            if table is None:
+                table = self.tables[table_id] = Counters()
+            table.add(result, busted, value)
+            self.updates += 1
+
+    def leaderboard(self, count: int = 10):
+        """[(name, Counters)] of the best `count` ranked players."""
+        with self.lock:
+            return [(name, self.players[name]) for _, _, name in self.index[:count]]
+
+    def rank(self, name: str):
+        """1-based leaderboard position of `name`, or None while unranked."""
+        with self.lock:
+            counters = self.players.get(name)
+            if counters is None or counters.hands < self.min_hands:
+                return None
+            return bisect.bisect_left(self.index, _rank_key(name, counters)) + 1
+
+    # ---------- persistence ----------
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "players": {name: counters.as_list() for name, counters in self.players.items()},
+                "tables": {str(table_id): counters.as_list() for table_id, counters in self.tables.items()},
+            }
+
+    def compact(self, path: str):
+        """Rewrites the whole snapshot to `path`, atomically."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        """Restores a snapshot written by compact(); a missing file is an empty one."""
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        with self.lock:
+            for name, values in snapshot.get("players", {}).items():
+                counters = self.players[name] = Counters(*values)
+                if counters.hands >= self.min_hands:
+                    self.index.append(_rank_key(name, counters))
+            self.index.sort()
+            for table_id, values in snapshot.get("tables", {}).items():
+                self.tables[int(table_id)] = Counters(*values)
+
+    def start_compaction(self, path: str, interval: float = STATS_COMPACT_INTERVAL):
+        """Rewrites `path` every `interval` seconds (when stats changed) from a background thread."""
+        def run():
+            written = self.updates
+            while True:
+                time.sleep(interval)
+                if self.updates == written:
+                    continue
+                written = self.updates
+                try:
+                    self.compact(path)
+                except OSError as e:
+                    print(f"[STATS] Compaction failed: {e}")
+
+        threading.Thread(target=run, name="stats-compaction", daemon=True).start()
+
+
+def main():
+    # python -m server.stats player_stats.json [count]
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python -m server.stats <player_stats.json> [count]")
+        return
+    service = StatsService()
+    service.load(sys.argv[1])
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else 10
+    print(f"[STATS] {len(service.players)} players, {len(service.index)} ranked")
+    print(f"{'#':>4}  {'player':<24}{'hands':>8}{'win %':>8}{'bust %':>8}{'avg':>7}")
+    for position, (name, counters) in enumerate(service.leaderboard(count), 1):
+        print(f"{position:>4}  {name:<24}{counters.hands:>8}{100 * counters.win_rate:>8.1f}"
+              f"{100 * counters.busts / counters.hands:>8.1f}{counters.average_value:>7.1f}")
+    for table_id, counters in sorted(service.tables.items()):
+        print(f"[STATS] Table #{table_id}: {counters.hands} hands, win rate {100 * counters.win_rate:.1f}%, "
+              f"average hand {counters.average_value:.1f}")
+
+
+if __name__ == "__main__":
+    main()
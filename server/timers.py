@@ -0,0 +1,138 @@
+# timers.py
+import socket
+import threading
+import time
+
+# =========================
+# Config
+# =========================
+TICK_SECONDS = 0.1   # timer resolution
+WHEEL_SLOTS = 512    # one revolution = 51.2s; longer timers wait extra rounds
+
+
+class Timer:
+    __slots__ = ("callback", "args", "rounds", "cancelled", "expired")
+
+    def __init__(self, callback, args, rounds: int):
+        self.callback = callback
+        self.args = args
+        self.rounds = rounds
+        self.cancelled = False
+        self.expired = False
+
+    def cancel(self):
+        # Lazy cancellation: the wheel drops the entry when its slot comes up
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel. schedule() and cancel() are O(1); each tick only
+    visits the timers hashed into the current slot, so tens of thousands
+    of pending timers cost nothing until they are due.
+    Callbacks run on the wheel thread and must be short.
+    """
+
+    def __init__(self, tick: float = TICK_SECONDS, slots: int = WHEEL_SLOTS):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.current_slot = 0
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay: float, callback, *args) -> Timer:
+        ticks = max(1, int(delay / self.tick + 0.999999))
+        slot_count = len(self.slots)
+        timer = Timer(callback, args, (ticks - 1) // slot_count)
+        with self.lock:
+            self.slots[(self.current_slot + ticks) % slot_count].append(timer)
+        return timer
+
+    def schedule_repeating(self, interval: float, callback, *args):
+        def fire():
+            callback(*args)
+            self.schedule(interval, fire)
+        return self.schedule(interval, fire)
+
+    def _advance(self):
+        with self.lock:
+            self.current_slot = (self.current_slot + 1) % len(self.slots)
+            bucket = self.slots[self.current_slot]
+            due = []
+            pending = []
+            for timer in bucket:
+                if timer.cancelled:
+                    continue
+                if timer.rounds:
+                    timer.rounds -= 1
+                    pending.append(timer)
+                else:
+                    due.append(timer)
+            self.slots[self.current_slot] = pending
+
+        for timer in due:
+            timer.expired = True
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                print(f"[TIMERS] Callback error: {e}")
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while True:
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._advance()
+            next_tick += self.tick
+
+
+class Waker:
+    """
+    Lets a timer interrupt a select() call: wake() makes fileno() readable.
+    The underlying socketpair is only created on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pair = None
+
+    def _sockets(self):
+        with self._lock:
+            if self._pair is None:
+                reader, writer = socket.socketpair()
+                reader.setblocking(False)
+                writer.setblocking(False)
+                self._pair = (reader, writer)
+            return self._pair
+
+    def fileno(self) -> int:
+        return self._sockets()[0].fileno()
+
+    def wake(self):
+        try:
+            self._sockets()[1].send(b"\x00")
+        except BlockingIOError:
+            pass  # already readable
+
+    def clear(self):
+        reader = self._sockets()[0]
+        try:
+            while reader.recv(64):
+                pass
+        except BlockingIOError:
+            pass
+
+
+_default_wheel = None
+_default_lock = threading.Lock()
+
+
+def default_wheel() -> TimerWheel:
+    global _default_wheel
+    if _default_wheel is None:
+        with _default_lock:
+            if _default_wheel is None:
+                _default_wheel = TimerWheel()
+    return _default_wheel
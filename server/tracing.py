@@ -0,0 +1,199 @@
+# tracing.py
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+from . import profiling
+
+# =========================
+# Config
+# =========================
+TRACE_CAPACITY = 65536        # spans kept in memory; older ones are overwritten
+TRACE_EXPORT_INTERVAL = 5.0   # seconds between appends to the JSON lines file
+
+# Span fields, in record order. Timestamps are time.monotonic_ns()
+FIELDS = ("seq", "phase", "table", "round", "seat", "start_ns", "dur_ns", "detail")
+
+
+class TraceSpan:
+    """Times one phase; set .detail inside the block to annotate the span."""
+
+    __slots__ = ("ring", "phase", "table_id", "round_id", "seat_id", "detail", "started", "profile")
+
+    def __init__(self, ring, phase: str, table_id: int, round_id: int, seat_id: int):
+        self.ring = ring
+        self.phase = phase
+        self.table_id = table_id
+        self.round_id = round_id
+        self.seat_id = seat_id
+        self.detail = None
+
+    def __enter__(self):
+        # Every traced phase is also a profiling phase
+        self.profile = profiling.span(self.phase)
+        self.profile.__enter__()
+        self.started = time.monotonic_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self.ring is not None:
+            self.ring.record(self.phase, self.table_id, self.round_id, self.seat_id,
+                             self.started, time.monotonic_ns() - self.started, self.detail)
+        return self.profile.__exit__(*exc)
+
+
+class TraceRing:
+    """
+    Fixed-size ring of round spans (join window, deal, each player turn,
+    dealer turn, results, cleanup). Writers never take a lock: a slot is
+    claimed with next() on a shared counter, which is atomic in CPython,
+    and filled with one tuple store. Each record carries its sequence
+    number, which readers check against the slot's expected one: that
+    tells a published span from a stale one, or from a slot claimed but
+    not yet written, and spans that were overwritten before export.
+    """
+
+    def __init__(self, capacity: int = TRACE_CAPACITY):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self._seq = itertools.count()
+        self.exported = 0   # first seq not yet written by export_jsonl()
+        self.dropped = 0    # spans overwritten before they were exported
+
+    def span(self, phase: str, table_id: int, round_id: int, seat_id: int = 0) -> TraceSpan:
+        return TraceSpan(self, phase, table_id, round_id, seat_id)
+
+    def record(self, phase: str, table_id: int, round_id: int, seat_id: int,
+               start_ns: int, dur_ns: int, detail=None):
+        seq = next(self._seq)
+        self.slots[seq % self.capacity] = (seq, phase, table_id, round_id, seat_id, start_ns, dur_ns, detail)
+
+    def snapshot(self, since: int = 0):
+        """Spans with seq >= since still in the ring, oldest first."""
+        spans = [span for span in list(self.slots) if span is not None and span[0] >= since]
+        spans.sort()
+        return spans
+
+    def published(self, since: int):
+        """
+        ([spans], next seq): the spans from seq `since` on, oldest first, up
+        to the first slot not yet published. That slot is picked up by the
+        next call, so no span is skipped; overwritten ones count as dropped.
+        """
+        slots = self.slots
+        capacity = self.capacity
+        spans = []
+        seq = since
+        while True:
+            span = slots[seq % capacity]
+            if span is None or span[0] < seq:
+                return spans, seq   # claimed but not written yet, or not claimed at all
+            if span[0] > seq:
+                self.dropped += 1   # lapped before it was exported
+            else:
+                spans.append(span)
+            seq += 1
+
+    def export_jsonl(self, path: str) -> int:
+        """Appends the spans published since the last export; returns how many."""
+        spans, next_seq = self.published(self.exported)
+        if spans:
+            with open(path, "a") as f:
+                for span in spans:
+                    f.write(json.dumps(dict(zip(FIELDS, span)), separators=(",", ":")) + "\n")
+        self.exported = next_seq
+        return len(spans)
+
+    def start_export(self, path: str, interval: float = TRACE_EXPORT_INTERVAL):
+        """Appends new spans to `path` every `interval` seconds from a background thread."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.export_jsonl(path)
+                except OSError as e:
+                    print(f"[TRACE] Export failed: {e}")
+
+        threading.Thread(target=run, name="trace-export", daemon=True).start()
+
+
+def span(ring, phase: str, table_id: int, round_id: int, seat_id: int = 0) -> TraceSpan:
+    """A span recorded on `ring`; with no ring (replay) it is only a profiling phase."""
+    return TraceSpan(ring, phase, table_id, round_id, seat_id)
+
+
+# =========================
+# Export formats
+# =========================
+
+def read_jsonl(path: str):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def chrome_trace(spans) -> dict:
+    """
+    Chrome trace event format (chrome://tracing, Perfetto): one complete
+    event per span, one row per table, timestamps in microseconds.
+    """
+    events = []
+    tables = set()
+    for span in spans:
+        tables.add(span["table"])
+        args = {"round": span["round"]}
+        if span["seat"]:
+            args["seat"] = span["seat"]
+        if span["detail"] is not None:
+            args["detail"] = span["detail"]
+        events.append({
+            "name": span["phase"],
+            "ph": "X",
+            "ts": span["start_ns"] / 1000,
+            "dur": span["dur_ns"] / 1000,
+            "pid": 1,
+            "tid": span["table"],
+            "args": args,
+        })
+    for table_id in sorted(tables):
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": table_id,
+                       "args": {"name": f"table-{table_id}"}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def summarize(spans):
+    """Returns {phase: (count, mean ms, p95 ms, max ms)}."""
+    durations = {}
+    for span in spans:
+        durations.setdefault(span["phase"], []).append(span["dur_ns"] / 1e6)
+    summary = {}
+    for phase, values in durations.items():
+        values.sort()
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        summary[phase] = (len(values), sum(values) / len(values), p95, values[-1])
+    return summary
+
+
+def main():
+    # python -m server.tracing round_trace.jsonl [trace.json]
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python -m server.tracing <round_trace.jsonl> [chrome_trace.json]")
+        return
+    spans = list(read_jsonl(sys.argv[1]))
+    print(f"[TRACE] {len(spans)} spans")
+    print(f"{'phase':<16}{'count':>8}{'mean ms':>12}{'p95 ms':>12}{'max ms':>12}")
+    for phase, (count, mean, p95, worst) in sorted(summarize(spans).items(), key=lambda item: -item[1][0] * item[1][1]):
+        print(f"{phase:<16}{count:>8}{mean:>12.3f}{p95:>12.3f}{worst:>12.3f}")
+    if len(sys.argv) == 3:
+        out_path = sys.argv[2]
+        with open(out_path, "w") as f:
+            json.dump(chrome_trace(spans), f)
+        print(f"[TRACE] Chrome trace written to {os.path.abspath(out_path)}")
+
+
+if __name__ == "__main__":
+    main()